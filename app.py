@@ -1,31 +1,49 @@
 import streamlit as st
-import pandas as pd
 import time
-import csv
-import io
-import re
 import json
 import datetime
-import base64
+import itertools
 import os
-import shutil
-from urllib.parse import urlparse
-from bs4 import BeautifulSoup
-import requests
-from requests.adapters import HTTPAdapter, Retry
-import boto3
-from simple_image_download import simple_image_download as simp
-from openai import AzureOpenAI
-from azure.storage.blob import (
-    BlobServiceClient,
-    generate_blob_sas,
-    BlobSasPermissions,
-    ContentSettings
-)
+import contextlib
+import tempfile
 
+from quotetool import cache, clients, dedup, media, metrics, parse, pipeline, registry, results, scrape
+
+# pandas, boto3, the Azure SDKs, openai and BeautifulSoup are imported by the
+# action that uses them, so rendering the app only pays for Streamlit. Every
+# tab renders its widgets on every run, so uploads and settings survive tab
+# switches; each upload is processed once and its result kept in the session.
 st.set_page_config(page_title="Quote Utility Toolkit", layout="wide")
 
-tab1, tab2, tab3, tab4, tab5, tab6 , tab7 = st.tabs([
+
+# ============================ 🔐 Shared clients ============================
+# Built on first use, once per server process, and shared by every session
+# and rerun.
+@st.cache_resource
+def azure_client():
+    return clients.azure_openai_client(st.secrets)
+
+
+@st.cache_resource
+def blob_container():
+    return clients.blob_container_client(st.secrets)
+
+
+@st.cache_resource
+def s3_client():
+    return clients.s3_client(st.secrets)
+
+
+@st.cache_resource
+def batch_poller():
+    """One registry and background poller per server process, shared by all sessions."""
+    poller = registry.BatchPoller(azure_client(), registry.BatchRegistry(),
+                                  on_downloaded=clients.output_uploader(blob_container()))
+    poller.start()
+    return poller
+
+
+TAB_LABELS = [
     "🕸️ Scrape Quotes from QuoteFancy",
     "📊 Structure Quotes by Author",
     "🧠 Quote Metadata Generator & Azure OpenAI JSONL Creator ",
@@ -33,110 +51,116 @@ tab1, tab2, tab3, tab4, tab5, tab6 , tab7 = st.tabs([
     "👤 Distinct Author Extractor",
     "🖼️ Bulk Image Downloader + S3 Uploader + CDN Transformer",
     "📅 Merge Metadata into Structured CSV"
-])
+]
+try:
+    # Tabs that track the selection rerun on a switch and report ``.open``.
+    # Only Tab 4's dashboard and poller wait for their tab; every other
+    # widget renders on every run so its state survives a switch.
+    tab1, tab2, tab3, tab4, tab5, tab6 , tab7 = st.tabs(TAB_LABELS, key="active_tab", on_change="rerun")
+except TypeError:  # Streamlit without tab state: every tab runs
+    tab1, tab2, tab3, tab4, tab5, tab6 , tab7 = st.tabs(TAB_LABELS)
+
+
+def tab_open(tab):
+    # ``open`` is None when tabs do not track state.
+    return getattr(tab, "open", None) is not False
+
+
+# ============================ 📈 Metrics & profiling ============================
+# The stages record timers and counters into one process-wide registry, so the
+# sidebar panel covers every session since the server started (or the last reset).
+profiler = st.sidebar.selectbox("🔬 Profile actions", ["off", *metrics.available_profilers()],
+                                help="Profile each button or upload action and show the report under it.")
+
+
+@contextlib.contextmanager
+def action(name):
+    """Time an action as ``app.<name>``; profile it when the sidebar asks to."""
+    with metrics.profiled(None if profiler == "off" else profiler) as profile:
+        with metrics.timer(f"app.{name}"):
+            yield
+    if profile.enabled:
+        with st.expander(f"🔬 Profile: {name} ({profiler})"):
+            st.code(profile.report(), language=None)
+
+
+def upload_key(*files):
+    """Identify uploads across reruns by Streamlit's file id (name on old versions) and size."""
+    return tuple((getattr(f, "file_id", None) or f.name, f.size) for f in files)
+
+
+def once_per_upload(name, key, compute):
+    """Run ``compute`` once per ``key`` and keep its result in the session.
+
+    Streamlit reruns the whole script on every interaction in any tab, so
+    uploads are processed when they change rather than on every rerun.
+    """
+    if st.session_state.get(f"{name}_key") != key:
+        st.session_state[f"{name}_result"] = compute()
+        st.session_state[f"{name}_key"] = key
+    return st.session_state[f"{name}_result"]
+
 
 # ------------------- TAB 1 -------------------
 with tab1:
     st.title("📝 QuoteFancy Scraper")
-    USER_AGENT = (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/90.0.4430.93 Safari/537.36"
-    )
-    REQUEST_TIMEOUT = 10
-    DELAY_BETWEEN_PAGES = 1
-    MAX_PAGES = 10
-    
-    def create_session_with_retries():
-        session = requests.Session()
-        session.headers.update({
-            'User-Agent': USER_AGENT,
-            'Accept-Language': 'en-US,en;q=0.9'
-        })
-        retries = Retry(
-            total=3,
-            backoff_factor=0.3,
-            status_forcelist=[500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "OPTIONS"]
-        )
-        adapter = HTTPAdapter(max_retries=retries)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        return session
-    
-    def extract_slug_from_url(url):
-        parsed = urlparse(url)
-        path = parsed.path.strip("/")
-        return path.split("/")[0] if path else ""
-    
-    def scrape_quotes_for_slug(slug, max_pages=MAX_PAGES):
-        session = create_session_with_retries()
-        rows, serial_number = [], 1
-    
-        for page_number in range(1, max_pages + 1):
-            page_url = f"https://quotefancy.com/{slug}/page/{page_number}"
-            try:
-                response = session.get(page_url, timeout=REQUEST_TIMEOUT)
-                response.raise_for_status()
-            except requests.RequestException:
-                break
-    
-            soup = BeautifulSoup(response.content, "html.parser")
-            containers = soup.find_all("div", class_="q-wrapper")
-            if not containers:
-                break
-    
-            for container in containers:
-                quote_div = container.find("div", class_="quote-a")
-                quote_text = quote_div.get_text(strip=True) if quote_div else container.find("a", class_="quote-a").get_text(strip=True)
-    
-                quote_link = ""
-                if quote_div and quote_div.find("a"):
-                    quote_link = quote_div.find("a").get("href", "")
-                elif container.find("a", class_="quote-a"):
-                    quote_link = container.find("a", class_="quote-a").get("href", "")
-    
-                author_div = container.find("div", class_="author-p bylines")
-                if author_div:
-                    author_text = author_div.get_text(strip=True).replace("by ", "").strip()
-                else:
-                    author_p = container.find("p", class_="author-p")
-                    author_text = author_p.find("a").get_text(strip=True) if author_p and author_p.find("a") else "Anonymous"
-    
-                rows.append([serial_number, quote_text, quote_link, author_text])
-                serial_number += 1
-    
-            time.sleep(DELAY_BETWEEN_PAGES)
-    
-        return rows
-    
-    def convert_to_csv_buffer(rows):
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["Serial No", "Quote", "Link", "Author"])
-        writer.writerows(rows)
-        return output.getvalue()
-    
+
     input_urls = st.text_area("Enter QuoteFancy URLs (comma separated):")
     filename_prefix = st.text_input("Filename prefix (without extension)", "quotes")
-    
+    with st.expander("⚙️ Crawl settings"):
+        max_pages = st.number_input("Max pages per author", min_value=1, max_value=200, value=scrape.MAX_PAGES)
+        resume = st.checkbox("Resume / incremental (keep checkpoints for this filename prefix)", value=True)
+        max_workers = st.number_input("Concurrent requests", min_value=1, max_value=32, value=scrape.MAX_WORKERS)
+        rate_limit = st.number_input("Max requests/sec to quotefancy.com", min_value=0.5, max_value=50.0, value=scrape.RATE_LIMIT_PER_HOST)
+        parsers = parse.available_parsers()
+        html_parser = st.selectbox("HTML parser", parsers, index=parsers.index(parse.DEFAULT_PARSER))
+        use_cache = st.checkbox("Cache pages on disk", value=True)
+        cache_ttl_hours = st.number_input("Cache freshness (hours)", min_value=0.0, value=cache.DEFAULT_TTL / 3600)
+        offline = st.checkbox("Offline (cache only)", value=False)
+        if st.button("🗑️ Clear page cache"):
+            cache.PageCache().clear()
+            st.info("Page cache cleared.")
+
     if st.button("Start Scraping", key="scrape_button"):
         if not input_urls or not filename_prefix:
             st.error("Please provide both URLs and filename prefix.")
         else:
             url_list = [url.strip() for url in input_urls.split(",") if url.strip()]
-            all_quotes = []
-            for url in url_list:
-                slug = extract_slug_from_url(url)
-                st.write(f"🔍 Scraping: `{slug}`")
-                all_quotes.extend(scrape_quotes_for_slug(slug))
-    
-            if all_quotes:
-                csv_data = convert_to_csv_buffer(all_quotes)
+            slugs = [scrape.extract_slug_from_url(url) for url in url_list]
+            st.write("🔍 Scraping: " + ", ".join(f"`{slug}`" for slug in dict.fromkeys(slugs)))
+            progress_bar = st.progress(0.0)
+            page_cache = cache.PageCache(ttl=cache_ttl_hours * 3600, offline=offline) if use_cache or offline else None
+            # Other sessions may scrape the same prefix; this run's export
+            # goes to a file of its own and is read before the run returns.
+            with action("scrape"), tempfile.TemporaryDirectory() as export_dir:
+                run = pipeline.scrape_job(
+                    url_list,
+                    filename_prefix,
+                    resume=resume,
+                    page_cache=page_cache,
+                    progress=lambda done, total: progress_bar.progress(done / total),
+                    output_path=os.path.join(export_dir, "export.csv"),
+                    max_pages=int(max_pages),
+                    max_workers=int(max_workers),
+                    rate_limit=rate_limit,
+                    parser=html_parser
+                )
+                with open(run.output_path, "rb") as f:
+                    csv_bytes = f.read()
+            new_rows, total_rows = run.new_rows, run.total_rows
+            if page_cache is not None:
+                hits, revalidated, misses, offline_misses = st.columns(4)
+                hits.metric("Cache hits", page_cache.stats["hit"])
+                revalidated.metric("Revalidated (304)", page_cache.stats["revalidated"])
+                misses.metric("Downloaded", page_cache.stats["miss"])
+                offline_misses.metric("Missing offline", page_cache.stats["offline_miss"])
+                page_cache.close()
+
+            if total_rows:
                 timestamp = int(time.time())
                 full_filename = f"{filename_prefix}_{timestamp}.csv"
-                st.success(f"✅ Scraped {len(all_quotes)} quotes.")
-                st.download_button("📥 Download CSV", data=csv_data, file_name=full_filename, mime='text/csv')
+                st.success(f"✅ Scraped {sum(new_rows.values())} new quotes ({total_rows} rows for these authors).")
+                st.download_button("📥 Download CSV", data=csv_bytes, file_name=full_filename, mime='text/csv')
             else:
                 st.warning("⚠️ No quotes scraped.")
 
@@ -145,308 +169,280 @@ with tab2:
     st.header("📊 Structure Quotes by Author")
     file = st.file_uploader("Upload CSV with 'Quote' and 'Author' columns", type="csv")
     if file:
-        df = pd.read_csv(file)
-        if 'Quote' not in df.columns or 'Author' not in df.columns:
+        def structure():
+            from quotetool import ingest
+            columns = ingest.csv_columns(file)
+            if 'Quote' not in columns or 'Author' not in columns:
+                return None
+            with ingest.CsvOutput() as output:
+                with action("structure"):
+                    pipeline.structure_csv(file, output)
+                return output.getvalue(), int(time.time())
+
+        structured = once_per_upload("tab2", upload_key(file), structure)
+        if structured is None:
             st.error("Missing required columns")
         else:
-            df = df[df['Quote'].apply(lambda x: isinstance(x, str) and len(x.strip()) <= 180)]
-            groups = []
-            for author, group in df.groupby('Author'):
-                quotes = group['Quote'].dropna().tolist()[:8]
-                quotes += ['NA'] * (8 - len(quotes))
-                groups.append(quotes + [author])
-            columns = [f"s{i}paragraph1" for i in range(2, 10)] + ['Author']
-            final = pd.DataFrame(groups, columns=columns)
-            ts = int(time.time())
-            st.download_button("Download Structured CSV", final.to_csv(index=False), file_name=f"structured_quotes_{ts}.csv")
+            data, ts = structured
+            st.download_button("Download Structured CSV", data, file_name=f"structured_quotes_{ts}.csv")
 
 # ------------------- TAB 3 -------------------
 with tab3:
-    
-    client = AzureOpenAI(
-        api_key=st.secrets["azure_openai_api_key"],
-        api_version="2025-03-01-preview",
-        azure_endpoint="https://suvichaarai008818057333687.cognitiveservices.azure.com"
-        )
-    deployment_model = "gpt-4o-global-batch"
-    
     # ============================ 🎯 Title ============================
     st.title("🧠 Quote Metadata Generator & Azure OpenAI JSONL Creator")
-    
+
     # ============================ 📤 File Upload ============================
     uploaded_file = st.file_uploader("Upload your CSV with Author + s2paragraph1 to s9paragraph1", type=["csv"])
-    
+    reuse_results = st.checkbox("♻️ Reuse cached metadata for prompts already processed", value=True)
+
     if uploaded_file:
-        ts = str(int(time.time()))
-        df = pd.read_csv(uploaded_file)
-        df.replace(r'^\s*$', pd.NA, regex=True, inplace=True)
-        df.replace("NA", pd.NA, inplace=True)
-    
-        # Separate clean and removed
-        clean = df.dropna()
-        removed = df[df.isna().any(axis=1)]
-    
-        # Save cleaned CSV
-        cleaned_csv = f"cleaned_data_{ts}.csv"
-        removed_csv = f"removed_data_{ts}.csv"
-        clean.to_csv(cleaned_csv, index=False)
-        removed.to_csv(removed_csv, index=False)
-    
-        st.download_button("📥 Download Cleaned CSV", data=clean.to_csv(index=False), file_name=cleaned_csv, mime="text/csv")
-        st.download_button("📥 Download Removed Rows CSV", data=removed.to_csv(index=False), file_name=removed_csv, mime="text/csv")
-    
-        # ============================ 🆔 Generate custom_id ============================
-        author_map, counter = {}, {}
-        ids, gcount = [], 1
-        for _, row in clean.iterrows():
-            a = row['Author'].strip()
-            k = a.replace(" ", "_")
-            if a not in author_map:
-                author_map[a], counter[a] = gcount, 1
-                gcount += 1
+        # Streamlit reruns this script on every interaction. The files and
+        # batches of an upload are made once and kept in the session, so
+        # reruns only redraw them; the registry also refuses to submit the
+        # same JSONL twice across sessions.
+        def prepare_and_submit():
+            with action("prepare_and_submit"):
+                prep = pipeline.prepare_batch(uploaded_file, reuse_results=reuse_results)
+                batch_registry = registry.BatchRegistry()
+                try:
+                    batches = pipeline.submit_batches(azure_client(), prep, batch_registry)
+                finally:
+                    batch_registry.close()
+            if batches:
+                batch_poller()  # make sure the background poller is running
+            return prep, batches
+
+        prep, batches = once_per_upload("tab3", (upload_key(uploaded_file), reuse_results), prepare_and_submit)
+
+        for path in (prep.cleaned_csv, prep.removed_csv, prep.structured_csv):
+            label = {prep.cleaned_csv: "Cleaned CSV", prep.removed_csv: "Removed Rows CSV"}.get(path, "Structured CSV")
+            with open(path, "rb") as f:
+                st.download_button(f"📥 Download {label}", data=f, file_name=os.path.basename(path), mime="text/csv")
+        lookups = prep.submitted + prep.cached
+        if reuse_results and lookups:
+            hit_ratio, saved = st.columns(2)
+            hit_ratio.metric("Prompt cache hit ratio", f"{prep.cached / lookups:.0%}", f"{prep.cached} of {lookups} rows")
+            saved.metric("Tokens saved (approx.)", f"{prep.tokens_saved:,}")
+        if prep.cached_paths:
+            for cached_path in prep.cached_paths:
+                with open(cached_path, "rb") as f:
+                    st.download_button(f"📥 Download {os.path.basename(cached_path)}", data=f,
+                                       file_name=os.path.basename(cached_path), mime="application/jsonl")
+            st.caption("Cached results use the batch output format; merge them in Tab 7 together with the batch results.")
+        if len(prep.jsonl_paths) > 1:
+            st.info(f"✂️ Split into {len(prep.jsonl_paths)} JSONL files to stay within Azure batch limits.")
+        for jsonl_path in prep.jsonl_paths:
+            with open(jsonl_path, "rb") as f:
+                st.download_button(f"📥 Download {os.path.basename(jsonl_path)}", data=f,
+                                   file_name=os.path.basename(jsonl_path), mime="application/jsonl")
+
+        for entry in batches:
+            if entry["reused"]:
+                st.info(f"♻️ {entry['jsonl_file']} was already submitted; tracking its batch {entry['batch_id']}.")
             else:
-                counter[a] += 1
-            ids.append(f"{author_map[a]}-{k}-{counter[a]}")
-        clean["custom_id"] = ids
-        final = clean[["custom_id"] + [c for c in clean.columns if c != "custom_id"]]
-    
-        structured_csv = f"structured-data-id_{ts}.csv"
-        final.to_csv(structured_csv, index=False)
-        st.download_button("📥 Download Structured CSV", data=final.to_csv(index=False), file_name=structured_csv, mime="text/csv")
-    
-        # ============================ 🔄 Generate JSONL ============================
-        payloads = []
-        for _, row in final.iterrows():
-            quotes = [row.get(f"s{i}paragraph1", '') for i in range(2, 10)]
-            block = "\n".join(f"- {q}" for q in quotes if q and q != "NA")
-            author = row['Author']
-            prompt = f"You're given a series of quotes by {author}.\nUse them to generate metadata for a web story.\nQuotes:\n{block}\n\nPlease respond ONLY in this exact JSON format:\n{{\n  \"storytitle\": \"...\",\n  \"metadescription\": \"...\",\n  \"metakeywords\": \"...\"\n}}"
-            payloads.append({
-                "custom_id": row["custom_id"],
-                "method": "POST",
-                "url": "/chat/completions",
-                "body": {
-                    "model": deployment_model,
-                    "messages": [
-                        {"role": "system", "content": "You are a creative and SEO-savvy content writer."},
-                        {"role": "user", "content": prompt}
-                    ]
-                }
-            })
-    
-        jsonl_filename = f"quotefancy_azure_batch_{ts}.jsonl"
-        jsonl_str = '\n'.join(json.dumps(record) for record in payloads)
-        st.download_button("📥 Download JSONL File", data=jsonl_str, file_name=jsonl_filename, mime="application/jsonl")
-    
-        # ============================ ⬆️ Upload JSONL to Azure ============================
-        with open(jsonl_filename, "w") as f:
-            f.write(jsonl_str)
-        with open(jsonl_filename, "rb") as f:
-            batch_file = client.files.create(
-                file=f,
-                purpose="batch",
-                extra_body={"expires_after": {"seconds": 1209600, "anchor": "created_at"}}
-            )
-        file_id = batch_file.id
-        st.success("✅ File uploaded to Azure.")
-        st.json(batch_file.model_dump())
-    
-        # ============================ 🚀 Submit Batch Job ============================
-        batch_job = client.batches.create(
-            input_file_id=file_id,
-            endpoint="/chat/completions",
-            completion_window="24h",
-            extra_body={"output_expires_after": {"seconds": 1209600, "anchor": "created_at"}}
-        )
-        batch_id = batch_job.id
-        st.success(f"🚀 Batch job submitted successfully! Batch ID: {batch_id}")
-    
-        # ============================ 💾 Save Tracking Info ============================
-        tracking_info = {
-            "ts": ts,
-            "batch_id": batch_id,
-            "file_id": file_id,
-            "jsonl_file": jsonl_filename,
-            "csv_file": structured_csv
-        }
-        track_filename = f"azure_batch_tracking_{ts}.json"
-        st.download_button("📥 Download Tracking JSON", data=json.dumps(tracking_info, indent=2), file_name=track_filename, mime="application/json")
-    
-        st.info("✅ You can now close the app or monitor the batch using the Batch ID.")
+                st.success(f"🚀 {entry['jsonl_file']} uploaded and submitted! Batch ID: {entry['batch_id']}")
+
+        if not batches:
+            st.success("♻️ Every row was answered from the prompt cache; no batch was submitted.")
+        else:
+            # ============================ 💾 Save Tracking Info ============================
+            track_filename = f"azure_batch_tracking_{prep.ts}.json"
+            st.download_button("📥 Download Tracking JSON", data=json.dumps(pipeline.tracking_info(prep, batches), indent=2),
+                               file_name=track_filename, mime="application/json")
+
+            st.info("✅ You can now close the app; Tab 4 keeps polling these batches and downloads the results when they complete.")
 
 # ------------------- TAB 4 -------------------
-# ============================ 🔐 Azure Credentials ============================
+def blob_sas_url(blob_name):
+    return clients.blob_sas_url(blob_name, st.secrets["azure_blob_account_key"])
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "—"
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+
+def batch_dashboard(poller):
+    import pandas as pd
+    rows = poller.registry.all()
+    if not rows:
+        st.info("No batches registered yet. Submit one in Tab 3 or upload a tracking JSON above.")
+        return
+    now = time.time()
+    st.dataframe(pd.DataFrame([{
+        "Batch ID": row["batch_id"],
+        "Run": row["ts"],
+        "Part": row["part"],
+        "Status": row["status"],
+        "Progress": f"{row['completed'] + row['failed']}/{row['total']}",
+        "Failed": row["failed"],
+        "ETA": format_seconds(registry.eta_seconds(row, now)),
+        "Next check": "—" if row["status"] in registry.TERMINAL_STATUSES and not registry.awaiting_download(row)
+                      else format_seconds(max(0, row["next_poll_at"] - now)),
+        "Output": os.path.basename(row["output_path"]) if row["output_path"] else "",
+        "Errors": os.path.basename(row["error_path"]) if row["error_path"] else "",
+        "Error": row["error"] or "",
+    } for row in rows]), hide_index=True, use_container_width=True)
+
+    for row in rows:
+        for path, blob_name, label in ((row["output_path"], row["blob_name"], "results"),
+                                       (row["error_path"], row["error_blob_name"], "failed requests")):
+            if path and os.path.exists(path):
+                with open(path, "rb") as f:
+                    st.download_button(f"📥 Download {os.path.basename(path)} ({label})", data=f,
+                                       file_name=os.path.basename(path), mime="application/jsonl", key=f"download_{path}")
+            if blob_name:
+                st.markdown(f"📎 [{blob_name} on Azure Blob]({blob_sas_url(blob_name)})", unsafe_allow_html=True)
+        if row["error_path"] and os.path.exists(row["error_path"]):
+            with st.expander(f"⚠️ {row['failed']} failed request(s) in {os.path.basename(row['error_path'])}"):
+                with open(row["error_path"], "rb") as f:
+                    st.code(b"".join(itertools.islice(f, 20)).decode("utf-8", "replace"), language="json")
+
+
+def result_lookup(batch_registry):
+    outputs = [row["output_path"] for row in batch_registry.all()
+               if row["output_path"] and os.path.exists(row["output_path"])]
+    if not outputs:
+        return
+    st.subheader("🔎 Look up a result by custom_id")
+    output_path = st.selectbox("Results file", outputs, format_func=os.path.basename)
+    custom_id = st.text_input("custom_id", placeholder="1-Albert_Einstein-1")
+    if custom_id:
+        with results.ResultIndex(output_path) as index:
+            record = index.get(custom_id.strip())
+        if record is None:
+            st.warning(f"No result for `{custom_id}` in {os.path.basename(output_path)}.")
+        else:
+            st.json(record)
+
+
 with tab4:
-    AZURE_OPENAI_API_KEY = st.secrets["azure_openai_api_key"]
-    AZURE_STORAGE_CONNECTION_STRING = st.secrets["azure_blob_connection_string"]
-    AZURE_STORAGE_CONTAINER = "suvichaarbatch1"
-    AZURE_BLOB_ACCOUNT_NAME = "suvichaarblob"
-    AZURE_BLOB_ACCOUNT_KEY = st.secrets["azure_blob_account_key"]
-    
-    client = AzureOpenAI(
-        api_key=AZURE_OPENAI_API_KEY,
-        api_version="2025-03-01-preview",
-        azure_endpoint="https://suvichaarai008818057333687.cognitiveservices.azure.com"
-    )
-    
     # ============================ 🎯 UI ============================
     st.title("📦 Azure Batch Result Fetcher & Blob Uploader")
-    uploaded_file = st.file_uploader("📤 Upload your `azure_batch_tracking_*.json` file", type=["json"])
-    
+    uploaded_file = st.file_uploader("📤 Upload an `azure_batch_tracking_*.json` file to track older batches", type=["json"])
+
     if uploaded_file:
-        tracking_info = json.load(uploaded_file)
-        batch_id = tracking_info.get("batch_id")
-        ts = tracking_info.get("ts")
-        output_filename = f"batch_results_{ts}.jsonl"
-    
-        st.info(f"🔍 Checking status for Batch ID: `{batch_id}`...")
-        batch_job = client.batches.retrieve(batch_id)
-        status = batch_job.status
-        st.write(f"📊 Batch Status: **{status}**")
-    
-        if status != "completed":
-            st.warning("⚠️ Batch not ready yet. Please try again later.")
+        def import_tracking():
+            poller = batch_poller()
+            batch_ids = poller.registry.import_tracking(json.load(uploaded_file))
+            with st.spinner(f"🔍 Checking {len(batch_ids)} batch(es)..."), action("import_tracking"):
+                poller.poll_once(batch_ids=batch_ids)
+
+        once_per_upload("tab4", upload_key(uploaded_file), import_tracking)
+
+    if st.button("🔄 Refresh now"):
+        poller = batch_poller()
+        pending = pipeline.pending_batch_ids(poller.registry)
+        with st.spinner(f"🔍 Checking {len(pending)} batch(es)..."), action("fetch"):
+            pipeline.fetch_results(poller, pending)
+
+    st.caption("Unfinished batches are polled in the background with exponential backoff; completed outputs are "
+               "downloaded, saved to the prompt cache and uploaded to Azure Blob automatically.")
+    # The dashboard needs the Azure client and the poller, so it only runs
+    # while this tab is open; the lookup below reads the registry directly.
+    if tab_open(tab4):
+        poller = batch_poller()
+        if hasattr(st, "fragment"):
+            st.fragment(run_every=30)(batch_dashboard)(poller)
         else:
-            output_file_id = batch_job.output_file_id or batch_job.error_file_id
-            if not output_file_id:
-                st.error("❌ No output or error file found in batch job.")
-            else:
-                # ============================ 📥 Download Batch Output ============================
-                file_response = client.files.content(output_file_id)
-                raw_lines = file_response.text.strip().split('\n')
-                with open(output_filename, "w") as f:
-                    for line in raw_lines:
-                        f.write(line + "\n")
-    
-                with open(output_filename, "rb") as f:
-                    st.download_button("📥 Download Results JSONL", data=f, file_name=output_filename, mime="application/jsonl")
-    
-                # ============================ ☁️ Upload to Azure Blob ============================
-                blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-                container_client = blob_service_client.get_container_client(AZURE_STORAGE_CONTAINER)
-    
-                with open(output_filename, "rb") as data:
-                    container_client.upload_blob(
-                        name=output_filename,
-                        data=data,
-                        overwrite=True,
-                        content_settings=ContentSettings(content_type="application/json")
-                    )
-    
-                # ============================ 🔗 Generate SAS URL ============================
-                sas_token = generate_blob_sas(
-                    account_name=AZURE_BLOB_ACCOUNT_NAME,
-                    container_name=AZURE_STORAGE_CONTAINER,
-                    blob_name=output_filename,
-                    account_key=AZURE_BLOB_ACCOUNT_KEY,
-                    permission=BlobSasPermissions(read=True),
-                    expiry=datetime.datetime.utcnow() + datetime.timedelta(days=1)
-                )
-    
-                blob_url = f"https://{AZURE_BLOB_ACCOUNT_NAME}.blob.core.windows.net/{AZURE_STORAGE_CONTAINER}/{output_filename}?{sas_token}"
-                st.success("✅ File uploaded to Azure Blob Storage.")
-                st.markdown(f"📎 [Click here to download from Azure Blob]({blob_url})", unsafe_allow_html=True)
+            batch_dashboard(poller)
+        result_lookup(poller.registry)
+    else:
+        batch_registry = registry.BatchRegistry()
+        try:
+            result_lookup(batch_registry)
+        finally:
+            batch_registry.close()
 
 # ------------------- TAB 5 -------------------
 with tab5:
     st.header("👤 Distinct Author Extractor")
     file = st.file_uploader("Upload CSV with 'Author' column", type="csv", key="auth_csv")
     if file:
-        df = pd.read_csv(file)
-        if 'Author' not in df.columns:
+        def distinct_authors():
+            from quotetool import ingest
+            if 'Author' not in ingest.csv_columns(file):
+                return None
+            distinct = set()
+            for chunk in ingest.read_csv_chunks(file, usecols=['Author']):
+                distinct.update(chunk['Author'].dropna().unique())
+            return ', '.join(sorted(distinct))
+
+        authors = once_per_upload("tab5", upload_key(file), distinct_authors)
+        if authors is None:
             st.error("Missing 'Author' column")
         else:
-            authors = ', '.join(sorted(df['Author'].dropna().unique()))
             st.text_area("Distinct Authors", authors, height=200)
 
 # ------------------- TAB 6 -------------------
 with tab6:
-    aws_access_key = st.secrets["aws_access_key"]
-    aws_secret_key = st.secrets["aws_secret_key"]
-    region_name = "ap-south-1"
-    bucket_name = "suvichaarapp"
-    s3_prefix = "media/"
-    cdn_base_url = "https://cdn.suvichaar.org/"
-    
+    bucket_name = media.BUCKET_NAME
+    s3_prefix = media.S3_PREFIX
+    cdn_base_url = media.CDN_BASE_URL
+
     # ============================ 🎯 UI ============================
     st.title("🖼️ Bulk Image Downloader + S3 Uploader + CDN Transformer")
-    
+
     keywords_input = st.text_input("Enter keywords (comma-separated)", "cat,dog,car")
     count = st.number_input("Number of images per keyword", min_value=1, max_value=50, value=5)
     filename_input = st.text_input("Output CSV filename", "image_links")
-    
+
+    with st.expander("♻️ Duplicate images"):
+        skip_duplicates = st.checkbox("Skip images whose bytes are already in the bucket", value=True)
+        near_duplicates = st.checkbox(
+            "Also match near-duplicates (re-encoded or resized copies)",
+            value=False,
+            disabled=not dedup.HAVE_PILLOW,
+            help=None if dedup.HAVE_PILLOW else "Install Pillow to enable perceptual hashing."
+        )
+        if st.button("🧹 Rebuild index from bucket listing"):
+            image_index = dedup.ImageIndex(near_duplicates=near_duplicates)
+            with st.spinner(f"Listing s3://{bucket_name}/{s3_prefix}..."):
+                indexed = image_index.rebuild(s3_client(), bucket_name, s3_prefix)
+            image_index.close()
+            st.success(f"✅ Indexed {indexed} objects.")
+
     # ============================ 🚀 Main Process ============================
     if st.button("🚀 Download, Upload, and Transform"):
-        if os.path.exists("simple_images"):
-            shutil.rmtree("simple_images")
-    
+        from simple_image_download import simple_image_download as simp
+        from quotetool import cdn
         response = simp.simple_image_download()
         keywords = [k.strip() for k in keywords_input.split(",") if k.strip()]
-    
-        for keyword in keywords:
-            st.write(f"📥 Downloading {count} images for {keyword}")
-            response.download(keyword, count)
-    
-        # Initialize S3 client
-        s3 = boto3.client("s3", aws_access_key_id=aws_access_key,
-                          aws_secret_access_key=aws_secret_key, region_name=region_name)
-    
-        results = []
-    
-        for folder, _, files_ in os.walk("simple_images"):
-            for f in files_:
-                path = os.path.join(folder, f)
-                kf = os.path.basename(folder).replace(" ", "-")
-                fname = f.replace(" ", "-")
-                key = f"{s3_prefix}{kf}/{fname}"
-                try:
-                    s3.upload_file(path, bucket_name, key)
-                    cdn_url = f"{cdn_base_url}{key}"
-                    results.append([kf, fname, cdn_url])
-                    st.write(f"✅ Uploaded {fname}")
-                except Exception as e:
-                    st.error(f"❌ Failed to upload {fname}: {e}")
-    
-        # Create DataFrame from results
-        df = pd.DataFrame(results, columns=["Keyword", "Filename", "CDN_URL"])
-    
+
+        pipeline_bar = st.progress(0.0, text=f"📥 Downloading {count} images for {len(keywords)} keywords...")
+
+        def show_pipeline_progress(keywords_done, keywords_total, uploaded, queued):
+            done = (keywords_done + uploaded) / (keywords_total + max(queued, 1))
+            pipeline_bar.progress(min(done, 1.0), text=f"📥 {keywords_done}/{keywords_total} keywords downloaded · "
+                                                       f"⬆️ {uploaded}/{queued} images uploaded")
+
+        # Each keyword's images upload (and leave the disk) as soon as its
+        # download finishes, while the other keywords are still downloading.
+        # The shared S3 client serves every upload worker.
+        with action("images"):
+            df, uploads, download_errors, transformer = pipeline.upload_images(
+                keywords, count, response.download, s3_client(), bucket=bucket_name, prefix=s3_prefix,
+                cdn_base_url=cdn_base_url, skip_duplicates=skip_duplicates, near_duplicates=near_duplicates,
+                progress=show_pipeline_progress
+            )
+        for keyword, error in download_errors.items():
+            st.warning(f"⚠️ Download for {keyword} stopped early: {error}")
+        failed = [u for u in uploads if u.error]
+        duplicates = [u for u in uploads if u.duplicate_of]
+        st.success(f"✅ Uploaded {len(uploads) - len(failed) - len(duplicates)} of {len(uploads)} images")
+        if duplicates:
+            st.info(f"♻️ {len(duplicates)} duplicates reuse images already in the bucket; their rows point at the existing CDN URL.")
+        if failed:
+            with st.expander(f"❌ {len(failed)} uploads failed"):
+                for u in failed:
+                    st.error(f"❌ Failed to upload {u.job.filename} after {u.attempts} attempts: {u.error}")
+
         # ============================ 🔄 Transform URLs ============================
-        st.write("🔄 Transforming CDN URLs...")
-    
-        template = {
-            "bucket": bucket_name,
-            "key": "keyValue",
-            "edits": {
-                "resize": {
-                    "width": 720,
-                    "height": 1280,
-                    "fit": "cover"
-                }
-            }
-        }
-    
-        transformed_urls = []
-    
-        for idx, row in df.iterrows():
-            media_url = str(row["CDN_URL"]).strip()
-            try:
-                if not media_url.startswith("https://cdn.suvichaar.org/") and not media_url.startswith("https://media.suvichaar.org/"):
-                    raise ValueError(f"Unsupported domain in URL: {media_url}")
-    
-                if media_url.startswith("https://cdn.suvichaar.org/"):
-                    media_url = media_url.replace("https://cdn.suvichaar.org/", "https://media.suvichaar.org/")
-    
-                key_value = media_url.replace("https://media.suvichaar.org/", "")
-                template["key"] = key_value
-                encoded = base64.urlsafe_b64encode(json.dumps(template).encode()).decode()
-                final_url = f"https://media.suvichaar.org/{encoded}"
-                transformed_urls.append(final_url)
-            except Exception as e:
-                st.error(f"⚠️ Error in row {idx}: {e}")
-                transformed_urls.append("ERROR")
-    
-        df["standardurl"] = transformed_urls
-    
+        if transformer.errors:
+            bad = df.loc[df["standardurl"] == cdn.ERROR, "CDN_URL"]
+            st.error(f"⚠️ {transformer.errors} URLs are not on the CDN or media domain: {', '.join(bad.head(5))}")
+
         # ============================ 📁 Show + Download ============================
         st.dataframe(df.head())
         output_csv = df.to_csv(index=False)
@@ -455,35 +451,42 @@ with tab6:
 with tab7:
     st.header("📅 Merge Metadata into Structured CSV")
     up_csv = st.file_uploader("Upload structured_datawith_id.csv", type="csv", key="tab6csv")
-    up_jsonl = st.file_uploader("Upload metadata.jsonl", type="jsonl", key="tab6jsonl")
+    up_jsonl = st.file_uploader("Upload metadata.jsonl (batch results and any cached results)", type="jsonl", key="tab6jsonl", accept_multiple_files=True)
     if up_csv and up_jsonl:
-        try:
-            def norm(cid):
-                cid = str(cid).strip().lower()
-                m = re.match(r"(\d+)-(.+)", cid)
-                return f"{int(m.group(1))}-{m.group(2)}" if m else cid
+        def merge():
+            from quotetool import ingest
+            with ingest.CsvOutput() as output:
+                with action("merge"):
+                    run = pipeline.merge_metadata(up_csv, up_jsonl, output)
+                return output.getvalue(), run, str(int(time.time()))
 
-            df = pd.read_csv(up_csv)
-            df["custom_id_normalized"] = df["custom_id"].apply(norm)
+        try:
+            merged, run, ts = once_per_upload("tab7", upload_key(up_csv, *up_jsonl), merge)
+            st.download_button("Download Merged CSV", data=merged, file_name=f"Textual-Data-Quote-Fancy_{ts}.csv")
 
-            meta_map = {}
-            for line in up_jsonl.read().decode().splitlines():
-                try:
-                    obj = json.loads(line)
-                    rid = norm(obj.get("custom_id", ""))
-                    raw = obj["response"]["body"]["choices"][0]["message"]["content"]
-                    clean = re.sub(r"^```json\\s*|\\s*```$", "", raw.strip())
-                    meta = json.loads(clean)
-                    meta_map[rid] = meta
-                except:
-                    continue
-
-            df["storytitle"] = df["custom_id_normalized"].map(lambda x: meta_map.get(x, {}).get("storytitle", ""))
-            df["metadescription"] = df["custom_id_normalized"].map(lambda x: meta_map.get(x, {}).get("metadescription", ""))
-            df["metakeywords"] = df["custom_id_normalized"].map(lambda x: meta_map.get(x, {}).get("metakeywords", ""))
-            df.drop(columns=["custom_id_normalized"], inplace=True)
-
-            ts = str(int(time.time()))
-            st.download_button("Download Merged CSV", data=df.to_csv(index=False), file_name=f"Textual-Data-Quote-Fancy_{ts}.csv")
+            report = run.report
+            parsed, matched = st.columns(2)
+            parsed.metric("Metadata lines parsed", f"{run.metadata_lines:,}", f"-{len(run.issues):,} unparsed" if run.issues else None)
+            matched.metric("CSV rows matched", f"{run.rows - run.unmatched:,} of {run.rows:,}")
+            if len(report):
+                st.warning(f"⚠️ {len(report):,} unparsed or unmatched ids.")
+                st.dataframe(report.head(100), hide_index=True)
+                st.download_button("📥 Download Merge Report", data=report.to_csv(index=False),
+                                   file_name=f"merge_report_{ts}.csv", mime="text/csv")
         except Exception as e:
             st.error(f"Error: {e}")
+
+# ------------------- 📈 METRICS PANEL -------------------
+with st.sidebar.expander("📈 Metrics"):
+    rows = metrics.METRICS.rows()
+    if not rows:
+        st.caption("Nothing recorded yet. Run a scrape, batch, fetch, upload or merge.")
+    else:
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        st.download_button("📥 metrics.json", metrics.METRICS.to_json(), file_name="metrics.json",
+                           mime="application/json")
+        st.download_button("📥 metrics.prom (Prometheus)", metrics.METRICS.to_prometheus(), file_name="metrics.prom",
+                           mime="text/plain")
+        if st.button("♻️ Reset metrics"):
+            metrics.METRICS.reset()
+            st.rerun()
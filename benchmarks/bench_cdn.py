@@ -0,0 +1,45 @@
+"""Tab 6 CDN URL transform: original iterrows loop versus CdnTransformer.
+
+    python -m benchmarks.bench_cdn --rows 10000 100000 1000000 --distinct 0.2
+"""
+import argparse
+import time
+
+from quotetool import cdn
+from tests.data import synthetic_urls
+from tests.legacy import legacy_transform
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--distinct", type=float, default=0.2, help="share of distinct keys")
+    parser.add_argument("--legacy-max", type=int, default=200_000, help="skip the slow loop above this size")
+    args = parser.parse_args()
+
+    presets = [cdn.STANDARD, cdn.parse_preset("thumbnailurl=300x300:cover"), cdn.parse_preset("squareurl=1080x1080:contain")]
+    print(f"{'rows':>9} {'legacy s':>9} {'1 preset s':>11} {'3 presets s':>12} {'rows/s':>11} {'speedup':>8}")
+    for rows in args.rows:
+        df = synthetic_urls(rows, args.distinct)
+        start = time.perf_counter()
+        one = cdn.CdnTransformer().apply(df)
+        vectorized = time.perf_counter() - start
+        start = time.perf_counter()
+        three = cdn.CdnTransformer(presets).apply(df)
+        multi = time.perf_counter() - start
+        if not one["standardurl"].equals(three["standardurl"]):
+            raise SystemExit("presets disagree on standardurl")
+
+        legacy = speedup = float("nan")
+        if rows <= args.legacy_max:
+            start = time.perf_counter()
+            expected = legacy_transform(df)
+            legacy = time.perf_counter() - start
+            if one["standardurl"].tolist() != expected:
+                raise SystemExit(f"transformer output differs from the original at {rows} rows")
+            speedup = legacy / vectorized
+        print(f"{rows:>9} {legacy:>9.2f} {vectorized:>11.2f} {multi:>12.2f} {rows / vectorized:>11,.0f} {speedup:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Tab 6 duplicate skipping against moto: PUTs saved, repeat runs, index rebuild.
+
+Each keyword gets fresh images plus copies of images from other keywords.
+With ``--near`` (needs Pillow) some copies are re-encoded at a smaller
+size, so only the perceptual hash matches them.
+
+    python -m benchmarks.bench_dedup --keywords 5 --per-keyword 20 --near
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+import boto3
+from moto import mock_aws
+
+from benchmarks.bench_s3 import BUCKET, add_latency, new_bucket
+from quotetool import dedup, media
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def picture(seed, size=(256, 256), quality=90):
+    if Image is None:
+        return random.Random(str(seed)).randbytes(48 * 1024)
+    rng = random.Random(str(seed))
+    # Coarse blocks, so resizing keeps the gradients the dHash looks at.
+    small = Image.frombytes("L", (8, 8), bytes(rng.randrange(256) for _ in range(64))).resize(size, Image.BILINEAR)
+    buffer = io.BytesIO()
+    small.convert("RGB").save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+class ImageSet:
+    """Writes a keyword's images on demand, like ``simple_image_download``."""
+
+    def __init__(self, root, keywords, per_keyword, near):
+        self.root = root
+        self.plan = {}
+        rng = random.Random(1)
+        for k, keyword in enumerate(keywords):
+            images = []
+            for j in range(per_keyword):
+                if k and j % 4 == 0:  # exact copy of an earlier keyword's image
+                    images.append(self.plan[keywords[rng.randrange(k)]][j])
+                elif k and near and j % 4 == 1:  # keyword 0's picture, re-encoded smaller
+                    images.append(picture((0, j), size=(180, 180), quality=70))
+                else:
+                    images.append(picture((k, j)))
+            self.plan[keyword] = images
+
+    def download(self, keyword, count):
+        folder = os.path.join(self.root, keyword)
+        os.makedirs(folder, exist_ok=True)
+        for j, data in enumerate(self.plan[keyword][:count]):
+            with open(os.path.join(folder, f"{keyword}_{j + 1}.jpg"), "wb") as f:
+                f.write(data)
+
+
+def count_puts(s3):
+    counter = {"puts": 0}
+
+    def count(**kwargs):
+        counter["puts"] += 1
+    s3.meta.events.register("before-call.s3.PutObject", count)
+    s3.meta.events.register("before-call.s3.CreateMultipartUpload", count)
+    return counter
+
+
+def run(s3, index, images, keywords, per_keyword, root):
+    with media.S3Uploader(s3, BUCKET, delete_after=True, index=index) as uploader:
+        uploads, errors = media.download_and_upload(keywords, per_keyword, images.download, uploader, root=root)
+    if errors or any(u.error for u in uploads):
+        raise SystemExit("uploads failed")
+    return uploads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keywords", type=int, default=5)
+    parser.add_argument("--per-keyword", type=int, default=20)
+    parser.add_argument("--near", action="store_true", help="also plant re-encoded near-duplicates (needs Pillow)")
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    if args.near and Image is None:
+        raise SystemExit("--near needs Pillow")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+    workdir = tempfile.mkdtemp()
+    root = os.path.join(workdir, "simple_images")
+    keywords = [f"keyword {k}" for k in range(args.keywords)]
+    images = ImageSet(root, keywords, args.per_keyword, args.near)
+    total = args.keywords * args.per_keyword
+
+    with mock_aws():
+        s3 = new_bucket(add_latency(media.create_s3_client(), args.latency))
+        puts = count_puts(s3)
+        index = dedup.ImageIndex(os.path.join(workdir, "index.sqlite"), near_duplicates=args.near)
+        start = time.perf_counter()
+        uploads = run(s3, index, images, keywords, args.per_keyword, root)
+        elapsed = time.perf_counter() - start
+        duplicates = [u for u in uploads if u.duplicate_of]
+        keys = {obj["Key"] for obj in s3.list_objects_v2(Bucket=BUCKET).get("Contents", [])}
+        if puts["puts"] != total - len(duplicates) or any(u.cdn_url != media.cdn_url_for(u.duplicate_of) for u in duplicates):
+            raise SystemExit("duplicates were uploaded or point at the wrong URL")
+        if any(u.duplicate_of not in keys for u in duplicates):
+            raise SystemExit("a duplicate points at a key that is not in the bucket")
+        print(f"first run:  {total} images, {puts['puts']} PUTs, {len(duplicates)} duplicates skipped, {elapsed:.2f} s")
+
+        puts["puts"] = 0
+        again = run(s3, index, images, keywords, args.per_keyword, root)
+        if puts["puts"] or not all(u.duplicate_of for u in again):
+            raise SystemExit("second run uploaded images that are already in the bucket")
+        print(f"second run: {total} images, 0 PUTs")
+        expected = dict(index.conn.execute("SELECT sha256, key FROM images"))
+        index.close()
+
+        rebuilt = dedup.ImageIndex(os.path.join(workdir, "rebuilt.sqlite"))
+        start = time.perf_counter()
+        indexed = rebuilt.rebuild(s3, BUCKET, media.S3_PREFIX)
+        if dict(rebuilt.conn.execute("SELECT sha256, key FROM images")) != expected:
+            raise SystemExit("index rebuilt from the bucket listing differs")
+        print(f"rebuild:    {indexed} objects from the bucket listing in {time.perf_counter() - start:.2f} s")
+
+        # Objects uploaded before the index existed carry no hash metadata.
+        legacy = boto3.client("s3", region_name=media.REGION_NAME)
+        legacy.put_object(Bucket=BUCKET, Key=f"{media.S3_PREFIX}legacy/old.jpg", Body=images.plan[keywords[0]][0] + b"!")
+        if rebuilt.rebuild(s3, BUCKET, media.S3_PREFIX) != indexed + 1:
+            raise SystemExit("rebuild skipped an object without hash metadata")
+        rebuilt.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Tab 4 result download: original whole-text rewrite versus streamed chunks.
+
+Reports peak Python memory for each download, then the time to index the
+file by custom_id and to look records up.
+
+    python -m benchmarks.bench_download --requests 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fake_azure import FakeAzureOpenAI
+from quotetool import results
+from tests.data import completed_output
+from tests.legacy import legacy_download
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    client = FakeAzureOpenAI(validation_time=0, requests_per_second=1e12)
+    file_id = completed_output(client, args.requests)
+    size = len(client.stored_files[file_id]) / 2**20
+    workdir = tempfile.mkdtemp()
+    legacy_path, streamed_path = os.path.join(workdir, "legacy.jsonl"), os.path.join(workdir, "streamed.jsonl")
+
+    legacy_s, legacy_mb = measure(legacy_download, client, file_id, legacy_path)
+    streamed_s, streamed_mb = measure(results.download_file, client, file_id, streamed_path)
+    with open(legacy_path, "rb") as a, open(streamed_path, "rb") as b:
+        if a.read() != b.read():
+            raise SystemExit("streamed download differs from the original")
+    print(f"file: {size:.1f} MB, {args.requests} records")
+    print(f"{'download':>10} {'s':>7} {'peak MB':>8}")
+    print(f"{'legacy':>10} {legacy_s:>7.2f} {legacy_mb:>8.1f}")
+    print(f"{'streamed':>10} {streamed_s:>7.2f} {streamed_mb:>8.1f}")
+
+    start = time.perf_counter()
+    index = results.ResultIndex(streamed_path)
+    built = time.perf_counter() - start
+    if len(index) != args.requests or index.unparsed():
+        raise SystemExit("index is missing records")
+    ids = random.Random(0).sample(index.custom_ids(), min(args.lookups, args.requests))
+    start = time.perf_counter()
+    for custom_id in ids:
+        if index[custom_id]["custom_id"] != custom_id:
+            raise SystemExit(f"lookup of {custom_id} returned the wrong record")
+    lookup = (time.perf_counter() - start) / len(ids)
+    index.close()
+    print(f"index build {built:.2f} s, lookup {lookup * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Every stage end to end, offline, with a JSON report to compare between versions.
+
+The stages run in order against local stand-ins:
+
+- ``scrape``: Tab 1 against :class:`~benchmarks.stub_server.StubQuoteServer`.
+- ``structure``: Tab 2 on a synthetic quotes CSV (``--authors`` x ``--quotes``).
+- ``batch``: Tab 3 and Tab 4 on its output. It prepares the JSONL, submits it
+  to :class:`~benchmarks.fake_azure.FakeAzureOpenAI`, then fetches the
+  results and copies them to a fake Blob container.
+- ``merge``: Tab 7 on the structured CSV and the fetched results.
+- ``images``: Tab 6 with a fake downloader, moto S3 and the CDN columns.
+
+Each stage runs in a fresh interpreter in a scratch directory, so its peak
+RSS is its own and its ``.cache/`` starts empty. Wall time and RSS both
+include the stage's imports, as a CLI run would. The report also holds
+items/sec and the stage's :mod:`quotetool.metrics` timers.
+
+    python -m benchmarks.bench_e2e --authors 2000 --quotes 12 --json e2e.json
+    python -m benchmarks.bench_e2e --authors 2000 --quotes 12 --compare e2e.json --max-regression 0.25
+
+With ``--compare`` the script prints each stage against the old report and
+exits non-zero when a stage got slower, or its peak RSS grew, by more than
+``--max-regression``.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ["scrape", "structure", "batch", "merge", "images"]
+NEEDS = {"batch": "structure", "merge": "batch"}
+BUCKET = "bench-bucket"
+QUOTES_CSV = "quotes.csv"
+STRUCTURED_CSV = "structured.csv"
+BATCH_TS = "bench"
+SCALE = ["authors", "quotes", "scrape_authors", "scrape_pages", "latency", "keywords", "per_keyword", "image_kb"]
+
+
+def synthetic_quotes(path, authors, quotes):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Quote", "Author"])
+        for q in range(quotes):
+            for a in range(authors):
+                writer.writerow([f"Quote {q} by Author {a}: small steps, taken every day, add up.", f"Author {a}"])
+
+
+def run_scrape(args):
+    from benchmarks.stub_server import StubQuoteServer
+    from quotetool import pipeline
+
+    with StubQuoteServer(pages=args.scrape_pages, latency=args.latency) as server:
+        urls = [f"{server.base_url}/author-{i}-quotes" for i in range(args.scrape_authors)]
+        run = pipeline.scrape_job(urls, "bench", resume=False, max_pages=args.scrape_pages + 1,
+                                  rate_limit=0, base_url=server.base_url)
+    expected = args.scrape_authors * args.scrape_pages * 10
+    if run.total_rows != expected:
+        raise SystemExit(f"scraped {run.total_rows} rows, expected {expected}")
+    return run.total_rows, {}
+
+
+def run_structure(args):
+    from quotetool import ingest, pipeline
+
+    with ingest.CsvOutput(STRUCTURED_CSV) as output:
+        authors = pipeline.structure_csv(QUOTES_CSV, output)
+    if authors != args.authors:
+        raise SystemExit(f"structured {authors} authors, expected {args.authors}")
+    return args.authors * args.quotes, {}
+
+
+def run_batch(args):
+    from benchmarks.fake_azure import FakeAzureOpenAI, FakeContainerClient
+    from quotetool import clients, pipeline, registry
+
+    steps = {}
+    start = time.perf_counter()
+    prep = pipeline.prepare_batch(STRUCTURED_CSV, ts=BATCH_TS)
+    steps["prepare"] = time.perf_counter() - start
+
+    client = FakeAzureOpenAI(latency=args.latency, validation_time=0, requests_per_second=1e9)
+    container = FakeContainerClient(latency=args.latency)
+    batch_registry = registry.BatchRegistry()
+    try:
+        start = time.perf_counter()
+        batches = pipeline.submit_batches(client, prep, batch_registry)
+        steps["submit"] = time.perf_counter() - start
+
+        poller = registry.BatchPoller(client, batch_registry, base_interval=0.05,
+                                      on_downloaded=clients.output_uploader(container))
+        start = time.perf_counter()
+        pending = pipeline.fetch_results(poller, [entry["batch_id"] for entry in batches], wait=True,
+                                         interval=0.05, timeout=300)
+        steps["fetch"] = time.perf_counter() - start
+    finally:
+        batch_registry.close()
+    if pending or len(container.blobs) != len(batches):
+        raise SystemExit(f"{len(pending)} batches still pending, {len(container.blobs)} of {len(batches)} in Blob")
+    return prep.submitted, steps
+
+
+def run_merge(args):
+    from quotetool import ingest, pipeline, registry
+
+    batch_registry = registry.BatchRegistry()
+    try:
+        outputs = [row["output_path"] for row in batch_registry.all() if row["output_path"]]
+    finally:
+        batch_registry.close()
+    structured = f"structured-data-id_{BATCH_TS}.csv"
+    with ingest.CsvOutput("merged.csv") as output:
+        run = pipeline.merge_metadata(structured, outputs, output)
+    if run.unmatched or run.rows != args.authors:
+        raise SystemExit(f"merged {run.rows - run.unmatched} of {run.rows} rows, expected {args.authors}")
+    return run.rows, {}
+
+
+def run_images(args):
+    import boto3
+    from moto import mock_aws
+
+    from benchmarks.bench_s3 import FakeDownloader
+    from quotetool import media, pipeline
+
+    keywords = [f"keyword {i}" for i in range(args.keywords)]
+    downloader = FakeDownloader(media.IMAGES_ROOT, latency=args.latency, size=args.image_kb * 1024)
+    with mock_aws():
+        s3 = media.create_s3_client(region_name=media.REGION_NAME)
+        boto3.client("s3", region_name=media.REGION_NAME).create_bucket(
+            Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": media.REGION_NAME})
+        run = pipeline.upload_images(keywords, args.per_keyword, downloader.download, s3, bucket=BUCKET)
+    images = args.keywords * args.per_keyword
+    if run.download_errors or len(run.frame) != images:
+        raise SystemExit(f"uploaded {len(run.frame)} of {images} images: {run.download_errors}")
+    return images, {}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+def run_stage(args):
+    """Child side: run one stage and print its record as JSON."""
+    from quotetool import metrics
+
+    start = time.perf_counter()
+    items, steps = globals()[f"run_{args.stage}"](args)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "seconds": round(elapsed, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "items": items,
+        "items_per_s": round(items / elapsed, 1),
+        "steps": {name: round(seconds, 4) for name, seconds in steps.items()},
+        "metrics": metrics.METRICS.rows(),
+    }))
+
+
+def spawn(stage, args, workdir):
+    env = {**os.environ, "PYTHONPATH": ROOT + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    scale = [f"--{name.replace('_', '-')}={getattr(args, name)}" for name in SCALE]
+    proc = subprocess.run([sys.executable, "-m", "benchmarks.bench_e2e", "--stage", stage, *scale],
+                          cwd=workdir, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        raise SystemExit(f"stage {stage} failed:\n{proc.stderr[-2000:]}{proc.stdout[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, max_regression):
+    """Print each stage against ``baseline``; return the stages over ``max_regression``."""
+    if baseline["scale"] != report["scale"]:
+        print(f"warning: baseline scale {baseline['scale']} differs from {report['scale']}")
+    print(f"\n{'vs ' + (baseline.get('revision') or 'baseline'):<12} {'old s':>8} {'new s':>8} {'ratio':>6}"
+          f" {'old MB':>8} {'new MB':>8} {'ratio':>6}")
+    over = []
+    for stage, row in report["stages"].items():
+        old = baseline["stages"].get(stage)
+        if old is None:
+            continue
+        time_ratio = row["seconds"] / old["seconds"]
+        rss_ratio = row["peak_rss_mb"] / old["peak_rss_mb"]
+        print(f"{stage:<12} {old['seconds']:>8.2f} {row['seconds']:>8.2f} {time_ratio:>6.2f}"
+              f" {old['peak_rss_mb']:>8.1f} {row['peak_rss_mb']:>8.1f} {rss_ratio:>6.2f}")
+        if max_regression is not None and max(time_ratio, rss_ratio) > 1 + max_regression:
+            over.append(stage)
+    return over
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--authors", type=int, default=1000, help="authors in the synthetic quotes CSV")
+    parser.add_argument("--quotes", type=int, default=12, help="quotes per author")
+    parser.add_argument("--scrape-authors", type=int, default=20, help="author slugs on the stub server")
+    parser.add_argument("--scrape-pages", type=int, default=5, help="pages of 10 quotes per slug")
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds per stub HTTP, Azure, Blob or download call")
+    parser.add_argument("--keywords", type=int, default=10)
+    parser.add_argument("--per-keyword", type=int, default=10, help="images per keyword")
+    parser.add_argument("--image-kb", type=int, default=64)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=1, help="keep each stage's fastest of this many runs")
+    parser.add_argument("--json", help="write the report here")
+    parser.add_argument("--compare", help="an earlier --json report")
+    parser.add_argument("--max-regression", type=float, help="fail when a stage is this much slower or larger (0.25 = 25%%)")
+    parser.add_argument("--stage", choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.stage:
+        return run_stage(args)
+    for stage in args.stages:
+        if stage in NEEDS and NEEDS[stage] not in args.stages:
+            parser.error(f"{stage} needs the {NEEDS[stage]} stage")
+
+    report = {
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "scale": {name: getattr(args, name) for name in SCALE},
+        "stages": {},
+    }
+    print(f"{'stage':<12} {'seconds':>8} {'items/s':>10} {'peak RSS MB':>12}  steps")
+    for attempt in range(args.repeat):
+        workdir = tempfile.mkdtemp()
+        synthetic_quotes(os.path.join(workdir, QUOTES_CSV), args.authors, args.quotes)
+        for stage in [stage for stage in STAGES if stage in args.stages]:
+            row = spawn(stage, args, workdir)
+            best = report["stages"].get(stage)
+            if best is None or row["seconds"] < best["seconds"]:
+                report["stages"][stage] = row
+    for stage, row in report["stages"].items():
+        steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in row["steps"].items())
+        print(f"{stage:<12} {row['seconds']:>8.2f} {row['items_per_s']:>10.1f} {row['peak_rss_mb']:>12.1f}  {steps}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            over = compare(report, json.load(f), args.max_regression)
+        if over:
+            raise SystemExit(f"regressed by more than {args.max_regression:.0%}: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
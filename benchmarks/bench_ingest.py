@@ -0,0 +1,66 @@
+"""Peak memory of whole-file versus chunked CSV handling (Tab 3 cleaning).
+
+    python -m benchmarks.bench_ingest --rows 100000
+
+Both variants split a synthetic structured CSV into clean/removed rows and
+produce the CSVs the tab offers for download. Peak memory is measured with
+``tracemalloc``, which also sees NumPy buffers; both peaks include the
+final download bytes. The check compares the working memory above those
+bytes, which both variants must hold, and fails if the chunked path's is
+not clearly smaller or if its output differs. Chunks default to a tenth of
+the rows (at most 10,000), so small inputs are still split.
+"""
+import argparse
+import io
+import time
+import tracemalloc
+
+import pandas as pd
+
+from quotetool import ingest
+from tests.data import synthetic_structured_csv
+from tests.legacy import legacy_clean
+
+
+def chunked(raw, chunksize=10_000):
+    with ingest.CsvOutput() as clean_out, ingest.CsvOutput() as removed_out:
+        for df in ingest.read_csv_chunks(io.BytesIO(raw), chunksize=chunksize):
+            df = df.replace(r'^\s*$', pd.NA, regex=True).replace("NA", pd.NA)
+            clean_out.write(df.dropna())
+            removed_out.write(df[df.isna().any(axis=1)])
+        return clean_out.getvalue(), removed_out.getvalue()
+
+
+def measure(func, raw, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(raw, *args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--chunksize", type=int, help="rows per chunk (default: rows / 10, at most 10,000)")
+    args = parser.parse_args()
+    chunksize = args.chunksize or min(10_000, max(args.rows // 10, 1))
+
+    raw = synthetic_structured_csv(args.rows)
+    print(f"input: {args.rows} rows, {len(raw) / 2**20:.1f} MiB, chunks of {chunksize} rows")
+    expected, whole_s, whole_peak = measure(legacy_clean, raw)
+    got, chunk_s, chunk_peak = measure(chunked, raw, chunksize)
+    output = sum(map(len, expected))
+    print(f"{'variant':>8} {'seconds':>8} {'peak MiB':>9} {'working MiB':>12}")
+    print(f"{'whole':>8} {whole_s:>8.2f} {whole_peak / 2**20:>9.1f} {(whole_peak - output) / 2**20:>12.1f}")
+    print(f"{'chunked':>8} {chunk_s:>8.2f} {chunk_peak / 2**20:>9.1f} {(chunk_peak - output) / 2**20:>12.1f}")
+    if got != expected:
+        raise SystemExit("chunked output differs from the whole-file output")
+    if chunk_peak - output >= (whole_peak - output) * 0.75:
+        raise SystemExit("chunked ingestion did not reduce peak memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Tab 7 metadata merge: original dict + apply(norm) + map passes versus quotetool.merge.
+
+The JSONL mixes fenced and bare answers, failed requests and broken lines;
+CSV ids vary in case and zero-padding. The original code drops every fenced
+answer, so parity is checked on the rows it did fill.
+
+    python -m benchmarks.bench_merge --lines 1000000
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from quotetool import ingest, merge
+from tests.data import synthetic_batch_output
+from tests.legacy import legacy_merge
+
+
+def new_merge(jsonl_bytes, csv_bytes):
+    source = io.BytesIO(jsonl_bytes)
+    source.name = "bench.jsonl"
+    metadata, issues = merge.read_metadata([source])
+    merger = merge.MetadataMerger(metadata)
+    chunks = [merger.merge(df)[0] for df in ingest.read_csv_chunks(io.BytesIO(csv_bytes))]
+    return pd.concat(chunks, ignore_index=True), merger.report(issues)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    jsonl_bytes, csv_bytes, kinds = synthetic_batch_output(args.lines)
+    print(f"JSONL: {args.lines:,} lines, {len(jsonl_bytes) / 2**20:.0f} MB")
+
+    start = time.perf_counter()
+    expected = legacy_merge(jsonl_bytes, pd.read_csv(io.BytesIO(csv_bytes), dtype=str))
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    merged, report = new_merge(jsonl_bytes, csv_bytes)
+    new = time.perf_counter() - start
+
+    filled_before = expected["storytitle"] != ""
+    for field in merge.METADATA_FIELDS:
+        if not merged[field][filled_before].equals(expected[field][filled_before]):
+            raise SystemExit(f"{field} differs from the original on rows it filled")
+    good = int(np.isin(kinds, [0, 1]).sum())
+    filled = int((merged["storytitle"] != "").sum())
+    if filled != good:
+        raise SystemExit(f"filled {filled} rows, expected {good}")
+    if len(report) != (args.lines - good) + (len(merged) - good):
+        raise SystemExit("report does not account for every unparsed line and unmatched row")
+    print(f"{'':>9} {'s':>7} {'lines/s':>10} {'rows filled':>12}")
+    print(f"{'original':>9} {legacy:>7.2f} {args.lines / legacy:>10,.0f} {int(filled_before.sum()):>12,}")
+    print(f"{'merge':>9} {new:>7.2f} {args.lines / new:>10,.0f} {filled:>12,}")
+    print(report["problem"].value_counts().to_string())
+
+
+if __name__ == "__main__":
+    main()
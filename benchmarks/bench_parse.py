@@ -0,0 +1,65 @@
+"""Parser backend parity check and pages/sec micro-benchmark.
+
+    python -m benchmarks.bench_parse            # verify, then time each backend
+    python -m benchmarks.bench_parse --verify   # parity only
+
+Every available backend must reproduce the original Tab 1 extraction
+(:func:`tests.legacy.reference_parse`) on the saved pages in
+``benchmarks/fixtures`` and on a synthetic stub page;
+``tests/test_parse.py`` checks the same.
+"""
+import argparse
+import time
+
+from quotetool.parse import available_parsers, parse_quotes_page
+from tests.data import parser_pages
+from tests.legacy import reference_parse
+
+
+def verify(pages):
+    failures = 0
+    for name, content in pages.items():
+        expected = reference_parse(content)
+        for parser in available_parsers():
+            got = parse_quotes_page(content, parser)
+            if got != expected:
+                failures += 1
+                print(f"MISMATCH {parser} on {name}")
+                for want, have in zip(expected, got):
+                    if want != have:
+                        print(f"  expected {want!r}\n  got      {have!r}")
+                        break
+                else:
+                    print(f"  expected {len(expected)} rows, got {len(got)}")
+    print(f"parity: {len(available_parsers())} backends x {len(pages)} pages, {failures} mismatches")
+    return failures == 0
+
+
+def bench(pages, repeat):
+    contents = list(pages.values())
+    print(f"{'backend':>12} {'pages/s':>9}")
+    for parser in ["reference"] + available_parsers():
+        parse = reference_parse if parser == "reference" else lambda c: parse_quotes_page(c, parser)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for content in contents:
+                parse(content)
+        elapsed = time.perf_counter() - start
+        print(f"{parser:>12} {repeat * len(contents) / elapsed:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--verify", action="store_true", help="only run the parity check")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = parser_pages()
+    if not verify(pages):
+        raise SystemExit(1)
+    if not args.verify:
+        bench(pages, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
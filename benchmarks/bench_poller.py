@@ -0,0 +1,80 @@
+"""Tab 4 batch polling against the fake Azure client: serial versus concurrent.
+
+    python -m benchmarks.bench_poller --batches 20 --latency 0.2 --workers 1 8
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.fake_azure import FakeAzureOpenAI
+from quotetool import batch, registry, results
+
+
+def submit(client, reg, batches, requests_per_batch):
+    ts = str(int(time.time()))
+    for part in range(1, batches + 1):
+        lines = [
+            batch.dumps(batch.build_request(f"{part}-Author_{i}-1", batch.build_prompt(f"Author {i}", ["A quote."])))
+            for i in range(requests_per_batch)
+        ]
+        batch_file = client.files.create(file=io.BytesIO(b"\n".join(lines) + b"\n"), purpose="batch")
+        job = client.batches.create(input_file_id=batch_file.id, endpoint="/chat/completions", completion_window="24h")
+        reg.register(job.id, ts, part, batches, file_id=batch_file.id)
+
+
+def run(workers, args):
+    workdir = tempfile.mkdtemp()
+    client = FakeAzureOpenAI(latency=args.latency, validation_time=args.validation, requests_per_second=args.rps,
+                             fail_every=args.fail_every)
+    reg = registry.BatchRegistry(os.path.join(workdir, "registry.sqlite"))
+    submit(client, reg, args.batches, args.requests)
+    # base_interval=0 keeps every unfinished batch due, so each round polls them all.
+    poller = registry.BatchPoller(client, reg, max_workers=workers, base_interval=0, download_dir=workdir)
+    rounds, start = 0, time.perf_counter()
+    round_times = []
+    while reg.due(batch_ids=[row["batch_id"] for row in reg.all()]):
+        round_start = time.perf_counter()
+        poller.poll_once()
+        round_times.append(time.perf_counter() - round_start)
+        rounds += 1
+    elapsed = time.perf_counter() - start
+
+    rows = reg.all()
+    for row in rows:
+        if row["status"] != "completed" or not row["output_path"]:
+            raise SystemExit(f"{row['batch_id']} ended as {row['status']} without output: {row['error']}")
+        with open(row["output_path"], "rb") as f:
+            records = [json.loads(line) for line in f]
+        failed = results.count_lines(row["error_path"]) if row["error_path"] else 0
+        if failed != row["failed"] or len(records) + failed != args.requests \
+                or any(batch.parse_output_record(r)[1] is None for r in records):
+            raise SystemExit(f"{row['output_path']} is incomplete")
+        with results.ResultIndex(row["output_path"]) as index:
+            if index.custom_ids() != [r["custom_id"] for r in records] or index[records[-1]["custom_id"]] != records[-1]:
+                raise SystemExit(f"{row['output_path']} index does not match the file")
+    reg.close()
+    return elapsed, rounds, sum(round_times) / len(round_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="requests per batch")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake API call")
+    parser.add_argument("--validation", type=float, default=0.5, help="seconds each batch spends validating")
+    parser.add_argument("--rps", type=float, default=500.0, help="fake processing rate per batch")
+    parser.add_argument("--fail-every", type=int, default=50, help="every n-th request lands in the error file")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'total s':>8} {'rounds':>7} {'s/round':>8}")
+    for workers in args.workers:
+        elapsed, rounds, per_round = run(workers, args)
+        print(f"{workers:>8} {elapsed:>8.2f} {rounds:>7} {per_round:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Tab 6 S3 upload: original serial loop versus the pooled uploader, on moto.
+
+Every S3 request gets ``--latency`` seconds added so the in-process moto
+backend behaves like a remote endpoint. ``--pipeline`` times the whole
+download + upload run instead. It compares the original phases (every
+keyword downloaded, then everything uploaded) with the overlapped pipeline,
+using a fake downloader that takes ``--download-latency`` per image. It also
+reports peak disk usage.
+
+    python -m benchmarks.bench_s3 --images 200 --latency 0.02 --workers 4 16
+    python -m benchmarks.bench_s3 --pipeline --keywords 10 --per-keyword 20
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import boto3
+from moto import mock_aws
+
+from quotetool import media
+
+BUCKET = "bench-bucket"
+
+
+def legacy_upload(s3, root, bucket=BUCKET, s3_prefix=media.S3_PREFIX, cdn_base_url=media.CDN_BASE_URL):
+    # The pre-pool Tab 6 loop, minus the st.write calls.
+    results = []
+    for folder, _, files_ in os.walk(root):
+        for f in files_:
+            path = os.path.join(folder, f)
+            kf = os.path.basename(folder).replace(" ", "-")
+            fname = f.replace(" ", "-")
+            key = f"{s3_prefix}{kf}/{fname}"
+            s3.upload_file(path, bucket, key)
+            results.append([kf, fname, f"{cdn_base_url}{key}"])
+    return results
+
+
+def synthetic_images(root, images, keywords=5, size=64 * 1024):
+    for i in range(images):
+        folder = os.path.join(root, f"keyword {i % keywords}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"keyword {i % keywords}_{i}.jpg"), "wb") as f:
+            f.write(os.urandom(size))
+
+
+class FakeDownloader:
+    """Writes ``count`` random images to ``<root>/<keyword>/<keyword>_<n>.jpg``."""
+
+    def __init__(self, root, latency=0.05, size=64 * 1024):
+        self.root = root
+        self.latency = latency
+        self.size = size
+
+    def download(self, keyword, count):
+        folder = os.path.join(self.root, keyword)
+        os.makedirs(folder, exist_ok=True)
+        for j in range(count):
+            time.sleep(self.latency)
+            with open(os.path.join(folder, f"{keyword}_{j + 1}.jpg"), "wb") as f:
+                f.write(os.urandom(self.size))
+
+
+class DiskMonitor(threading.Thread):
+    """Samples the bytes under ``root`` until stopped; keeps the peak."""
+
+    def __init__(self, root, interval=0.01):
+        super().__init__(daemon=True)
+        self.root = root
+        self.interval = interval
+        self.peak = 0
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            total = 0
+            for folder, _, files_ in os.walk(self.root):
+                for f in files_:
+                    try:
+                        total += os.path.getsize(os.path.join(folder, f))
+                    except OSError:
+                        pass  # uploaded and deleted mid-walk
+            self.peak = max(self.peak, total)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.done.set()
+        self.join()
+
+
+def add_latency(s3, latency):
+    if latency:
+        s3.meta.events.register("before-sign.s3.*", lambda **kwargs: time.sleep(latency))
+    return s3
+
+
+def bucket_keys(s3):
+    pages = s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET)
+    return sorted(obj["Key"] for page in pages for obj in page.get("Contents", []))
+
+
+def new_bucket(s3):
+    s3.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": media.REGION_NAME})
+    return s3
+
+
+def run_pipeline(args):
+    keywords = [f"keyword {i}" for i in range(args.keywords)]
+    images = args.keywords * args.per_keyword
+    print(f"{'run':>10} {'s':>7} {'images/s':>9} {'peak disk MB':>13}")
+
+    root = os.path.join(tempfile.mkdtemp(), "simple_images")
+    with mock_aws():
+        s3 = new_bucket(add_latency(boto3.client("s3", region_name=media.REGION_NAME), args.latency))
+        downloader = FakeDownloader(root, args.download_latency)
+        start = time.perf_counter()
+        with DiskMonitor(root) as disk:
+            for keyword in keywords:
+                downloader.download(keyword, args.per_keyword)
+            expected = legacy_upload(s3, root)
+        elapsed = time.perf_counter() - start
+        expected_keys = bucket_keys(s3)
+        print(f"{'phased':>10} {elapsed:>7.2f} {images / elapsed:>9.1f} {disk.peak / 2**20:>13.1f}")
+    shutil.rmtree(root)
+
+    with mock_aws():
+        s3 = new_bucket(add_latency(media.create_s3_client(region_name=media.REGION_NAME), args.latency))
+        downloader = FakeDownloader(root, args.download_latency)
+        start = time.perf_counter()
+        with DiskMonitor(root) as disk, media.S3Uploader(s3, BUCKET, delete_after=True) as uploader:
+            uploads, errors = media.download_and_upload(keywords, args.per_keyword, downloader.download, uploader, root=root)
+        elapsed = time.perf_counter() - start
+        rows = [[u.job.keyword, u.job.filename, u.cdn_url] for u in uploads if not u.error]
+        if errors or sorted(rows) != sorted(expected) or bucket_keys(s3) != expected_keys:
+            raise SystemExit("pipeline uploads differ from the phased run")
+        if any(files_ for _, _, files_ in os.walk(root)):
+            raise SystemExit("pipeline left uploaded files on disk")
+        print(f"{'pipeline':>10} {elapsed:>7.2f} {images / elapsed:>9.1f} {disk.peak / 2**20:>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every S3 request")
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--pipeline", action="store_true", help="time download + upload end to end")
+    parser.add_argument("--keywords", type=int, default=10)
+    parser.add_argument("--per-keyword", type=int, default=20)
+    parser.add_argument("--download-latency", type=float, default=0.02, help="seconds per fake image download")
+    args = parser.parse_args()
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    if args.pipeline:
+        return run_pipeline(args)
+
+    root = os.path.join(tempfile.mkdtemp(), "simple_images")
+    synthetic_images(root, args.images)
+
+    print(f"{'uploader':>12} {'s':>7} {'images/s':>9}")
+    with mock_aws():
+        s3 = new_bucket(add_latency(boto3.client("s3", region_name=media.REGION_NAME), args.latency))
+        start = time.perf_counter()
+        expected = legacy_upload(s3, root)
+        serial = time.perf_counter() - start
+        expected_keys = bucket_keys(s3)
+        print(f"{'serial':>12} {serial:>7.2f} {len(expected) / serial:>9.1f}")
+
+    for workers in args.workers:
+        with mock_aws():
+            s3 = new_bucket(add_latency(media.create_s3_client(region_name=media.REGION_NAME), args.latency))
+            start = time.perf_counter()
+            with media.S3Uploader(s3, BUCKET, max_workers=workers) as uploader:
+                uploads = uploader.upload_all(media.iter_local_images(root))
+            elapsed = time.perf_counter() - start
+            rows = [[u.job.keyword, u.job.filename, u.cdn_url] for u in uploads if not u.error]
+            if rows != expected or bucket_keys(s3) != expected_keys:
+                raise SystemExit(f"pooled upload with {workers} workers differs from the serial loop")
+            print(f"{f'{workers} workers':>12} {elapsed:>7.2f} {len(rows) / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Scraping throughput versus concurrency against the local stub server.
+
+    python -m benchmarks.bench_scrape --slugs 20 --pages 5 --latency 0.05
+"""
+import argparse
+import time
+
+from benchmarks.stub_server import StubQuoteServer
+from quotetool import scrape
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--slugs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=5, help="pages served per slug")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per response")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    slugs = [f"author-{i}-quotes" for i in range(args.slugs)]
+    baseline = None
+    with StubQuoteServer(pages=args.pages, latency=args.latency) as server:
+        print(f"{'workers':>8} {'seconds':>8} {'pages/s':>8} {'rows':>6}")
+        for workers in args.workers:
+            start = time.perf_counter()
+            results = scrape.scrape_quotes_for_slugs(
+                slugs, max_pages=args.pages + 1, max_workers=workers,
+                rate_limit=0, base_url=server.base_url
+            )
+            elapsed = time.perf_counter() - start
+            rows = [row for slug in slugs for row in results[slug]]
+            # Every run must produce the same rows in the same order.
+            if baseline is None:
+                baseline = rows
+            elif rows != baseline:
+                raise SystemExit(f"output differs from the first run at workers={workers}")
+            fetched = args.slugs * (args.pages + 1)
+            print(f"{workers:>8} {elapsed:>8.2f} {fetched / elapsed:>8.1f} {len(rows):>6}")
+
+
+if __name__ == "__main__":
+    main()
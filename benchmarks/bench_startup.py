@@ -0,0 +1,140 @@
+"""Startup cost of the app and the CLI, measured with ``python -X importtime``.
+
+Every scenario runs in a fresh interpreter. The app scenarios render
+``app.py`` through Streamlit's ``AppTest`` with one tab selected, the way a
+browser opening that tab does, then rerun it once. ``eager imports`` renders
+a page that first imports every heavy dependency, as the app did before its
+imports became lazy.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --json startup.json --max-import-ms 1500
+
+With ``--max-import-ms`` the script exits non-zero when a scenario (other
+than the eager reference) spends longer than that importing modules.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+HEAVY = ["pandas", "numpy", "boto3", "openai", "azure.storage.blob", "bs4", "requests", "PIL"]
+TABS = [
+    "🕸️ Scrape Quotes from QuoteFancy",
+    "📊 Structure Quotes by Author",
+    "🧠 Quote Metadata Generator & Azure OpenAI JSONL Creator ",
+    "📦 Azure Batch Result Fetcher & Blob Uploader",
+    "👤 Distinct Author Extractor",
+    "🖼️ Bulk Image Downloader + S3 Uploader + CDN Transformer",
+    "📅 Merge Metadata into Structured CSV",
+]
+# Shaped like the real ones; building the clients never touches the network.
+SECRETS = {
+    "azure_openai_api_key": "key",
+    "azure_blob_connection_string": "DefaultEndpointsProtocol=https;AccountName=bench;AccountKey=a2V5;"
+                                    "EndpointSuffix=core.windows.net",
+    "azure_blob_account_key": "a2V5",
+    "aws_access_key": "key",
+    "aws_secret_key": "secret",
+}
+REPORT = """
+import json, sys
+print(json.dumps({{"heavy": [m for m in {heavy!r} if m in sys.modules], **result}}))
+"""
+APP_SCENARIO = """
+import time
+from streamlit.testing.v1 import AppTest
+at = {loader}
+for name, value in {secrets!r}.items():
+    at.secrets[name] = value
+at.session_state["active_tab"] = {tab!r}
+at.run()
+start = time.perf_counter()
+at.run()
+result = {{"rerun_ms": (time.perf_counter() - start) * 1000, "errors": [str(e.value) for e in at.exception]}}
+"""
+EAGER_PAGE = """
+import streamlit as st
+import pandas, boto3, openai, bs4, requests, azure.storage.blob
+from simple_image_download import simple_image_download
+st.tabs(["one", "two"], key="active_tab", on_change="rerun")
+"""
+
+
+def scenarios():
+    eager = f"AppTest.from_string({EAGER_PAGE!r}, default_timeout=300)"
+    yield "eager imports (before)", APP_SCENARIO.format(loader=eager, secrets={}, tab="one"), None
+    app = f"AppTest.from_file({APP!r}, default_timeout=300)"
+    for number, tab in enumerate(TABS, 1):
+        yield f"app, tab {number}", APP_SCENARIO.format(loader=app, secrets=SECRETS, tab=tab), None
+    for command in ("scrape", "merge"):
+        yield f"cli {command} --help", None, ["-m", "quotetool", command, "--help"]
+
+
+def import_times(stderr):
+    """``{module: cumulative µs}`` for the top-level imports in ``-X importtime`` output."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if cumulative.strip().isdigit() and not name.startswith("  "):  # nested imports are indented
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def run(code, argv, workdir):
+    env = {**os.environ, "PYTHONPATH": ROOT + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    if code is not None:
+        argv = ["-c", code + REPORT.format(heavy=HEAVY)]
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", *argv], cwd=workdir, env=env,
+                          capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode:
+        raise SystemExit(f"{' '.join(argv[:3])} failed:\n{proc.stderr[-2000:]}")
+    times = import_times(proc.stderr)
+    result = json.loads(proc.stdout.strip().splitlines()[-1]) if code is not None else {}
+    if code is None:  # a CLI run cannot report sys.modules; infer it from the import log
+        logged = {line.split("|", 2)[2].strip() for line in proc.stderr.splitlines() if line.count("|") >= 2}
+        result["heavy"] = [m for m in HEAVY if m in logged]
+    if result.get("errors"):
+        raise SystemExit(f"app raised: {result['errors']}")
+    return {
+        "wall_ms": round(wall * 1000, 1),
+        "import_ms": round(sum(times.values()) / 1000, 1),
+        "rerun_ms": round(result["rerun_ms"], 1) if "rerun_ms" in result else None,
+        "heavy": result["heavy"],
+        "slowest": [[name, round(us / 1000, 1)] for name, us in sorted(times.items(), key=lambda kv: -kv[1])[:5]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--max-import-ms", type=float, help="fail when a lazy scenario imports for longer")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()  # the app's .cache/ lands here
+    report = {}
+    print(f"{'scenario':<24} {'wall ms':>8} {'import ms':>10} {'rerun ms':>9}  heavy modules loaded")
+    for name, code, argv in scenarios():
+        report[name] = row = run(code, argv, workdir)
+        rerun = f"{row['rerun_ms']:>9.1f}" if row["rerun_ms"] is not None else f"{'—':>9}"
+        print(f"{name:<24} {row['wall_ms']:>8.1f} {row['import_ms']:>10.1f} {rerun}  {', '.join(row['heavy']) or '—'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": sys.version.split()[0], "scenarios": report}, f, indent=2)
+    if args.max_import_ms is not None:
+        over = [name for name, row in report.items()
+                if not name.startswith("eager") and row["import_ms"] > args.max_import_ms]
+        if over:
+            raise SystemExit(f"import time over {args.max_import_ms:.0f} ms: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Tab 2 author grouping: original loop versus the vectorized pivot.
+
+    python -m benchmarks.bench_structure --rows 10000 100000 1000000
+"""
+import argparse
+import time
+
+from quotetool.structure import structure_by_author
+from tests.data import synthetic_quotes
+from tests.legacy import legacy_structure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy s':>9} {'vector s':>9} {'speedup':>8}")
+    for rows in args.rows:
+        df = synthetic_quotes(rows)
+        start = time.perf_counter()
+        expected = legacy_structure(df)
+        legacy = time.perf_counter() - start
+        start = time.perf_counter()
+        got = structure_by_author(df)
+        vector = time.perf_counter() - start
+        if got.to_csv(index=False) != expected.to_csv(index=False):
+            raise SystemExit(f"vectorized output differs from the original at {rows} rows")
+        print(f"{rows:>10} {legacy:>9.2f} {vector:>9.2f} {legacy / vector:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
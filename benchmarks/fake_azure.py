@@ -0,0 +1,200 @@
+"""In-process stand-in for the Azure OpenAI ``files``/``batches`` API.
+
+Only the calls the app makes are implemented. Batches move from
+``validating`` through ``in_progress`` to ``completed`` on a wall-clock
+schedule. When a batch completes, its output file holds one chat-completion
+response per input request with deterministic metadata. With
+``fail_every=n``, every n-th request goes to the error file instead.
+``latency`` adds a delay to every call, like a network round trip.
+:class:`FakeContainerClient` does the same for the Blob container client.
+"""
+import contextlib
+import itertools
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+
+class _Model(SimpleNamespace):
+    def model_dump(self):
+        return {k: (v.model_dump() if isinstance(v, _Model) else v) for k, v in vars(self).items()}
+
+
+class FakeFileContent:
+    def __init__(self, data):
+        self.content = data
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def iter_bytes(self, chunk_size=65536):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def iter_lines(self):
+        yield from self.content.decode("utf-8").splitlines()
+
+    def write_to_file(self, path):
+        with open(path, "wb") as f:
+            f.write(self.content)
+
+
+def fake_response(request):
+    author = request["body"]["messages"][1]["content"].split("quotes by ", 1)[-1].split(".\n", 1)[0]
+    metadata = {
+        "storytitle": f"Wisdom of {author}",
+        "metadescription": f"Timeless quotes by {author}.",
+        "metakeywords": f"{author}, quotes, wisdom",
+    }
+    return {
+        "id": f"batch_req_{request['custom_id']}",
+        "custom_id": request["custom_id"],
+        "response": {
+            "status_code": 200,
+            "body": {
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "```json\n" + json.dumps(metadata) + "\n```"}}],
+                "usage": {"prompt_tokens": 150, "completion_tokens": 60, "total_tokens": 210},
+            },
+        },
+        "error": None,
+    }
+
+
+def fake_error(request):
+    return {
+        "id": f"batch_req_{request['custom_id']}",
+        "custom_id": request["custom_id"],
+        "response": {"status_code": 400, "body": {"error": {"code": "content_filter", "message": "Filtered."}}},
+        "error": None,
+    }
+
+
+def _jsonl(records):
+    return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+
+class _StreamingFiles:
+    def __init__(self, files):
+        self.files = files
+
+    @contextlib.contextmanager
+    def content(self, file_id):
+        yield self.files.content(file_id)
+
+
+class _Files:
+    def __init__(self, service):
+        self.service = service
+        self.with_streaming_response = _StreamingFiles(self)
+
+    def create(self, file, purpose="batch", **kwargs):
+        self.service.sleep()
+        data = file.read()
+        file_id = self.service.new_id("file")
+        self.service.stored_files[file_id] = data
+        return _Model(id=file_id, object="file", bytes=len(data), purpose=purpose, status="processed")
+
+    def content(self, file_id):
+        self.service.sleep()
+        return FakeFileContent(self.service.stored_files[file_id])
+
+
+class _Batches:
+    def __init__(self, service):
+        self.service = service
+
+    def create(self, input_file_id, endpoint, completion_window, **kwargs):
+        self.service.sleep()
+        requests = [json.loads(line) for line in self.service.stored_files[input_file_id].splitlines() if line.strip()]
+        batch_id = self.service.new_id("batch")
+        self.service.stored_batches[batch_id] = {"created_at": time.time(), "input_file_id": input_file_id, "requests": requests}
+        return self.retrieve(batch_id, _sleep=False)
+
+    def retrieve(self, batch_id, _sleep=True):
+        if _sleep:
+            self.service.sleep()
+        service = self.service
+        state = service.stored_batches[batch_id]
+        total = len(state["requests"])
+        elapsed = time.time() - state["created_at"]
+        done = min(total, int(max(0.0, elapsed - service.validation_time) * service.requests_per_second))
+        if elapsed < service.validation_time:
+            status = "validating"
+        elif done < total:
+            status = "in_progress"
+        else:
+            status = "completed"
+        failing = [i % service.fail_every == service.fail_every - 1 if service.fail_every else False
+                   for i in range(done)]
+        output_file_id = error_file_id = None
+        if status == "completed":
+            with service.lock:
+                if "output_file_id" not in state:
+                    ok = [fake_response(r) for r, bad in zip(state["requests"], failing) if not bad]
+                    errors = [fake_error(r) for r, bad in zip(state["requests"], failing) if bad]
+                    state["output_file_id"] = state["error_file_id"] = None
+                    if ok:
+                        state["output_file_id"] = service.new_id("file")
+                        service.stored_files[state["output_file_id"]] = _jsonl(ok)
+                    if errors:
+                        state["error_file_id"] = service.new_id("file")
+                        service.stored_files[state["error_file_id"]] = _jsonl(errors)
+            output_file_id, error_file_id = state["output_file_id"], state["error_file_id"]
+        return _Model(
+            id=batch_id,
+            status=status,
+            created_at=int(state["created_at"]),
+            in_progress_at=int(state["created_at"] + service.validation_time) if status != "validating" else None,
+            input_file_id=state["input_file_id"],
+            output_file_id=output_file_id,
+            error_file_id=error_file_id,
+            request_counts=_Model(total=total, completed=done - sum(failing), failed=sum(failing)),
+        )
+
+
+class FakeAzureOpenAI:
+    """Drop-in for ``AzureOpenAI`` as far as ``client.files`` / ``client.batches`` go."""
+
+    def __init__(self, latency=0.0, validation_time=0.5, requests_per_second=1000.0, fail_every=0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.validation_time = validation_time
+        self.requests_per_second = requests_per_second
+        self.stored_files = {}
+        self.stored_batches = {}
+        self.lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self.calls = 0
+        self.files = _Files(self)
+        self.batches = _Batches(self)
+
+    def new_id(self, prefix):
+        with self.lock:
+            return f"{prefix}-{next(self._ids):06d}"
+
+    def sleep(self):
+        with self.lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class FakeContainerClient:
+    """Stand-in for a Blob ``ContainerClient``: ``upload_blob`` keeps the bytes in ``blobs``."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.blobs = {}
+        self.lock = threading.Lock()
+
+    def upload_blob(self, name, data, length=None, overwrite=False, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        content = data.read() if hasattr(data, "read") else bytes(data)
+        with self.lock:
+            if name in self.blobs and not overwrite:
+                raise ValueError(f"blob {name} already exists")
+            self.blobs[name] = content
+        return _Model(name=name, size=len(content))
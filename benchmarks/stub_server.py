@@ -0,0 +1,94 @@
+"""Local stand-in for quotefancy.com serving synthetic author pages.
+
+``/<slug>/page/<n>`` returns ``quotes_per_page`` ``div.q-wrapper`` blocks for
+``n <= pages`` and 404 afterwards, after an artificial ``latency`` so the
+benchmarks measure overlap rather than loopback speed. Pages carry an
+``ETag`` and honour ``If-None-Match``.
+"""
+import hashlib
+import html
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE_RE = re.compile(r"^/([^/]+)/page/(\d+)/?$")
+
+
+def render_page(slug, page_number, quotes_per_page=10):
+    author = slug.replace("-quotes", "").replace("-", " ").title()
+    blocks = []
+    for i in range(quotes_per_page):
+        n = (page_number - 1) * quotes_per_page + i + 1
+        text = html.escape(f"Quote {n} by {author}: keep going, one page at a time.")
+        link = f"/quote/{n}/{slug}-{n}"
+        if i % 2:
+            blocks.append(
+                f'<div class="q-wrapper"><div class="quote-a"><a href="{link}">{text}</a></div>'
+                f'<div class="author-p bylines">by {html.escape(author)}</div></div>'
+            )
+        else:
+            blocks.append(
+                f'<div class="q-wrapper"><a class="quote-a" href="{link}">{text}</a>'
+                f'<p class="author-p"><a href="/{slug}">{html.escape(author)}</a></p></div>'
+            )
+    return (
+        "<!DOCTYPE html><html><head><title>{0}</title></head><body>"
+        '<div class="wrapper"><h1>{0} Quotes</h1>{1}</div></body></html>'
+    ).format(html.escape(author), "".join(blocks)).encode()
+
+
+def make_handler(pages, quotes_per_page, latency):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            match = PAGE_RE.match(self.path)
+            time.sleep(latency)
+            if not match or int(match.group(2)) > pages:
+                self.send_error(404)
+                return
+            body = render_page(match.group(1), int(match.group(2)), quotes_per_page)
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connection bursts from wide pools,
+    # which shows up as 1 s SYN retransmits rather than real latency.
+    request_queue_size = 128
+
+
+class StubQuoteServer:
+    """Context manager running the stub server on a free localhost port."""
+
+    def __init__(self, pages=5, quotes_per_page=10, latency=0.05):
+        self.server = _Server(("127.0.0.1", 0), make_handler(pages, quotes_per_page, latency))
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
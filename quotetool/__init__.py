@@ -0,0 +1 @@
+"""Reusable building blocks behind the Quote Utility Toolkit Streamlit app."""
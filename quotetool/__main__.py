@@ -0,0 +1,5 @@
+import sys
+
+from quotetool.cli import main
+
+sys.exit(main())
@@ -0,0 +1,188 @@
+"""Azure OpenAI batch requests (Tab 3) and batch output records (Tabs 4 and 7)."""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from quotetool.structure import PARAGRAPH_COLUMNS
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+DEPLOYMENT_MODEL = "gpt-4o-global-batch"
+SYSTEM_PROMPT = "You are a creative and SEO-savvy content writer."
+# Azure OpenAI global batch limits per input file.
+AZURE_MAX_REQUESTS = 100_000
+AZURE_MAX_BYTES = 200 * 1024 * 1024
+
+
+def dumps(record):
+    """Serialize one JSONL record to bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record).encode("utf-8")
+
+
+def loads(line):
+    """Parse one JSONL line (bytes or str), with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+class CustomIdGenerator:
+    """Assigns ``<author no>-<Author_Name>-<quote no>`` ids across chunks.
+
+    Authors are numbered in order of first appearance and each author's
+    rows are counted from 1, exactly like the original ``iterrows`` loop,
+    but each chunk is handled with ``ngroup``/``cumcount``.
+    """
+
+    def __init__(self):
+        self.group_ids = {}
+        self.counts = {}
+
+    def assign(self, authors):
+        authors = authors.str.strip()
+        grouped = authors.groupby(authors, sort=False)
+        local = grouped.ngroup().to_numpy()
+        firsts = pd.unique(authors)  # same order as ngroup(sort=False)
+        for author in firsts:
+            self.group_ids.setdefault(author, len(self.group_ids) + 1)
+        group_ids = np.array([self.group_ids[a] for a in firsts], dtype=np.int64)
+        previous = np.array([self.counts.get(a, 0) for a in firsts], dtype=np.int64)
+        numbers = grouped.cumcount().to_numpy() + 1 + previous[local]
+        for author, total in zip(firsts, previous + grouped.size().to_numpy()):
+            self.counts[author] = int(total)
+        return (
+            pd.Series(group_ids[local], index=authors.index).astype(str)
+            + "-" + authors.str.replace(" ", "_", regex=False)
+            + "-" + pd.Series(numbers, index=authors.index).astype(str)
+        )
+
+
+def build_prompt(author, quotes):
+    block = "\n".join(f"- {q}" for q in quotes if q and q != "NA")
+    return f"You're given a series of quotes by {author}.\nUse them to generate metadata for a web story.\nQuotes:\n{block}\n\nPlease respond ONLY in this exact JSON format:\n{{\n  \"storytitle\": \"...\",\n  \"metadescription\": \"...\",\n  \"metakeywords\": \"...\"\n}}"
+
+
+def build_request(custom_id, prompt, model=DEPLOYMENT_MODEL):
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/chat/completions",
+        "body": {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ]
+        }
+    }
+
+
+def iter_requests(final, model=DEPLOYMENT_MODEL):
+    """Yield one chat-completions request per row of a tagged chunk."""
+    quote_columns = [final[c] if c in final.columns else [""] * len(final) for c in PARAGRAPH_COLUMNS]
+    for custom_id, author, *quotes in zip(final["custom_id"], final["Author"], *quote_columns):
+        yield build_request(custom_id, build_prompt(author, quotes), model)
+
+
+class JsonlShardWriter:
+    """Writes JSONL lines, starting a new file before any Azure limit is hit.
+
+    A single shard keeps ``path`` as its name. Once a second shard is
+    needed, the files become ``<stem>_part1.jsonl``, ``<stem>_part2.jsonl``...
+    Nothing is created until the first write, so ``paths`` stays empty.
+    """
+
+    def __init__(self, path, max_requests=AZURE_MAX_REQUESTS, max_bytes=AZURE_MAX_BYTES):
+        self.path = path
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.paths = []
+        self.file = None
+        self.total_requests = 0
+
+    def _part_path(self, n):
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}_part{n}{ext}"
+
+    def _open(self):
+        if len(self.paths) == 1:
+            self.file.close()
+            os.replace(self.path, self._part_path(1))
+            self.paths[0] = self._part_path(1)
+        elif self.file is not None:
+            self.file.close()
+        path = self.path if not self.paths else self._part_path(len(self.paths) + 1)
+        self.paths.append(path)
+        self.file = open(path, "wb")
+        self.requests = 0
+        self.bytes = 0
+
+    def write(self, record):
+        line = dumps(record) + b"\n"
+        if self.file is None or (self.requests and (self.requests >= self.max_requests
+                                                    or self.bytes + len(line) > self.max_bytes)):
+            self._open()
+        self.file.write(line)
+        self.requests += 1
+        self.total_requests += 1
+        self.bytes += len(line)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_metadata(content):
+    """Decode the model's JSON answer, with or without a Markdown code fence."""
+    # String checks rather than a regex: a trailing-fence pattern is retried
+    # at every offset of the answer.
+    content = content.strip()
+    if content.startswith("```"):
+        content = content[3:]
+        if content.startswith("json"):
+            content = content[4:]
+        content = content.lstrip()
+    if content.endswith("```"):
+        content = content[:-3].rstrip()
+    return loads(content)
+
+
+def parse_output_record(record):
+    """Return ``(custom_id, metadata, total_tokens)`` for one batch output line.
+
+    ``metadata`` is ``None`` when the request failed or the answer is not the
+    JSON object the prompt asks for.
+    """
+    custom_id = record.get("custom_id", "")
+    body = ((record.get("response") or {}).get("body")) or {}
+    total_tokens = (body.get("usage") or {}).get("total_tokens")
+    try:
+        metadata = parse_metadata(body["choices"][0]["message"]["content"])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return custom_id, None, total_tokens
+    return custom_id, metadata if isinstance(metadata, dict) else None, total_tokens
+
+
+def cached_output_record(custom_id, metadata):
+    """A batch-output-shaped line for a result served from the prompt cache."""
+    return {
+        "custom_id": custom_id,
+        "cached": True,
+        "response": {
+            "status_code": 200,
+            "body": {"choices": [{"message": {"role": "assistant", "content": json.dumps(metadata)}}]}
+        }
+    }
@@ -0,0 +1,129 @@
+"""Persistent SQLite cache for scraped pages.
+
+Rows are keyed by the SHA-256 of the URL and hold the zlib-compressed body
+plus the ``ETag``/``Last-Modified`` validators. A page younger than ``ttl``
+is served without touching the network. An older page is revalidated with
+a conditional GET. When the stored bodies exceed ``max_bytes``, the least
+recently used pages are evicted. ``offline=True`` never touches the network
+and serves stale pages as they are.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+
+CACHE_PATH = os.path.join(".cache", "quotefancy_pages.sqlite")
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at);
+"""
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+class CachedPage:
+    def __init__(self, url, body, etag, last_modified, fetched_at, ttl):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.fresh = time.time() - fetched_at < ttl
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """Thread-safe page store shared by all scraper workers.
+
+    ``stats`` counts ``hit`` (fresh), ``revalidated`` (304), ``miss``
+    (downloaded) and ``offline_miss`` (not cached while offline).
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, offline=False):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def lookup(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM pages WHERE key = ?", (url_key(url),)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (time.time(), url_key(url)))
+        body, etag, last_modified, fetched_at = row
+        return CachedPage(url, zlib.decompress(body), etag, last_modified, fetched_at, self.ttl)
+
+    def store(self, url, body, etag=None, last_modified=None):
+        compressed = zlib.compress(body)
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url_key(url), url, compressed, len(compressed), etag, last_modified, now, now)
+            )
+            self._evict()
+
+    def refresh(self, url):
+        """Mark a page as fresh again after a ``304 Not Modified``."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE key = ?", (now, now, url_key(url))
+            )
+
+    def record(self, event):
+        with self.lock:
+            self.stats[event] += 1
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM pages ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM pages WHERE key = ?", victims)
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM pages")
+
+    def close(self):
+        self.conn.close()
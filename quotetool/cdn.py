@@ -0,0 +1,148 @@
+"""CDN URL transformer: ``CDN_URL`` -> resized image-handler URLs.
+
+Each output URL is ``https://media.suvichaar.org/<base64 JSON>`` for
+``{"bucket", "key", "edits": {"resize": ...}}``. The JSON for a preset is
+the same text around the key every time, so it is split once into a
+prefix and suffix and only the key is serialized per URL. The output is
+byte-identical to ``json.dumps`` of the template dict. Each distinct key
+is encoded once (``pd.factorize`` plus a memo shared across chunks), and
+any number of presets is produced in the same pass.
+
+Run it on a CSV outside Streamlit::
+
+    python -m quotetool.cdn image_links.csv -o image_links_cdn.csv \\
+        --preset standardurl=720x1280:cover --preset thumbnailurl=300x300:cover
+"""
+import argparse
+import base64
+import json
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from quotetool import ingest, metrics
+from quotetool.media import BUCKET_NAME
+
+CDN_PREFIX = "https://cdn.suvichaar.org/"
+MEDIA_PREFIX = "https://media.suvichaar.org/"
+ERROR = "ERROR"
+MEMO_MAX_KEYS = 1_000_000
+
+Preset = namedtuple("Preset", "column width height fit")
+STANDARD = Preset("standardurl", 720, 1280, "cover")
+DEFAULT_PRESETS = (STANDARD,)
+
+
+def parse_preset(spec):
+    """``name=WIDTHxHEIGHT[:fit]`` -> :class:`Preset` (fit defaults to ``cover``)."""
+    try:
+        column, size = spec.split("=", 1)
+        size, _, fit = size.partition(":")
+        width, height = (int(v) for v in size.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected name=WIDTHxHEIGHT[:fit], got {spec!r}")
+    return Preset(column.strip(), width, height, fit or "cover")
+
+
+def _template_parts(preset, bucket):
+    edits = {"resize": {"width": preset.width, "height": preset.height, "fit": preset.fit}}
+    marker = "\0key\0"
+    text = json.dumps({"bucket": bucket, "key": marker, "edits": edits})
+    prefix, suffix = text.split(json.dumps(marker))
+    return prefix, suffix
+
+
+class CdnTransformer:
+    """Vectorized ``CDN_URL`` -> preset URL columns; reuse one instance across chunks."""
+
+    def __init__(self, presets=DEFAULT_PRESETS, bucket=BUCKET_NAME, memo_max_keys=MEMO_MAX_KEYS):
+        self.presets = tuple(presets)
+        self.parts = [_template_parts(p, bucket) for p in self.presets]
+        self.memo = {}
+        self.memo_max_keys = memo_max_keys
+        self.rows = 0
+        self.errors = 0
+
+    def _encode(self, key):
+        urls = self.memo.get(key)
+        if urls is None:
+            quoted = json.dumps(key)
+            urls = tuple(
+                MEDIA_PREFIX + base64.urlsafe_b64encode((prefix + quoted + suffix).encode()).decode()
+                for prefix, suffix in self.parts
+            )
+            if len(self.memo) >= self.memo_max_keys:
+                self.memo.clear()
+            self.memo[key] = urls
+        return urls
+
+    def transform(self, urls):
+        """Return a DataFrame with one column per preset, indexed like ``urls``.
+
+        URLs outside the CDN and media domains become ``"ERROR"``, as in
+        the original loop.
+        """
+        with metrics.timer("cdn.transform"):
+            return self._transform(urls)
+
+    def _transform(self, urls):
+        urls = urls.astype(str).str.strip()
+        valid = (urls.str.startswith(CDN_PREFIX) | urls.str.startswith(MEDIA_PREFIX)).to_numpy()
+        keys = (
+            urls[valid]
+            .str.replace(CDN_PREFIX, MEDIA_PREFIX, regex=False)
+            .str.replace(MEDIA_PREFIX, "", regex=False)
+        )
+        codes, uniques = pd.factorize(keys, sort=False)
+        encoded = [self._encode(key) for key in uniques]
+        out = {}
+        for i, preset in enumerate(self.presets):
+            column = np.full(len(urls), ERROR, dtype=object)
+            column[valid] = np.array([e[i] for e in encoded], dtype=object)[codes] if encoded else []
+            out[preset.column] = column
+        self.rows += len(urls)
+        self.errors += int((~valid).sum())
+        return pd.DataFrame(out, index=urls.index)
+
+    def apply(self, df, column="CDN_URL"):
+        """``df`` with the preset columns set (or replaced) from ``df[column]``."""
+        return df.assign(**self.transform(df[column]))
+
+
+def transform_csv(src, dst, column="CDN_URL", presets=DEFAULT_PRESETS, bucket=BUCKET_NAME,
+                  chunksize=ingest.CHUNK_ROWS):
+    """Transform a CSV chunk by chunk; returns the :class:`CdnTransformer` for its counts."""
+    transformer = CdnTransformer(presets, bucket)
+    with ingest.CsvOutput(dst) as output:
+        for chunk in ingest.read_csv_chunks(src, chunksize=chunksize):
+            if column not in chunk.columns:
+                raise KeyError(f"column {column!r} not found in {src}")
+            output.write(transformer.apply(chunk, column))
+    return transformer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add resized media URLs to a CSV of CDN URLs.")
+    parser.add_argument("src", help="input CSV")
+    parser.add_argument("-o", "--output", required=True, help="output CSV")
+    parser.add_argument("--column", default="CDN_URL", help="column holding the CDN URLs (default: CDN_URL)")
+    parser.add_argument("--preset", dest="presets", action="append", type=parse_preset,
+                        help="output column as name=WIDTHxHEIGHT[:fit]; repeatable (default: standardurl=720x1280:cover)")
+    parser.add_argument("--bucket", default=BUCKET_NAME)
+    parser.add_argument("--chunksize", type=int, default=ingest.CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    transformer = transform_csv(args.src, args.output, args.column, args.presets or DEFAULT_PRESETS,
+                                args.bucket, args.chunksize)
+    elapsed = time.perf_counter() - start
+    print(f"{transformer.rows} rows, {len(transformer.memo)} distinct keys, {transformer.errors} errors, "
+          f"{elapsed:.2f} s ({transformer.rows / max(elapsed, 1e-9):,.0f} rows/s) -> {args.output}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Resumable, incremental scraping into append-only CSVs.
+
+A *job* (Tab 1's filename prefix) owns one CSV per slug under
+``.cache/scrapes/<job>/`` and one set of per-slug checkpoints in SQLite.
+Each checkpoint holds the last committed page, the last ``Serial No`` and
+the quote links already written. Pages are appended and checkpointed one at
+a time, in page order, so an interrupted run, or one that stopped at its
+page cap, resumes at the next page. A slug that already has pages is
+re-crawled from page 1 in incremental mode and stops at the first page that
+contains a quote the job already has.
+
+Pages of different slugs finish in any order, so each run's CSV is exported
+from the per-slug files afterwards: the requested slugs, in request order,
+each in ``Serial No`` order, exactly as a sequential crawl writes them.
+Runs of one job are serialized with :func:`job_lock`.
+"""
+import contextlib
+import csv
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+
+from quotetool.scrape import CSV_HEADER, iter_pages
+
+CHECKPOINT_PATH = os.path.join(".cache", "scrape_checkpoints.sqlite")
+SINK_DIR = os.path.join(".cache", "scrapes")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slugs (
+    job TEXT NOT NULL,
+    slug TEXT NOT NULL,
+    last_page INTEGER NOT NULL DEFAULT 0,
+    serial INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job, slug)
+);
+CREATE TABLE IF NOT EXISTS seen (
+    job TEXT NOT NULL,
+    slug TEXT NOT NULL,
+    link TEXT NOT NULL,
+    PRIMARY KEY (job, slug, link)
+);
+"""
+
+
+def _safe_name(name):
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+def sink_path(job):
+    """The job's exported CSV, rewritten by every run."""
+    return os.path.join(SINK_DIR, _safe_name(job) + ".csv")
+
+
+def sink_dir(job):
+    """The folder holding the job's per-slug CSVs."""
+    return os.path.join(SINK_DIR, _safe_name(job))
+
+
+_job_locks = {}
+_job_locks_guard = threading.Lock()
+
+
+@contextlib.contextmanager
+def job_lock(job):
+    """Hold ``job`` for a whole run; other runs of it in this process wait.
+
+    Every Streamlit session shares the job's checkpoints and per-slug CSVs,
+    and each run keeps its own set of seen links, so two runs of one job
+    at the same time would write the same quotes twice.
+    """
+    with _job_locks_guard:
+        lock = _job_locks.setdefault(_safe_name(job), threading.Lock())
+    with lock:
+        yield
+
+
+class CheckpointStore:
+    def __init__(self, path=CHECKPOINT_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+
+    def state(self, job, slug):
+        """Return ``(last_page, serial, done)`` for a slug of a job."""
+        row = self.conn.execute(
+            "SELECT last_page, serial, done FROM slugs WHERE job = ? AND slug = ?", (job, slug)
+        ).fetchone()
+        return (row[0], row[1], bool(row[2])) if row else (0, 0, False)
+
+    def seen_links(self, job, slug):
+        rows = self.conn.execute("SELECT link FROM seen WHERE job = ? AND slug = ?", (job, slug))
+        return {link for (link,) in rows}
+
+    def commit_page(self, job, slug, page_number, serial, links):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO slugs (job, slug, last_page, serial, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (job, slug) DO UPDATE SET last_page = MAX(last_page, excluded.last_page), "
+                "serial = excluded.serial, updated_at = excluded.updated_at",
+                (job, slug, page_number, serial, time.time())
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO seen VALUES (?, ?, ?)", [(job, slug, link) for link in links if link]
+            )
+
+    def finish(self, job, slug, done):
+        """Record the end of a crawl; a failed re-check never un-finishes a slug."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO slugs (job, slug, done, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (job, slug) DO UPDATE SET done = MAX(done, excluded.done), "
+                "updated_at = excluded.updated_at",
+                (job, slug, int(done), time.time())
+            )
+
+    def row_count(self, job):
+        return self.conn.execute("SELECT COALESCE(SUM(serial), 0) FROM slugs WHERE job = ?", (job,)).fetchone()[0]
+
+    def reset(self, job, slug=None):
+        """Forget a job's checkpoints, or only one slug's."""
+        where, params = ("job = ?", (job,)) if slug is None else ("job = ? AND slug = ?", (job, slug))
+        with self.conn:
+            self.conn.execute(f"DELETE FROM slugs WHERE {where}", params)
+            self.conn.execute(f"DELETE FROM seen WHERE {where}", params)
+
+    def close(self):
+        self.conn.close()
+
+
+class CsvSink:
+    """Append-only CSV of scraped rows; the header is written once per file."""
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        if new:
+            self.writer.writerow(CSV_HEADER)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SlugSinks:
+    """One append-only :class:`CsvSink` per slug in ``directory``, opened on first write."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.sinks = {}
+
+    def path(self, slug):
+        return os.path.join(self.directory, _safe_name(slug) + ".csv")
+
+    def exists(self, slug):
+        return os.path.exists(self.path(slug))
+
+    def write_rows(self, slug, rows):
+        if slug not in self.sinks:
+            self.sinks[slug] = CsvSink(self.path(slug))
+        self.sinks[slug].write_rows(rows)
+
+    def export(self, slugs, path):
+        """Concatenate the slugs' CSVs into ``path`` under one header; return the row count."""
+        for sink in self.sinks.values():
+            sink.file.flush()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        rows = 0
+        partial = path + ".part"
+        with open(partial, "w", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out)
+            writer.writerow(CSV_HEADER)
+            for slug in dict.fromkeys(slugs):
+                if not self.exists(slug):
+                    continue
+                with open(self.path(slug), newline="", encoding="utf-8") as f:
+                    reader = csv.reader(f)
+                    next(reader, None)
+                    for row in reader:
+                        writer.writerow(row)
+                        rows += 1
+        os.replace(partial, path)
+        return rows
+
+    def remove(self):
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def close(self):
+        for sink in self.sinks.values():
+            sink.close()
+        self.sinks.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def scrape_checkpointed(slugs, job, store, sinks, incremental=True, **crawl_kwargs):
+    """Scrape ``slugs`` into their :class:`SlugSinks` files and return ``{slug: new_rows}``.
+
+    Unfinished slugs resume after their last committed page; a slug that
+    stopped at ``max_pages`` is unfinished, so a larger cap continues it.
+    Finished slugs are skipped, or re-checked from page 1 when
+    ``incremental`` is set, and so are resumed slugs that already have
+    pages. Quotes whose link the job already holds are never written twice.
+    Rows reach the sink before their checkpoint, so a crash can repeat at
+    most one page. A slug with checkpoints but no CSV is crawled from
+    scratch. Other keyword arguments go to :func:`~quotetool.scrape.iter_pages`.
+    """
+    resumes, rechecks, serials, seen = {}, [], {}, {}
+    for slug in dict.fromkeys(slugs):
+        if not sinks.exists(slug):
+            store.reset(job, slug)
+        last_page, serials[slug], done = store.state(job, slug)
+        if done and not incremental:
+            continue
+        seen[slug] = store.seen_links(job, slug)
+        if not done:
+            resumes[slug] = last_page + 1
+        if incremental and (done or last_page):
+            rechecks.append(slug)
+
+    new_rows = {slug: 0 for slug in slugs}
+    # Resumed slugs continue first; the re-check pass then looks for quotes
+    # added at the top of page 1 since they were last crawled.
+    for start_pages, recheck in ((resumes, False), (dict.fromkeys(rechecks, 1), True)):
+        if not start_pages:
+            continue
+
+        def stop_on(slug, quotes):
+            return recheck and any(link in seen[slug] for _, link, _ in quotes)
+
+        for page in iter_pages(list(start_pages), start_pages=start_pages, stop_on=stop_on, **crawl_kwargs):
+            slug = page.slug
+            if page.status != "ok":
+                # Only the end of the author's pages finishes a slug; a cap,
+                # a failure or a re-check stopping at known quotes does not.
+                store.finish(job, slug, page.status == "end")
+                continue
+            rows = []
+            for quote_text, quote_link, author_text in page.quotes:
+                if quote_link and quote_link in seen[slug]:
+                    continue
+                serials[slug] += 1
+                rows.append([serials[slug], quote_text, quote_link, author_text])
+            sinks.write_rows(slug, rows)
+            links = [row[2] for row in rows]
+            store.commit_page(job, slug, page.number, serials[slug], links)
+            seen[slug].update(links)
+            new_rows[slug] += len(rows)
+    return new_rows
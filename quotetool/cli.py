@@ -0,0 +1,237 @@
+"""Command-line entry point: the app's stages without Streamlit.
+
+    python -m quotetool scrape https://quotefancy.com/a-j-cronin-quotes --prefix quotes
+    python -m quotetool structure quotes.csv -o structured.csv
+    python -m quotetool batch structured.csv
+    python -m quotetool fetch azure_batch_tracking_1700000000.json --wait
+    python -m quotetool images cat dog --count 5 -o image_links.csv
+    python -m quotetool merge structured-data-id_1700000000.csv batch_results_1700000000.jsonl -o merged.csv
+
+Credentials come from the environment: ``AZURE_OPENAI_API_KEY`` for
+``batch`` and ``fetch``, ``AZURE_BLOB_CONNECTION_STRING`` to copy fetched
+results to Blob storage, and boto3's usual chain (``AWS_ACCESS_KEY_ID``...)
+for ``images``. Every command is safe to re-run from cron: scrapes resume,
+submitted JSONL is not submitted twice and fetched results are not fetched
+again. Each command imports only what it runs, so ``scrape`` never loads
+pandas, boto3 or the Azure SDKs and ``--help`` loads none of them, nor
+requests or BeautifulSoup.
+
+``--metrics run.prom`` (or ``run.json``) writes the command's timers and
+counters when it finishes, and ``--profile cprofile`` prints a profile of
+it to stderr:
+
+    python -m quotetool --metrics merge.prom --profile cprofile merge structured.csv results.jsonl -o merged.csv
+"""
+import argparse
+import json
+import os
+import sys
+
+from quotetool import clients, metrics, pipeline
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def require(secrets, name, parser):
+    if name not in secrets:
+        parser.error(f"{clients.ENV_SECRETS[name]} is not set")
+    return secrets
+
+
+def split_commas(values):
+    return [item.strip() for value in values for item in value.split(",") if item.strip()]
+
+
+def run_scrape(args, parser):
+    from quotetool import cache
+
+    page_cache = None
+    if not args.no_cache or args.offline:
+        page_cache = cache.PageCache(ttl=args.cache_ttl * 3600, offline=args.offline)
+    try:
+        run = pipeline.scrape_job(
+            split_commas(args.urls), args.prefix, resume=not args.fresh, page_cache=page_cache,
+            max_pages=args.max_pages, max_workers=args.workers, rate_limit=args.rate_limit, parser=args.parser
+        )
+    finally:
+        if page_cache is not None:
+            log(f"page cache: {page_cache.stats['hit']} hits, {page_cache.stats['revalidated']} revalidated, "
+                f"{page_cache.stats['miss']} downloaded, {page_cache.stats['offline_miss']} missing offline")
+            page_cache.close()
+    log(f"{sum(run.new_rows.values())} new quotes, {run.total_rows} in {run.output_path}")
+
+
+def run_structure(args, parser):
+    from quotetool import ingest
+
+    with ingest.CsvOutput(args.output) as output:
+        authors = pipeline.structure_csv(args.src, output)
+    log(f"{authors} authors -> {args.output}")
+
+
+def run_batch(args, parser):
+    from quotetool import registry
+
+    secrets = clients.env_secrets()
+    if not args.no_submit:
+        require(secrets, "azure_openai_api_key", parser)
+    prep = pipeline.prepare_batch(args.src, reuse_results=not args.no_reuse, out_dir=args.out_dir)
+    log(f"{prep.submitted} requests in {len(prep.jsonl_paths)} JSONL file(s), {prep.cached} answered from the "
+        f"prompt cache (~{prep.tokens_saved:,} tokens saved)")
+    for path in [prep.cleaned_csv, prep.removed_csv, prep.structured_csv, *prep.jsonl_paths, *prep.cached_paths]:
+        log(f"  wrote {path}")
+    if args.no_submit or not prep.jsonl_paths:
+        return
+    batch_registry = registry.BatchRegistry()
+    try:
+        batches = pipeline.submit_batches(clients.azure_openai_client(secrets), prep, batch_registry)
+    finally:
+        batch_registry.close()
+    for entry in batches:
+        log(f"{'reused' if entry['reused'] else 'submitted'} batch {entry['batch_id']} for {entry['jsonl_file']}")
+    tracking_path = os.path.join(args.out_dir, f"azure_batch_tracking_{prep.ts}.json")
+    with open(tracking_path, "w") as f:
+        json.dump(pipeline.tracking_info(prep, batches), f, indent=2)
+    print(tracking_path)
+
+
+def run_fetch(args, parser):
+    from quotetool import registry
+
+    secrets = require(clients.env_secrets(), "azure_openai_api_key", parser)
+    on_downloaded = None
+    if "azure_blob_connection_string" in secrets and not args.no_blob:
+        on_downloaded = clients.output_uploader(clients.blob_container_client(secrets))
+    batch_registry = registry.BatchRegistry()
+    poller = registry.BatchPoller(clients.azure_openai_client(secrets), batch_registry,
+                                  on_downloaded=on_downloaded, download_dir=args.out_dir)
+    try:
+        batch_ids = None
+        if args.tracking:
+            batch_ids = []
+            for path in args.tracking:
+                with open(path) as f:
+                    batch_ids += batch_registry.import_tracking(json.load(f))
+        pending = pipeline.fetch_results(poller, batch_ids, wait=args.wait, interval=args.interval,
+                                         timeout=args.timeout)
+        for row in batch_registry.all():
+            if batch_ids is None or row["batch_id"] in batch_ids:
+                done = row["completed"] + row["failed"]
+                log(f"{row['batch_id']}  {row['status']:<11} {done}/{row['total']}  "
+                    f"{row['output_path'] or ''} {row['error'] or ''}".rstrip())
+    finally:
+        batch_registry.close()
+    if pending:
+        log(f"{len(pending)} batch(es) still pending")
+        return 3
+
+
+def run_images(args, parser):
+    from simple_image_download import simple_image_download as simp
+
+    secrets = clients.env_secrets()
+    run = pipeline.upload_images(
+        split_commas(args.keywords), args.count, simp.simple_image_download().download, clients.s3_client(secrets),
+        bucket=args.bucket, skip_duplicates=not args.no_dedup, near_duplicates=args.near
+    )
+    for keyword, error in run.download_errors.items():
+        log(f"download for {keyword} stopped early: {error}")
+    for upload in run.uploads:
+        if upload.error:
+            log(f"failed to upload {upload.job.filename} after {upload.attempts} attempts: {upload.error}")
+    duplicates = sum(1 for u in run.uploads if u.duplicate_of)
+    run.frame.to_csv(args.output, index=False)
+    log(f"{len(run.frame) - duplicates} uploaded, {duplicates} duplicates reused, "
+        f"{len(run.uploads) - len(run.frame)} failed -> {args.output}")
+    return 1 if len(run.frame) < len(run.uploads) else None
+
+
+def run_merge(args, parser):
+    from quotetool import ingest
+
+    with ingest.CsvOutput(args.output) as output:
+        run = pipeline.merge_metadata(args.csv, args.jsonl, output, fill_cache=False if args.no_cache else None)
+    log(f"{run.metadata_lines} metadata lines ({len(run.issues)} unparsed), "
+        f"{run.rows - run.unmatched} of {run.rows} rows matched -> {args.output}")
+    if args.report:
+        run.report.to_csv(args.report, index=False)
+        log(f"{len(run.report)} report rows -> {args.report}")
+
+
+def build_parser():
+    from quotetool import cache, parse, scrape
+
+    parser = argparse.ArgumentParser(prog="python -m quotetool", description="Quote Utility Toolkit stages.")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write timers and counters here: Prometheus text for .prom/.txt, JSON otherwise")
+    parser.add_argument("--profile", choices=metrics.available_profilers(), help="print a profile to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("scrape", help="scrape QuoteFancy author pages (Tab 1)")
+    p.add_argument("urls", nargs="+", help="author URLs, space or comma separated")
+    p.add_argument("--prefix", default="quotes", help="job name; rows go to .cache/scrapes/<prefix>.csv")
+    p.add_argument("--max-pages", type=int, default=scrape.MAX_PAGES)
+    p.add_argument("--workers", type=int, default=scrape.MAX_WORKERS)
+    p.add_argument("--rate-limit", type=float, default=scrape.RATE_LIMIT_PER_HOST, help="requests/sec")
+    p.add_argument("--parser", choices=parse.available_parsers(), default=parse.DEFAULT_PARSER)
+    p.add_argument("--no-cache", action="store_true", help="do not use the on-disk page cache")
+    p.add_argument("--cache-ttl", type=float, default=cache.DEFAULT_TTL / 3600, help="hours")
+    p.add_argument("--offline", action="store_true", help="cache only")
+    p.add_argument("--fresh", action="store_true", help="drop the job's checkpoints and CSV first")
+    p.set_defaults(run=run_scrape)
+
+    p = commands.add_parser("structure", help="one row of up to eight quotes per author (Tab 2)")
+    p.add_argument("src")
+    p.add_argument("-o", "--output", required=True)
+    p.set_defaults(run=run_structure)
+
+    p = commands.add_parser("batch", help="write the batch JSONL and submit it to Azure OpenAI (Tab 3)")
+    p.add_argument("src", help="structured CSV")
+    p.add_argument("--out-dir", default="")
+    p.add_argument("--no-reuse", action="store_true", help="ignore the prompt cache")
+    p.add_argument("--no-submit", action="store_true", help="only write the files")
+    p.set_defaults(run=run_batch)
+
+    p = commands.add_parser("fetch", help="poll submitted batches and download their results (Tab 4)")
+    p.add_argument("tracking", nargs="*", help="azure_batch_tracking_*.json files (default: every pending batch)")
+    p.add_argument("--out-dir", default=".")
+    p.add_argument("--wait", action="store_true", help="keep polling until the batches finish")
+    p.add_argument("--interval", type=float, default=60, help="seconds between polls with --wait")
+    p.add_argument("--timeout", type=float, help="give up waiting after this many seconds")
+    p.add_argument("--no-blob", action="store_true", help="do not copy results to Azure Blob")
+    p.set_defaults(run=run_fetch)
+
+    p = commands.add_parser("images", help="download keyword images, upload them to S3, add CDN URLs (Tab 6)")
+    p.add_argument("keywords", nargs="+", help="space or comma separated")
+    p.add_argument("--count", type=int, default=5, help="images per keyword")
+    p.add_argument("-o", "--output", default="image_links.csv")
+    p.add_argument("--bucket", help="default: the app's media bucket")
+    p.add_argument("--no-dedup", action="store_true", help="upload images even if their bytes are in the bucket")
+    p.add_argument("--near", action="store_true", help="also match near-duplicates (needs Pillow)")
+    p.set_defaults(run=run_images)
+
+    p = commands.add_parser("merge", help="merge batch metadata into the structured CSV (Tab 7)")
+    p.add_argument("csv", help="structured CSV with custom_id")
+    p.add_argument("jsonl", nargs="+", help="batch results and cached results")
+    p.add_argument("-o", "--output", required=True)
+    p.add_argument("--report", help="CSV of unparsed and unmatched ids")
+    p.add_argument("--no-cache", action="store_true", help="do not file the answers in the prompt cache")
+    p.set_defaults(run=run_merge)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    profile = metrics.Profile(None)
+    try:
+        with metrics.profiled(args.profile) as profile, metrics.timer(f"cli.{args.command}"):
+            return args.run(args, parser)
+    finally:
+        if profile.enabled:
+            log(profile.report())
+        if args.metrics:
+            metrics.METRICS.write(args.metrics)
+            log(f"metrics -> {args.metrics}")
@@ -0,0 +1,109 @@
+"""Azure OpenAI, Azure Blob and S3 clients for the app and the CLI.
+
+Credentials are looked up by the names used in ``.streamlit/secrets.toml``.
+The app passes ``st.secrets`` and the CLI passes :func:`env_secrets`. Each
+factory builds a client that is safe to share between threads, so callers
+build it once: the app behind ``st.cache_resource``, the CLI once per command.
+The SDKs are imported by the factories, so importing this module is cheap.
+"""
+import datetime
+import os
+
+from quotetool import metrics
+
+AZURE_ENDPOINT = "https://suvichaarai008818057333687.cognitiveservices.azure.com"
+API_VERSION = "2025-03-01-preview"
+AZURE_STORAGE_CONTAINER = "suvichaarbatch1"
+AZURE_BLOB_ACCOUNT_NAME = "suvichaarblob"
+# Outputs above one block are staged as 8 MB blocks, uploaded in parallel and
+# committed as a block list.
+BLOB_BLOCK_SIZE = 8 * 1024 * 1024
+BLOB_MAX_CONCURRENCY = 8
+SAS_EXPIRY = datetime.timedelta(days=1)
+
+# secrets.toml name -> environment variable read by the CLI
+ENV_SECRETS = {
+    "azure_openai_api_key": "AZURE_OPENAI_API_KEY",
+    "azure_blob_connection_string": "AZURE_BLOB_CONNECTION_STRING",
+    "azure_blob_account_key": "AZURE_BLOB_ACCOUNT_KEY",
+    "aws_access_key": "AWS_ACCESS_KEY_ID",
+    "aws_secret_key": "AWS_SECRET_ACCESS_KEY",
+}
+
+
+def env_secrets(environ=None):
+    """The secrets found in the environment, under their ``secrets.toml`` names."""
+    environ = os.environ if environ is None else environ
+    return {name: environ[var] for name, var in ENV_SECRETS.items() if environ.get(var)}
+
+
+def azure_openai_client(secrets):
+    from openai import AzureOpenAI
+
+    return AzureOpenAI(api_key=secrets["azure_openai_api_key"], api_version=API_VERSION,
+                       azure_endpoint=AZURE_ENDPOINT)
+
+
+def blob_container_client(secrets, container=AZURE_STORAGE_CONTAINER):
+    from azure.storage.blob import BlobServiceClient
+
+    service = BlobServiceClient.from_connection_string(
+        secrets["azure_blob_connection_string"],
+        max_block_size=BLOB_BLOCK_SIZE,
+        max_single_put_size=BLOB_BLOCK_SIZE
+    )
+    return service.get_container_client(container)
+
+
+def s3_client(secrets):
+    """S3 client from the secrets, or from boto3's default credential chain without them."""
+    from quotetool import media
+
+    return media.create_s3_client(secrets.get("aws_access_key"), secrets.get("aws_secret_key"), media.REGION_NAME)
+
+
+def upload_blob(container_client, path, content_type="application/json"):
+    """Upload a local file under its basename, replacing any older copy; return the blob name."""
+    from azure.storage.blob import ContentSettings
+
+    blob_name = os.path.basename(path)
+    size = os.path.getsize(path)
+    with metrics.timer("blob.upload"), open(path, "rb") as data:
+        container_client.upload_blob(
+            name=blob_name,
+            data=data,
+            length=size,
+            overwrite=True,
+            max_concurrency=BLOB_MAX_CONCURRENCY,
+            content_settings=ContentSettings(content_type=content_type)
+        )
+    metrics.count("blob.upload_bytes", size)
+    return blob_name
+
+
+def output_uploader(container_client):
+    """A :class:`~quotetool.registry.BatchPoller` ``on_downloaded`` hook that copies
+    a batch's result and error files to Blob storage."""
+    def upload_output(row):
+        fields = {}
+        if row.get("output_path"):
+            fields["blob_name"] = upload_blob(container_client, row["output_path"])
+        if row.get("error_path"):
+            fields["error_blob_name"] = upload_blob(container_client, row["error_path"])
+        return fields
+    return upload_output
+
+
+def blob_sas_url(blob_name, account_key, account_name=AZURE_BLOB_ACCOUNT_NAME,
+                 container=AZURE_STORAGE_CONTAINER, expiry=SAS_EXPIRY):
+    from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+    sas_token = generate_blob_sas(
+        account_name=account_name,
+        container_name=container,
+        blob_name=blob_name,
+        account_key=account_key,
+        permission=BlobSasPermissions(read=True),
+        expiry=datetime.datetime.utcnow() + expiry
+    )
+    return f"https://{account_name}.blob.core.windows.net/{container}/{blob_name}?{sas_token}"
@@ -0,0 +1,203 @@
+"""Content-hash index of images already uploaded to S3 (Tab 6).
+
+Every uploaded object is recorded under the SHA-256 of its bytes. The next
+time the same bytes show up, under any keyword or in a later run, the
+existing key is reused and nothing is uploaded. With Pillow installed, an
+optional 64-bit difference hash (dHash) also catches near-duplicates: the
+same picture re-encoded or resized.
+
+Uploads carry their hashes as S3 object metadata, so :meth:`ImageIndex.rebuild`
+can restore the index from a bucket listing. Objects without that metadata
+are downloaded and hashed.
+"""
+import hashlib
+import importlib.util
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Optional: near-duplicate matching. Pillow is imported on the first hash.
+HAVE_PILLOW = importlib.util.find_spec("PIL") is not None
+
+INDEX_PATH = os.path.join(".cache", "image_index.sqlite")
+HASH_CHUNK_BYTES = 1024 * 1024
+PHASH_MAX_DISTANCE = 6  # differing bits out of 64 that still count as the same picture
+SHA256_METADATA = "sha256"
+PHASH_METADATA = "dhash"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    sha256 TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    phash TEXT,
+    size INTEGER,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def perceptual_hash(path):
+    """64-bit dHash as 16 hex digits, or ``None`` without Pillow or for non-images."""
+    if not HAVE_PILLOW:
+        return None
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = bits << 1 | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+class ImageIndex:
+    """SQLite map of image hashes to S3 keys; safe to share between upload threads.
+
+    :meth:`claim` is the entry point for uploads. It returns the key that
+    already holds the same bytes, or reserves the hash so that a concurrent
+    upload of the same bytes waits instead of uploading a second copy.
+    """
+
+    def __init__(self, path=INDEX_PATH, near_duplicates=False, max_distance=PHASH_MAX_DISTANCE):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self.near_duplicates = near_duplicates and HAVE_PILLOW
+        self.max_distance = max_distance
+        self.in_flight = {}
+        self.phashes = {}
+        if self.near_duplicates:
+            self.phashes = dict(self.conn.execute("SELECT phash, key FROM images WHERE phash IS NOT NULL"))
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def lookup(self, sha256, phash=None):
+        """The existing key for these bytes (or, for a near-duplicate, this picture)."""
+        with self.lock:
+            return self._lookup(sha256, phash)
+
+    def _lookup(self, sha256, phash):
+        row = self.conn.execute("SELECT key FROM images WHERE sha256 = ?", (sha256,)).fetchone()
+        if row:
+            return row[0]
+        if phash and self.near_duplicates:
+            for known, key in self.phashes.items():
+                if hamming(phash, known) <= self.max_distance:
+                    return key
+        return None
+
+    def claim(self, sha256, phash=None):
+        """Return an existing key for the image, or ``None`` once the caller owns the upload.
+
+        The owner must call :meth:`add` after a successful upload or
+        :meth:`release` after a failed one.
+        """
+        while True:
+            with self.lock:
+                key = self._lookup(sha256, phash)
+                if key is not None:
+                    return key
+                pending = self.in_flight.get(sha256)
+                if pending is None:
+                    self.in_flight[sha256] = threading.Event()
+                    return None
+            pending.wait()  # the same bytes are uploading; reuse them if that succeeds
+
+    def available_key(self, key, sha256):
+        """``key``, unless the index holds other bytes there; then ``key`` with a hash suffix.
+
+        Rows deduplicated onto a key keep serving its bytes, so a new image
+        that happens to share the filename (a keyword re-run always
+        restarts at ``<keyword>_1.jpg``) must not overwrite it.
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT sha256 FROM images WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] == sha256:
+            return key
+        stem, ext = os.path.splitext(key)
+        return f"{stem}-{sha256[:12]}{ext}"
+
+    def add(self, sha256, key, phash=None, size=None):
+        """Record an upload; ``key`` no longer holds whatever bytes it held before."""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM images WHERE key = ? AND sha256 != ?", (key, sha256))
+                self.conn.execute("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?)",
+                                  (sha256, key, phash, size, time.time()))
+            if self.near_duplicates:
+                self.phashes = {known: k for known, k in self.phashes.items() if k != key}
+                if phash:
+                    self.phashes.setdefault(phash, key)
+            self._finish(sha256)
+
+    def release(self, sha256):
+        with self.lock:
+            self._finish(sha256)
+
+    def _finish(self, sha256):
+        pending = self.in_flight.pop(sha256, None)
+        if pending is not None:
+            pending.set()
+
+    def rebuild(self, s3, bucket, prefix="", hash_missing=True, max_workers=16):
+        """Replace the index with the objects under ``prefix``; return how many were indexed.
+
+        Hashes come from object metadata written at upload time. Objects
+        without it are downloaded and hashed when ``hash_missing`` is set.
+        """
+        keys = [
+            obj["Key"]
+            for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix)
+            for obj in page.get("Contents", [])
+        ]
+
+        def describe(key):
+            head = s3.head_object(Bucket=bucket, Key=key)
+            metadata = head.get("Metadata", {})
+            sha256, phash = metadata.get(SHA256_METADATA), metadata.get(PHASH_METADATA)
+            if not sha256 and hash_missing:
+                body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+                digest = hashlib.sha256()
+                for chunk in body.iter_chunks(HASH_CHUNK_BYTES):
+                    digest.update(chunk)
+                sha256 = digest.hexdigest()
+            return (sha256, key, phash, head.get("ContentLength")) if sha256 else None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            rows = [row for row in pool.map(describe, keys) if row]
+        now = time.time()
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM images")
+                self.conn.executemany("INSERT OR IGNORE INTO images VALUES (?, ?, ?, ?, ?)",
+                                      [(*row, now) for row in rows])
+            self.phashes = {}
+            if self.near_duplicates:
+                self.phashes = dict(self.conn.execute("SELECT phash, key FROM images WHERE phash IS NOT NULL"))
+        return len(rows)
+
+    def close(self):
+        self.conn.close()
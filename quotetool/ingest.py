@@ -0,0 +1,78 @@
+"""Chunked CSV ingestion and single-copy CSV output for the upload tabs.
+
+Uploads are read ``CHUNK_ROWS`` rows at a time with every column as ``str``.
+This skips type inference and keeps values such as ``007`` as they are.
+Each tab transforms one chunk at a time and appends it to a
+:class:`CsvOutput`. The output is a file on disk, or a spooled temp file
+that stays in memory until it passes ``SPOOL_MAX_BYTES``. No tab keeps a
+full DataFrame or a full ``to_csv()`` string alive.
+"""
+import tempfile
+
+import pandas as pd
+
+CHUNK_ROWS = 50_000
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+
+def _rewind(file):
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+
+def csv_columns(file):
+    """Return the header of an uploaded CSV without reading its rows."""
+    _rewind(file)
+    columns = list(pd.read_csv(file, nrows=0).columns)
+    _rewind(file)
+    return columns
+
+
+def read_csv_chunks(file, usecols=None, chunksize=CHUNK_ROWS):
+    """Yield the CSV as string-typed DataFrames of at most ``chunksize`` rows."""
+    _rewind(file)
+    columns = csv_columns(file)
+    wanted = columns if usecols is None else [c for c in columns if c in usecols]
+    with pd.read_csv(file, dtype=str, usecols=wanted, chunksize=chunksize) as reader:
+        empty = True
+        for chunk in reader:
+            empty = False
+            yield chunk
+    if empty:
+        # A header-only file still has a schema downstream code relies on.
+        yield pd.DataFrame(columns=wanted, dtype=str)
+
+
+class CsvOutput:
+    """CSV written chunk by chunk; the header comes from the first chunk."""
+
+    def __init__(self, path=None, max_size=SPOOL_MAX_BYTES):
+        self.path = path
+        if path:
+            self.file = open(path, "w+b")
+        else:
+            self.file = tempfile.SpooledTemporaryFile(max_size=max_size, mode="w+b")
+        self.rows = 0
+        self._header = True
+
+    def write(self, frame):
+        self.file.write(frame.to_csv(index=False, header=self._header).encode("utf-8"))
+        self._header = False
+        self.rows += len(frame)
+
+    def getvalue(self):
+        """Return the CSV bytes, e.g. as ``st.download_button`` data."""
+        self.file.flush()
+        self.file.seek(0)
+        data = self.file.read()
+        self.file.seek(0, 2)
+        return data
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,248 @@
+"""Image download/upload pipeline behind Tab 6.
+
+A single boto3 client is shared by a bounded thread pool. boto3 clients are
+thread-safe; the connection pool is sized for the workers, and a tuned
+``TransferConfig`` switches large files to multipart. Each object is
+retried on its own, so one bad upload never stalls or fails the rest.
+:func:`download_and_upload` feeds the pool from concurrent keyword
+downloads, so uploading starts as soon as the first keyword is on disk.
+With a :class:`~quotetool.dedup.ImageIndex`, images whose bytes are already
+in the bucket are not uploaded again. boto3 is imported when the first
+client or transfer config is built, not with this module.
+"""
+import contextlib
+import functools
+import os
+import shutil
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from quotetool import dedup, metrics
+
+REGION_NAME = "ap-south-1"
+BUCKET_NAME = "suvichaarapp"
+S3_PREFIX = "media/"
+CDN_BASE_URL = "https://cdn.suvichaar.org/"
+UPLOAD_WORKERS = 16
+DOWNLOAD_WORKERS = 4
+IMAGES_ROOT = "simple_images"
+UPLOAD_ATTEMPTS = 3
+UPLOAD_BACKOFF = 0.5  # seconds, doubled after every failed attempt
+# Images are mostly well under the threshold and go up in one PUT; anything
+# larger is split into 8 MB parts uploaded by a few threads of its own.
+MULTIPART_BYTES = 8 * 1024 * 1024
+MULTIPART_CONCURRENCY = 4
+
+UploadJob = namedtuple("UploadJob", "path key keyword filename")
+UploadResult = namedtuple("UploadResult", "job cdn_url error attempts duplicate_of", defaults=(None,))
+UploadResult.__doc__ = """Outcome of one upload. ``duplicate_of`` is the existing key a
+duplicate was pointed at (``attempts`` is then 0)."""
+
+
+@functools.cache
+def default_transfer_config():
+    """The ``TransferConfig`` uploads use unless given another."""
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=MULTIPART_BYTES,
+        multipart_chunksize=MULTIPART_BYTES,
+        max_concurrency=MULTIPART_CONCURRENCY,
+        use_threads=True,
+    )
+
+
+def create_s3_client(aws_access_key_id=None, aws_secret_access_key=None, region_name=REGION_NAME,
+                     max_pool_connections=UPLOAD_WORKERS * MULTIPART_CONCURRENCY):
+    import boto3
+    from botocore.config import Config
+
+    # Every worker may hold max_concurrency connections during a multipart
+    # upload; botocore's default pool of 10 would make them queue.
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        retries={"max_attempts": 5, "mode": "standard"},
+    )
+    return boto3.client("s3", aws_access_key_id=aws_access_key_id, aws_secret_access_key=aws_secret_access_key,
+                        region_name=region_name, config=config)
+
+
+def cdn_url_for(key, cdn_base_url=CDN_BASE_URL):
+    return f"{cdn_base_url}{key}"
+
+
+def upload_job(path, keyword, prefix=S3_PREFIX):
+    """The S3 key for a downloaded image: ``<prefix><keyword>/<filename>`` with spaces dashed."""
+    kf = keyword.replace(" ", "-")
+    fname = os.path.basename(path).replace(" ", "-")
+    return UploadJob(path, f"{prefix}{kf}/{fname}", kf, fname)
+
+
+def iter_local_images(root=IMAGES_ROOT, prefix=S3_PREFIX):
+    for folder, _, files_ in os.walk(root):
+        for f in files_:
+            yield upload_job(os.path.join(folder, f), os.path.basename(folder), prefix)
+
+
+def upload_one(s3, bucket, job, transfer_config=None, attempts=UPLOAD_ATTEMPTS,
+               backoff=UPLOAD_BACKOFF, cdn_base_url=CDN_BASE_URL, delete_after=False, index=None):
+    """Upload one file, retrying with exponential backoff; never raises.
+
+    With ``delete_after`` the local file is removed once it is in S3. With an
+    ``index``, a file whose bytes are already uploaded is not sent again; its
+    result points at the existing key. New bytes never overwrite a key the
+    index holds for other bytes: they go up under a hash-suffixed key.
+    """
+    transfer_config = transfer_config or default_transfer_config()
+    extra_args = None
+    if index is not None:
+        try:
+            with metrics.timer("images.hash"):
+                sha256 = dedup.file_sha256(job.path)
+                phash = dedup.perceptual_hash(job.path) if index.near_duplicates else None
+        except OSError as e:
+            return UploadResult(job, None, str(e), 0)
+        existing = index.claim(sha256, phash)
+        if existing is not None:
+            metrics.count("s3.duplicates_skipped")
+            if delete_after:
+                os.remove(job.path)
+            return UploadResult(job, cdn_url_for(existing, cdn_base_url), None, 0, existing)
+        key = index.available_key(job.key, sha256)
+        if key != job.key:
+            job = job._replace(key=key, filename=key.rsplit("/", 1)[-1])
+        metadata = {dedup.SHA256_METADATA: sha256}
+        if phash:
+            metadata[dedup.PHASH_METADATA] = phash
+        extra_args = {"Metadata": metadata}
+    for attempt in range(1, attempts + 1):
+        try:
+            size = os.path.getsize(job.path)
+            with metrics.timer("s3.upload"):
+                s3.upload_file(job.path, bucket, job.key, ExtraArgs=extra_args, Config=transfer_config)
+        except Exception as e:
+            if attempt == attempts:
+                metrics.count("s3.upload_failures")
+                if index is not None:
+                    index.release(sha256)
+                return UploadResult(job, None, str(e), attempt)
+            metrics.count("s3.upload_retries")
+            time.sleep(backoff * 2 ** (attempt - 1))
+            continue
+        # The object is in S3 now: bookkeeping below must not retry or fail it.
+        metrics.count("s3.upload_bytes", size)
+        if index is not None:
+            try:
+                index.add(sha256, job.key, phash, size)
+            except Exception:
+                metrics.count("images.index_errors")  # only dedup of later copies is lost
+                index.release(sha256)
+        if delete_after:
+            with contextlib.suppress(OSError):
+                os.remove(job.path)
+        return UploadResult(job, cdn_url_for(job.key, cdn_base_url), None, attempt)
+
+
+class S3Uploader:
+    """Bounded pool of upload workers sharing one client.
+
+    Use :meth:`upload_all` for a known list of files, or :meth:`submit`
+    to feed files in as they appear and collect the futures yourself.
+    """
+
+    def __init__(self, s3, bucket=BUCKET_NAME, max_workers=UPLOAD_WORKERS, transfer_config=None,
+                 attempts=UPLOAD_ATTEMPTS, backoff=UPLOAD_BACKOFF, cdn_base_url=CDN_BASE_URL, delete_after=False,
+                 index=None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.transfer_config = transfer_config
+        self.attempts = attempts
+        self.backoff = backoff
+        self.cdn_base_url = cdn_base_url
+        self.delete_after = delete_after
+        self.index = index
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-upload")
+
+    def submit(self, job):
+        return self.pool.submit(upload_one, self.s3, self.bucket, job, self.transfer_config,
+                                self.attempts, self.backoff, self.cdn_base_url, self.delete_after, self.index)
+
+    def upload_all(self, jobs, progress=None):
+        """Upload every job and return the results in job order.
+
+        ``progress(done, total)`` runs as each upload finishes.
+        """
+        futures = [self.submit(job) for job in jobs]
+        for done, _ in enumerate(as_completed(futures), 1):
+            if progress is not None:
+                progress(done, len(futures))
+        return [future.result() for future in futures]
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def keyword_images(keyword, root=IMAGES_ROOT, prefix=S3_PREFIX):
+    """Upload jobs for the files currently in ``<root>/<keyword>``, by filename."""
+    folder = os.path.join(root, keyword)
+    if not os.path.isdir(folder):
+        return []
+    return [upload_job(os.path.join(folder, f), keyword, prefix) for f in sorted(os.listdir(folder))]
+
+
+def download_and_upload(keywords, count, download, uploader, root=IMAGES_ROOT, prefix=S3_PREFIX,
+                        max_workers=DOWNLOAD_WORKERS, progress=None):
+    """Download images for every keyword concurrently and upload each keyword's
+    files as soon as its download finishes.
+
+    ``download(keyword, count)`` saves images under ``<root>/<keyword>/``
+    (``simple_image_download``'s layout). The folder is emptied first, so
+    files left by an earlier run are not uploaded again. Give the uploader
+    ``delete_after=True`` to keep only in-flight files on disk. A download
+    that raises, or calls ``exit()`` as ``simple_image_download`` does when
+    a fetch fails, is reported in ``download_errors``; the files it saved
+    are still uploaded.
+    ``progress(keywords_done, keywords_total, uploads_done, uploads_queued)``
+    runs after every event. Returns ``(uploads, download_errors)``: the
+    upload results in keyword order, and ``{keyword: message}``.
+    """
+    keywords = list(dict.fromkeys(keywords))  # one download per folder
+    uploads = {keyword: [] for keyword in keywords}
+    download_errors = {}
+    keywords_done = 0
+
+    def timed_download(keyword):
+        shutil.rmtree(os.path.join(root, keyword), ignore_errors=True)
+        with metrics.timer("images.download"):
+            try:
+                download(keyword, count)
+            except SystemExit as e:
+                raise RuntimeError(f"the downloader exited (status {e.code})") from e
+
+    def report():
+        if progress is not None:
+            queued = [upload for keyword in keywords for upload in uploads[keyword]]
+            progress(keywords_done, len(keywords), sum(upload.done() for upload in queued), len(queued))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-download") as downloads:
+        pending = {downloads.submit(timed_download, keyword): keyword for keyword in keywords}
+        for future in as_completed(pending):
+            keyword = pending[future]
+            try:
+                future.result()
+            except Exception as e:
+                download_errors[keyword] = str(e)
+            uploads[keyword] = [uploader.submit(job) for job in keyword_images(keyword, root, prefix)]
+            keywords_done += 1
+            report()
+    flat = [upload for keyword in keywords for upload in uploads[keyword]]
+    for _ in as_completed(flat):
+        report()
+    return [upload.result() for upload in flat], download_errors
@@ -0,0 +1,128 @@
+"""Tab 7: merge batch metadata into the structured CSV.
+
+JSONL uploads are read line by line into one metadata DataFrame, indexed by
+normalized ``custom_id``. Every line that yields no metadata is recorded
+with the reason. Each CSV chunk then gets its three metadata columns from a
+single indexed lookup. The ``custom_id`` normalization is vectorized and
+matches the original per-row ``norm()``: lower-cased, stripped, and leading
+zeros dropped from the author number.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from quotetool import batch, metrics
+
+METADATA_FIELDS = ["storytitle", "metadescription", "metakeywords"]
+REPORT_COLUMNS = ["source", "line", "custom_id", "problem"]
+# Zeros to drop from "<digits>-<rest>"; one zero stays if the number is all zeros.
+_PADDING_RE = r"^0+(?=\d+-.)"
+
+Issue = namedtuple("Issue", REPORT_COLUMNS)
+
+
+def normalize_custom_ids(ids):
+    """Vectorized ``norm()``: ``" 007-Some_Author-3 "`` -> ``"7-some_author-3"``."""
+    ids = ids.astype(str).str.strip().str.lower()
+    padded = ids.str.startswith("0")
+    if padded.any():  # the regex only runs on the few ids that can change
+        ids = ids.copy()
+        ids[padded] = ids[padded].str.replace(_PADDING_RE, "", regex=True)
+    return ids
+
+
+def parse_line(line):
+    """Return ``(custom_id, metadata, problem)`` for one JSONL line; ``metadata`` is ``None`` on failure."""
+    try:
+        record = batch.loads(line)
+    except ValueError:
+        return None, None, "invalid JSON"
+    if not isinstance(record, dict):
+        return None, None, "not a JSON object"
+    custom_id, metadata, _ = batch.parse_output_record(record)
+    if not custom_id:
+        return None, None, "missing custom_id"
+    if metadata is None:
+        status = (record.get("response") or {}).get("status_code")
+        if status not in (None, 200):
+            return custom_id, None, f"request failed (HTTP {status})"
+        return custom_id, None, "answer is not the requested JSON object"
+    return custom_id, metadata, None
+
+
+def read_metadata(files):
+    """Stream JSONL uploads into ``(metadata, issues)``.
+
+    ``metadata`` is indexed by normalized custom_id, with the three fields
+    plus the full ``metadata`` dict. Later lines win, as with the original
+    dict. ``issues`` lists the lines that yielded nothing.
+    """
+    with metrics.timer("merge.read_metadata"):
+        return _read_metadata(files)
+
+
+def _read_metadata(files):
+    ids, metadata, issues = [], [], []
+    for file in files:
+        source = getattr(file, "name", str(file))
+        if hasattr(file, "seek"):
+            file.seek(0)
+        handle = file if hasattr(file, "read") else open(file, "rb")
+        try:
+            for line_no, line in enumerate(handle, 1):
+                if not line.strip():
+                    continue
+                custom_id, meta, problem = parse_line(line)
+                if problem:
+                    issues.append(Issue(source, line_no, custom_id or "", problem))
+                else:
+                    ids.append(custom_id)
+                    metadata.append(meta)
+        finally:
+            if handle is not file:
+                handle.close()
+    frame = pd.DataFrame({
+        "custom_id": pd.Series(ids, dtype=object),
+        "metadata": pd.Series(metadata, dtype=object),
+    })
+    for field in METADATA_FIELDS:
+        frame[field] = [meta.get(field, "") for meta in metadata]
+    frame.index = pd.Index(normalize_custom_ids(frame["custom_id"]), name="key")
+    return frame[~frame.index.duplicated(keep="last")], issues
+
+
+class MetadataMerger:
+    """Adds the metadata columns to CSV chunks and tracks what matched."""
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.columns = {name: metadata[name].to_numpy(dtype=object) for name in METADATA_FIELDS + ["metadata"]}
+        self.matched = np.zeros(len(metadata), dtype=bool)
+        self.unmatched_rows = []
+
+    def merge(self, df):
+        """Return ``(merged chunk, metadata dict per row or None)``."""
+        with metrics.timer("merge.join"):
+            return self._merge(df)
+
+    def _merge(self, df):
+        positions = self.metadata.index.get_indexer(normalize_custom_ids(df["custom_id"]))
+        hit = positions >= 0
+        self.matched[positions[hit]] = True
+        self.unmatched_rows.extend(df["custom_id"][~hit].astype(str))
+        found = {}
+        for name, values in self.columns.items():
+            column = np.full(len(df), "" if name != "metadata" else None, dtype=object)
+            column[hit] = values[positions[hit]]
+            found[name] = column
+        merged = df.assign(**{field: found[field] for field in METADATA_FIELDS})
+        return merged, found["metadata"].tolist()
+
+    def report(self, issues=()):
+        """Unparsed lines, CSV rows without metadata and metadata without CSV rows."""
+        rows = [tuple(issue) for issue in issues]
+        rows += [("csv", "", custom_id, "no metadata for this row") for custom_id in self.unmatched_rows]
+        orphans = self.metadata[~self.matched]
+        rows += [("jsonl", "", custom_id, "no CSV row with this custom_id") for custom_id in orphans["custom_id"]]
+        return pd.DataFrame(rows, columns=REPORT_COLUMNS)
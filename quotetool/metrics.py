@@ -0,0 +1,185 @@
+"""Timers and counters around the hot paths, plus opt-in profiling.
+
+Instrumented code wraps a step in ``metrics.timer("scrape.fetch")`` or adds
+to ``metrics.count("scrape.bytes")``. Both record into the process-wide
+:data:`METRICS`. A timer keeps its count, total, max and cumulative
+histogram buckets. A counter is a plain sum (bytes, rows, pages). Recording
+takes a lock and two ``perf_counter`` calls, so it is cheap enough for
+every page, file or chunk. Per-row work is timed per chunk.
+
+:meth:`Metrics.to_json` and :meth:`Metrics.to_prometheus` export a
+snapshot. :func:`profiled` runs a block under cProfile, or under
+pyinstrument when it is installed.
+"""
+import contextlib
+import cProfile
+import importlib.util
+import io
+import json
+import pstats
+import re
+import threading
+import time
+
+# Upper bounds in seconds, from a cache hit to a slow multipart upload.
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0)
+PROMETHEUS_PREFIX = "quotetool"
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+class Metrics:
+    """Named timers and counters; safe to update from any thread."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+        self.started_at = time.time()
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        with self.lock:
+            stat = self.timers.get(name)
+            if stat is None:
+                stat = self.timers[name] = {"count": 0, "total": 0.0, "max": 0.0,
+                                            "buckets": [0] * len(self.buckets)}
+            stat["count"] += 1
+            stat["total"] += seconds
+            stat["max"] = max(stat["max"], seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    stat["buckets"][i] += 1
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "started_at": self.started_at,
+                "buckets": list(self.buckets),
+                "timers": {name: {**stat, "buckets": list(stat["buckets"])} for name, stat in self.timers.items()},
+                "counters": dict(self.counters),
+            }
+
+    def rows(self):
+        """One summary row per timer and counter, sorted by name, for display."""
+        snapshot = self.snapshot()
+        rows = [{
+            "metric": name,
+            "count": stat["count"],
+            "total s": round(stat["total"], 3),
+            "mean ms": round(stat["total"] / stat["count"] * 1000, 2) if stat["count"] else 0.0,
+            "max ms": round(stat["max"] * 1000, 2),
+        } for name, stat in snapshot["timers"].items()]
+        rows += [{"metric": name, "count": value} for name, value in snapshot["counters"].items()]
+        return sorted(rows, key=lambda row: row["metric"])
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """Prometheus text exposition format: a histogram per timer, a counter per counter."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, stat in sorted(snapshot["timers"].items()):
+            metric = _prometheus_name(prefix, name, "seconds")
+            lines += [f"# HELP {metric} Time spent in {name}.", f"# TYPE {metric} histogram"]
+            lines += [f'{metric}_bucket{{le="{bound:g}"}} {hits}'
+                      for bound, hits in zip(snapshot["buckets"], stat["buckets"])]
+            lines += [f'{metric}_bucket{{le="+Inf"}} {stat["count"]}',
+                      f"{metric}_sum {stat['total']:.6f}", f"{metric}_count {stat['count']}"]
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = _prometheus_name(prefix, name, "total")
+            lines += [f"# HELP {metric} Count of {name}.", f"# TYPE {metric} counter", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write a snapshot to ``path``: Prometheus text for ``.prom``/``.txt``, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w") as f:
+            f.write(text)
+
+
+def _prometheus_name(prefix, name, suffix):
+    return f"{prefix}_{re.sub(r'[^A-Za-z0-9_]', '_', name)}_{suffix}"
+
+
+METRICS = Metrics()
+
+
+def timer(name):
+    """Time the ``with`` block into :data:`METRICS` under ``name``."""
+    return METRICS.timer(name)
+
+
+def count(name, value=1):
+    METRICS.count(name, value)
+
+
+def available_profilers():
+    return [name for name in PROFILERS if name == "cprofile" or importlib.util.find_spec(name)]
+
+
+class Profile:
+    """Result of :func:`profiled`; :meth:`report` is empty when profiling was off."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.profiler = None
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def report(self, limit=40):
+        if self.profiler is None:
+            return ""
+        if self.backend == "pyinstrument":
+            return self.profiler.output_text(unicode=True)
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+@contextlib.contextmanager
+def profiled(backend=None):
+    """Profile the block with ``"cprofile"`` or ``"pyinstrument"``; ``None`` only yields.
+
+    Both profilers follow the calling thread. Work handed to thread pools
+    shows up as time spent waiting on it; the timers cover that side.
+    """
+    profile = Profile(backend)
+    if backend is None:
+        yield profile
+        return
+    if backend == "pyinstrument":
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        start, stop = profiler.start, profiler.stop
+    elif backend == "cprofile":
+        profiler = cProfile.Profile()
+        start, stop = profiler.enable, profiler.disable
+    else:
+        raise ValueError(f"unknown profiler {backend!r}; expected one of {PROFILERS}")
+    profile.profiler = profiler
+    start()
+    try:
+        yield profile
+    finally:
+        stop()
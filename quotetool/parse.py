@@ -0,0 +1,218 @@
+"""Pluggable HTML backends for extracting quotes from QuoteFancy pages.
+
+Every backend finds the ``div.q-wrapper`` containers and hands each one to
+:func:`_extract`, which walks the container's descendants once and picks out
+the quote, link and author elements. It does not repeat ``find`` for each
+field. All backends produce the same output as the original BeautifulSoup
+code. ``benchmarks/bench_parse.py`` checks this against saved pages.
+
+A backend imports its library when it first parses, so importing this
+module (for :data:`DEFAULT_PARSER`, say) stays cheap.
+"""
+import functools
+import importlib.util
+
+
+def _text(strings):
+    # Same as BeautifulSoup's ``get_text(strip=True)``.
+    return "".join(s.strip() for s in strings if s and s.strip())
+
+
+class SoupBackend:
+    """BeautifulSoup with the stdlib ``html.parser``; parses the whole page."""
+
+    def strainer(self):
+        return None
+
+    def containers(self, content):
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(content, "html.parser", parse_only=self.strainer())
+        return soup.find_all("div", class_="q-wrapper")
+
+    def descendants(self, node):
+        return node.find_all(True)
+
+    def tag(self, node):
+        return node.name
+
+    def classes(self, node):
+        value = node.get("class")
+        return value if value else ()
+
+    def text(self, node):
+        return node.get_text(strip=True)
+
+    def href(self, node):
+        return node.get("href", "")
+
+    def first_link(self, node):
+        return node.find("a")
+
+
+def _has_q_wrapper(value):
+    return bool(value) and "q-wrapper" in (value.split() if isinstance(value, str) else value)
+
+
+class StrainedSoupBackend(SoupBackend):
+    """BeautifulSoup that only builds ``div.q-wrapper`` subtrees."""
+
+    def strainer(self):
+        return _q_wrapper_strainer()
+
+
+@functools.cache
+def _q_wrapper_strainer():
+    from bs4 import SoupStrainer
+
+    # While parsing, the strainer sees the raw attribute string, so
+    # ``class_="q-wrapper"`` would miss ``class="q-wrapper featured"``.
+    return SoupStrainer("div", class_=_has_q_wrapper)
+
+
+class LxmlBackend:
+    """``lxml.html`` (libxml2), walked directly without BeautifulSoup."""
+
+    def containers(self, content):
+        import lxml.html
+
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", "replace")
+        if not content.strip():
+            return []
+        root = lxml.html.document_fromstring(content)
+        return root.xpath('//div[contains(concat(" ", normalize-space(@class), " "), " q-wrapper ")]')
+
+    def descendants(self, node):
+        return node.iterdescendants("div", "a", "p")
+
+    def tag(self, node):
+        return node.tag
+
+    def classes(self, node):
+        return node.get("class", "").split()
+
+    def text(self, node):
+        return _text(node.xpath(".//text()"))
+
+    def href(self, node):
+        return node.get("href", "")
+
+    def first_link(self, node):
+        return next(node.iterdescendants("a"), None)
+
+
+class SelectolaxBackend:
+    """selectolax on the lexbor engine."""
+
+    def containers(self, content):
+        from selectolax.lexbor import LexborHTMLParser
+
+        return LexborHTMLParser(content).css("div.q-wrapper")
+
+    def descendants(self, node):
+        nodes = node.traverse()
+        next(nodes)  # ``traverse`` starts with the container itself
+        return nodes
+
+    def tag(self, node):
+        return node.tag
+
+    def classes(self, node):
+        return (node.attributes.get("class") or "").split()
+
+    def text(self, node):
+        return node.text(deep=True, separator="", strip=True)
+
+    def href(self, node):
+        return node.attributes.get("href") or ""
+
+    def first_link(self, node):
+        return node.css_first("a")
+
+
+BACKENDS = {
+    "html.parser": SoupBackend,
+    "strainer": StrainedSoupBackend,
+    "lxml": LxmlBackend,
+    "selectolax": SelectolaxBackend,
+}
+# Optional speed-ups; the BeautifulSoup backends are always there.
+_REQUIREMENTS = {"lxml": "lxml.html", "selectolax": "selectolax.lexbor"}
+
+
+def _installed(module):
+    try:
+        return importlib.util.find_spec(module) is not None
+    except ModuleNotFoundError:  # the parent package is missing
+        return False
+
+
+def available_parsers():
+    return [name for name in BACKENDS if name not in _REQUIREMENTS or _installed(_REQUIREMENTS[name])]
+
+
+DEFAULT_PARSER = next(name for name in ("selectolax", "lxml", "strainer") if name in available_parsers())
+
+
+def get_backend(name=None):
+    name = name or DEFAULT_PARSER
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown parser {name!r}; choose from {sorted(BACKENDS)}")
+    if name not in available_parsers():
+        raise ImportError(f"Parser {name!r} is not installed")
+    return BACKENDS[name]()
+
+
+def _extract(backend, container):
+    quote_div = quote_a = author_div = author_p = None
+    for node in backend.descendants(container):
+        tag = backend.tag(node)
+        if tag not in ("div", "a", "p"):
+            continue
+        classes = backend.classes(node)
+        if not classes:
+            continue
+        if tag == "div":
+            if quote_div is None and "quote-a" in classes:
+                quote_div = node
+            # bs4's class_="author-p bylines" matches the whole attribute.
+            if author_div is None and " ".join(classes) == "author-p bylines":
+                author_div = node
+        elif tag == "a":
+            if quote_a is None and "quote-a" in classes:
+                quote_a = node
+        elif author_p is None and "author-p" in classes:
+            author_p = node
+
+    quote_node = quote_div if quote_div is not None else quote_a
+    if quote_node is None:
+        return None
+    quote_text = backend.text(quote_node)
+
+    link_node = backend.first_link(quote_div) if quote_div is not None else None
+    if link_node is None:
+        link_node = quote_a
+    quote_link = backend.href(link_node) if link_node is not None else ""
+
+    if author_div is not None:
+        author_text = backend.text(author_div).replace("by ", "").strip()
+    else:
+        author_link = backend.first_link(author_p) if author_p is not None else None
+        author_text = backend.text(author_link) if author_link is not None else "Anonymous"
+
+    return [quote_text, quote_link, author_text]
+
+
+def parse_quotes_page(content, parser=None):
+    """Return ``[quote, link, author]`` for every ``div.q-wrapper`` on a page.
+
+    Containers without any ``.quote-a`` element are skipped.
+    """
+    backend = get_backend(parser)
+    quotes = []
+    for container in backend.containers(content):
+        row = _extract(backend, container)
+        if row is not None:
+            quotes.append(row)
+    return quotes
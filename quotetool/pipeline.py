@@ -0,0 +1,287 @@
+"""The toolkit's stages as plain functions, shared by the app and the CLI.
+
+Each stage takes files and clients and returns what it produced, with no
+Streamlit calls, so the same code runs behind the tabs and from cron via
+``python -m quotetool``. Submitting a batch is idempotent: every JSONL shard
+is recorded in the batch registry under the SHA-256 of its bytes, and a
+shard that is already submitted reuses its batch instead of starting another.
+
+Stages import their modules when they run: scraping never loads pandas or
+boto3, and nothing loads the Azure SDKs until a client is built.
+"""
+import os
+import time
+from collections import namedtuple
+
+from quotetool import metrics
+
+# Azure keeps the uploaded input and the batch output for 14 days.
+FILE_EXPIRY_SECONDS = 14 * 24 * 3600
+
+ScrapeRun = namedtuple("ScrapeRun", "output_path new_rows total_rows")
+BatchPrep = namedtuple(
+    "BatchPrep",
+    "ts cleaned_csv removed_csv structured_csv jsonl_filename jsonl_paths cached_paths submitted cached tokens_saved"
+)
+BatchPrep.__doc__ = """Files written by :func:`prepare_batch`. ``submitted`` rows went to
+the JSONL shards, ``cached`` rows were answered from the prompt cache."""
+ImageRun = namedtuple("ImageRun", "frame uploads download_errors transformer")
+MergeRun = namedtuple("MergeRun", "metadata_lines issues rows unmatched report")
+
+
+def scrape_job(urls, job, resume=True, page_cache=None, progress=None, output_path=None, **crawl_kwargs):
+    """Tab 1: scrape author URLs and export them to ``output_path``.
+
+    The CSV holds every quote the job has for the requested slugs, slug by
+    slug in request order, whatever order their pages finished in.
+    ``total_rows`` counts its rows. It defaults to the job's CSV under
+    ``.cache/scrapes``, which every run of the job rewrites; callers that
+    serve the file to a user should pass a path of their own. Runs of one
+    job wait for each other. Without ``resume`` the job's checkpoints and
+    files are discarded first. Other keyword arguments go to
+    :func:`~quotetool.scrape.iter_pages`.
+    """
+    from quotetool import checkpoint, scrape
+
+    slugs = [scrape.extract_slug_from_url(url) for url in urls]
+    output_path = output_path or checkpoint.sink_path(job)
+    with checkpoint.job_lock(job):
+        store = checkpoint.CheckpointStore()
+        try:
+            with checkpoint.SlugSinks(checkpoint.sink_dir(job)) as sinks:
+                if not resume:
+                    store.reset(job)
+                    sinks.remove()
+                new_rows = checkpoint.scrape_checkpointed(slugs, job, store, sinks, incremental=resume,
+                                                          cache=page_cache, progress=progress, **crawl_kwargs)
+                total_rows = sinks.export(slugs, output_path)
+        finally:
+            store.close()
+    return ScrapeRun(output_path, new_rows, total_rows)
+
+
+def structure_csv(src, output):
+    """Tab 2: write the one-row-per-author table to ``output``; return its row count."""
+    from quotetool import ingest, structure
+
+    final = structure.structure_by_author_chunks(ingest.read_csv_chunks(src, usecols=["Quote", "Author"]))
+    output.write(final)
+    return len(final)
+
+
+def prepare_batch(src, ts=None, reuse_results=True, model=None, out_dir=""):
+    """Tab 3: split the upload into clean and removed rows, tag ids and write the JSONL.
+
+    Rows whose prompt is already in the prompt cache go to the cached
+    results file instead of the JSONL when ``reuse_results`` is set.
+    ``model`` defaults to :data:`~quotetool.batch.DEPLOYMENT_MODEL`.
+    """
+    import pandas as pd
+    from quotetool import batch, ingest, prompt_cache
+
+    model = model or batch.DEPLOYMENT_MODEL
+    ts = ts or str(int(time.time()))
+    cleaned_csv = os.path.join(out_dir, f"cleaned_data_{ts}.csv")
+    removed_csv = os.path.join(out_dir, f"removed_data_{ts}.csv")
+    structured_csv = os.path.join(out_dir, f"structured-data-id_{ts}.csv")
+    jsonl_filename = os.path.join(out_dir, f"quotefancy_azure_batch_{ts}.jsonl")
+    cached_filename = os.path.join(out_dir, f"cached_results_{ts}.jsonl")
+    id_generator = batch.CustomIdGenerator()
+    results_cache = prompt_cache.ResultCache()
+    tokens_saved = 0
+
+    # Every chunk is split, tagged and turned into JSONL before the next
+    # one is read; the files on disk are the only full copies.
+    try:
+        with ingest.CsvOutput(cleaned_csv) as cleaned_out, \
+                ingest.CsvOutput(removed_csv) as removed_out, \
+                ingest.CsvOutput(structured_csv) as structured_out, \
+                batch.JsonlShardWriter(jsonl_filename) as jsonl_out, \
+                batch.JsonlShardWriter(cached_filename) as cached_out:
+            for df in ingest.read_csv_chunks(src):
+                with metrics.timer("batch.clean"):
+                    df = df.replace(r'^\s*$', pd.NA, regex=True)
+                    df = df.replace("NA", pd.NA)
+
+                    # Separate clean and removed
+                    clean = df.dropna()
+                    removed = df[df.isna().any(axis=1)]
+                    cleaned_out.write(clean)
+                    removed_out.write(removed)
+
+                    clean = clean.assign(custom_id=id_generator.assign(clean['Author']))
+                    final = clean[["custom_id"] + [c for c in clean.columns if c != "custom_id"]]
+                    structured_out.write(final)
+
+                with metrics.timer("batch.prompt_cache_lookup"):
+                    chunk_requests = list(batch.iter_requests(final, model))
+                    keys = [prompt_cache.prompt_key(request) for request in chunk_requests]
+                    hits = results_cache.get_many(keys) if reuse_results else {}
+                with metrics.timer("batch.build_jsonl"):
+                    submitted = []
+                    for request, key in zip(chunk_requests, keys):
+                        if key in hits:
+                            metadata, total_tokens = hits[key]
+                            cached_out.write(batch.cached_output_record(request["custom_id"], metadata))
+                            tokens_saved += total_tokens or prompt_cache.estimate_tokens(request, metadata)
+                        else:
+                            jsonl_out.write(request)
+                            submitted.append((request["custom_id"], key, prompt_cache.estimate_tokens(request)))
+                    results_cache.remember_submitted(jsonl_filename, submitted)
+                metrics.count("batch.requests", len(submitted))
+                metrics.count("batch.cached", len(chunk_requests) - len(submitted))
+    finally:
+        results_cache.close()
+    return BatchPrep(
+        ts, cleaned_csv, removed_csv, structured_csv, jsonl_filename,
+        jsonl_out.paths, cached_out.paths,
+        jsonl_out.total_requests, cached_out.total_requests, tokens_saved
+    )
+
+
+def submit_batches(client, prep, batch_registry):
+    """Upload each JSONL shard and start its batch; return one entry per shard.
+
+    A shard whose bytes are already registered under a batch that has not
+    failed, expired or been cancelled is not uploaded again. Its entry
+    points at that batch and has ``reused`` set.
+    """
+    from quotetool import dedup
+
+    batches = []
+    for part, jsonl_path in enumerate(prep.jsonl_paths, 1):
+        input_sha256 = dedup.file_sha256(jsonl_path)
+        existing = batch_registry.find_submitted(input_sha256)
+        if existing is not None:
+            metrics.count("batch.reused")
+            batches.append({"batch_id": existing["batch_id"], "file_id": existing["file_id"],
+                            "jsonl_file": existing["jsonl_file"], "reused": True})
+            continue
+        with metrics.timer("batch.upload_file"), open(jsonl_path, "rb") as f:
+            batch_file = client.files.create(
+                file=f,
+                purpose="batch",
+                extra_body={"expires_after": {"seconds": FILE_EXPIRY_SECONDS, "anchor": "created_at"}}
+            )
+        metrics.count("batch.upload_bytes", os.path.getsize(jsonl_path))
+        with metrics.timer("batch.create"):
+            batch_job = client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/chat/completions",
+                completion_window="24h",
+                extra_body={"output_expires_after": {"seconds": FILE_EXPIRY_SECONDS, "anchor": "created_at"}}
+            )
+        batch_registry.register(batch_job.id, prep.ts, part, len(prep.jsonl_paths), jsonl_path, batch_file.id,
+                                prep.structured_csv, prep.jsonl_filename, input_sha256)
+        batches.append({"batch_id": batch_job.id, "file_id": batch_file.id, "jsonl_file": jsonl_path,
+                        "reused": False})
+    return batches
+
+
+def tracking_info(prep, batches):
+    """The ``azure_batch_tracking_*.json`` contents that Tab 4 and ``fetch`` import."""
+    return {
+        "ts": prep.ts,
+        "batch_id": batches[0]["batch_id"],
+        "file_id": batches[0]["file_id"],
+        "jsonl_file": batches[0]["jsonl_file"],
+        "csv_file": prep.structured_csv,
+        "batches": [{name: entry[name] for name in ("batch_id", "file_id", "jsonl_file")} for entry in batches],
+        "cache_source": prep.jsonl_filename
+    }
+
+
+def pending_batch_ids(batch_registry):
+    """Batches still running, or completed without their files downloaded."""
+    from quotetool import registry
+
+    return [row["batch_id"] for row in batch_registry.all()
+            if row["status"] not in registry.TERMINAL_STATUSES
+            or registry.awaiting_download(row)]
+
+
+def fetch_results(poller, batch_ids=None, wait=False, interval=30, timeout=None):
+    """Tab 4: poll the pending batches (or ``batch_ids``) and download finished ones.
+
+    With ``wait`` it keeps polling every ``interval`` seconds until none of
+    them is pending or ``timeout`` seconds have passed. Returns the batches
+    still pending.
+    """
+    watched = set(pending_batch_ids(poller.registry) if batch_ids is None else batch_ids)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        pending = [batch_id for batch_id in pending_batch_ids(poller.registry) if batch_id in watched]
+        if pending:
+            poller.poll_once(batch_ids=pending)
+            pending = [batch_id for batch_id in pending_batch_ids(poller.registry) if batch_id in watched]
+        if not (wait and pending) or (deadline is not None and time.monotonic() + interval > deadline):
+            return pending
+        time.sleep(interval)
+
+
+def upload_images(keywords, count, download, s3, bucket=None, prefix=None, cdn_base_url=None,
+                  skip_duplicates=True, near_duplicates=False, presets=None, progress=None):
+    """Tab 6: download images per keyword, upload them to S3 and add the CDN URL columns.
+
+    ``download(keyword, count)`` saves images the way ``simple_image_download``
+    does; ``progress`` goes to :func:`~quotetool.media.download_and_upload`.
+    Unset options take the defaults in :mod:`quotetool.media` and
+    :mod:`quotetool.cdn`.
+    """
+    import pandas as pd
+    from quotetool import cdn, dedup, media
+
+    bucket = bucket or media.BUCKET_NAME
+    prefix = media.S3_PREFIX if prefix is None else prefix
+    cdn_base_url = cdn_base_url or media.CDN_BASE_URL
+    image_index = dedup.ImageIndex(near_duplicates=near_duplicates) if skip_duplicates else None
+    try:
+        with media.S3Uploader(s3, bucket, cdn_base_url=cdn_base_url, delete_after=True,
+                              index=image_index) as uploader:
+            uploads, download_errors = media.download_and_upload(
+                keywords, count, download, uploader, prefix=prefix, progress=progress
+            )
+    finally:
+        if image_index is not None:
+            image_index.close()
+    frame = pd.DataFrame(
+        [[u.job.keyword, u.job.filename, u.cdn_url] for u in uploads if not u.error],
+        columns=["Keyword", "Filename", "CDN_URL"]
+    )
+    transformer = cdn.CdnTransformer(presets or cdn.DEFAULT_PRESETS, bucket=bucket)
+    return ImageRun(transformer.apply(frame), uploads, download_errors, transformer)
+
+
+def merge_metadata(csv_file, jsonl_files, output, fill_cache=None):
+    """Tab 7: write ``csv_file`` with its metadata columns filled in to ``output``.
+
+    The answers are also filed in the prompt cache when the CSV still holds
+    the quotes (``fill_cache=None`` checks the header).
+    """
+    from quotetool import batch, ingest, merge, prompt_cache, structure
+
+    metadata, issues = merge.read_metadata(jsonl_files)
+    merger = merge.MetadataMerger(metadata)
+    if fill_cache is None:
+        # The structured CSV still holds the quotes, so the prompts can be
+        # rebuilt and the answers filed in the prompt cache for Tab 3.
+        fill_cache = set(structure.STRUCTURED_COLUMNS) <= set(ingest.csv_columns(csv_file))
+    rows = 0
+    results_cache = prompt_cache.ResultCache() if fill_cache else None
+    try:
+        for df in ingest.read_csv_chunks(csv_file):
+            merged, metas = merger.merge(df)
+            if results_cache is not None:
+                entries = []
+                for request, meta in zip(batch.iter_requests(df), metas):
+                    if isinstance(meta, dict):
+                        entries.append((prompt_cache.prompt_key(request), meta, prompt_cache.estimate_tokens(request, meta)))
+                results_cache.put_many(entries, replace=False)
+            output.write(merged)
+            rows += len(merged)
+    finally:
+        if results_cache is not None:
+            results_cache.close()
+    metrics.count("merge.rows", rows)
+    metrics.count("merge.unmatched", len(merger.unmatched_rows))
+    return MergeRun(len(metadata), issues, rows, len(merger.unmatched_rows), merger.report(issues))
@@ -0,0 +1,127 @@
+"""Cache of generated metadata keyed on the exact prompt.
+
+The key is a SHA-256 of ``(model, system prompt, user prompt)``. Tab 3 looks
+up every request before submitting it and keeps only the misses. It also
+records which cache key each submitted ``custom_id`` belongs to, so Tab 4 can
+file the batch output once the batch completes. Tab 7 rebuilds the prompts
+from the structured CSV it merges and files those results too.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from quotetool import batch
+
+RESULTS_PATH = os.path.join(".cache", "prompt_results.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    metadata TEXT NOT NULL,
+    total_tokens INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS submitted (
+    source TEXT NOT NULL,
+    custom_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    tokens_estimate INTEGER,
+    PRIMARY KEY (source, custom_id)
+);
+"""
+_IN_BATCH = 500  # stay well below SQLite's bound-parameter limit
+
+
+def _messages(request):
+    system = user = ""
+    for message in request["body"]["messages"]:
+        if message["role"] == "system" and not system:
+            system = message["content"]
+        elif message["role"] == "user" and not user:
+            user = message["content"]
+    return system, user
+
+
+def prompt_key(request):
+    system, user = _messages(request)
+    payload = json.dumps([request["body"]["model"], system, user], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(request, metadata=None):
+    """Rough token count (about four characters per token) when usage is unknown."""
+    system, user = _messages(request)
+    answer = json.dumps(metadata) if metadata else ""
+    return (len(system) + len(user) + len(answer)) // 4
+
+
+class ResultCache:
+    def __init__(self, path=RESULTS_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+
+    def get_many(self, keys):
+        """Return ``{key: (metadata, total_tokens)}`` for the keys that are cached."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for start in range(0, len(keys), _IN_BATCH):
+            part = keys[start:start + _IN_BATCH]
+            rows = self.conn.execute(
+                f"SELECT key, metadata, total_tokens FROM results WHERE key IN ({','.join('?' * len(part))})", part
+            )
+            for key, metadata, total_tokens in rows:
+                found[key] = (json.loads(metadata), total_tokens)
+        return found
+
+    def put_many(self, entries, replace=True):
+        """Store ``(key, metadata, total_tokens)`` tuples.
+
+        With ``replace=False`` existing results (and their real token usage)
+        are kept.
+        """
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO results VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(metadata), total_tokens, now) for key, metadata, total_tokens in entries]
+            )
+
+    def remember_submitted(self, source, entries):
+        """Record ``(custom_id, key, tokens_estimate)`` for a submitted JSONL."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO submitted VALUES (?, ?, ?, ?)",
+                [(source, custom_id, key, estimate) for custom_id, key, estimate in entries]
+            )
+
+    def ingest_batch_output(self, path, source):
+        """File the results of a downloaded batch output; return how many were stored."""
+        pending = {
+            custom_id: (key, estimate) for custom_id, key, estimate in self.conn.execute(
+                "SELECT custom_id, key, tokens_estimate FROM submitted WHERE source = ?", (source,)
+            )
+        }
+        if not pending:
+            return 0
+        entries = []
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                custom_id, metadata, total_tokens = batch.parse_output_record(record)
+                if metadata is not None and custom_id in pending:
+                    key, estimate = pending[custom_id]
+                    entries.append((key, metadata, total_tokens or estimate))
+        self.put_many(entries)
+        return len(entries)
+
+    def close(self):
+        self.conn.close()
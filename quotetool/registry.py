@@ -0,0 +1,286 @@
+"""Local registry of submitted Azure batches and a background status poller.
+
+Tab 3 registers every batch it submits; Tab 4 can also import older tracking
+JSON files. :class:`BatchPoller` refreshes all unfinished batches
+concurrently. A batch whose status and counts did not change waits twice as
+long before its next check, up to ``max_interval``. Completed batches are
+downloaded right away: the output file, plus the error file when some
+requests failed, both streamed to disk. The output is indexed by custom_id
+and filed in the prompt cache.
+"""
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from quotetool import metrics, results
+
+REGISTRY_PATH = os.path.join(".cache", "batch_registry.sqlite")
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    ts TEXT,
+    part INTEGER NOT NULL DEFAULT 1,
+    jsonl_file TEXT,
+    file_id TEXT,
+    csv_file TEXT,
+    cache_source TEXT,
+    input_sha256 TEXT,
+    output_filename TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'submitted',
+    total INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    started_at REAL,
+    output_file_id TEXT,
+    error_file_id TEXT,
+    output_path TEXT,
+    error_path TEXT,
+    blob_name TEXT,
+    error_blob_name TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_poll_at REAL NOT NULL DEFAULT 0,
+    last_polled_at REAL,
+    registered_at REAL NOT NULL
+);
+"""
+# A batch in one of these states can be submitted again.
+RESUBMITTABLE_STATUSES = {"failed", "expired", "cancelled"}
+
+
+def awaiting_download(row):
+    """A completed batch whose files have not been fetched yet.
+
+    A batch that completed without any file is recorded with empty paths,
+    so it stops matching here and in :meth:`BatchRegistry.due`.
+    """
+    return row["status"] == "completed" and row["output_path"] is None and row["error_path"] is None
+
+
+def output_filename_for(ts, part=1, parts=1, kind="results"):
+    return f"batch_{kind}_{ts}.jsonl" if parts == 1 else f"batch_{kind}_{ts}_part{part}.jsonl"
+
+
+def error_filename_for(output_filename):
+    return output_filename.replace("batch_results_", "batch_errors_", 1)
+
+
+def eta_seconds(row, now=None):
+    """Estimated seconds left, from the completion rate so far; ``None`` if unknown."""
+    if row["status"] in TERMINAL_STATUSES:
+        return 0
+    done = row["completed"] + row["failed"]
+    if not row["started_at"] or not done or not row["total"]:
+        return None
+    elapsed = (now or time.time()) - row["started_at"]
+    return max(0.0, (row["total"] - done) * elapsed / done)
+
+
+class BatchRegistry:
+    """SQLite-backed batch table; safe to share between poller threads."""
+
+    def __init__(self, path=REGISTRY_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def register(self, batch_id, ts, part=1, parts=1, jsonl_file=None, file_id=None,
+                 csv_file=None, cache_source=None, input_sha256=None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO batches (batch_id, ts, part, jsonl_file, file_id, csv_file, "
+                "cache_source, input_sha256, output_filename, registered_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (batch_id, ts, part, jsonl_file, file_id, csv_file, cache_source, input_sha256,
+                 output_filename_for(ts, part, parts), time.time())
+            )
+
+    def find_submitted(self, input_sha256):
+        """The latest batch for this JSONL content that is still usable, or ``None``.
+
+        Failed, expired and cancelled batches do not count, so their input
+        can be submitted again.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM batches WHERE input_sha256 = ? AND status NOT IN ({}) "
+                "ORDER BY registered_at DESC LIMIT 1".format(",".join("?" * len(RESUBMITTABLE_STATUSES))),
+                [input_sha256, *RESUBMITTABLE_STATUSES]
+            ).fetchone()
+        return dict(row) if row else None
+
+    def import_tracking(self, tracking_info):
+        """Register the batches of a Tab 3 tracking JSON; return their ids."""
+        ts = tracking_info.get("ts")
+        tracked = tracking_info.get("batches") or [{
+            "batch_id": tracking_info.get("batch_id"),
+            "file_id": tracking_info.get("file_id"),
+            "jsonl_file": tracking_info.get("jsonl_file"),
+        }]
+        for part, entry in enumerate(tracked, 1):
+            self.register(
+                entry["batch_id"], ts, part, len(tracked), entry.get("jsonl_file"), entry.get("file_id"),
+                tracking_info.get("csv_file"), tracking_info.get("cache_source")
+            )
+        return [entry["batch_id"] for entry in tracked]
+
+    def get(self, batch_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+        return dict(row) if row else None
+
+    def all(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM batches ORDER BY registered_at DESC, part").fetchall()
+        return [dict(row) for row in rows]
+
+    def due(self, now=None, batch_ids=None):
+        """Batches to poll: unfinished ones whose backoff expired, plus
+        completed ones whose files have not been downloaded yet."""
+        query = (
+            "SELECT * FROM batches WHERE (status NOT IN ({}) OR "
+            "(status = 'completed' AND output_path IS NULL AND error_path IS NULL))"
+            .format(",".join("?" * len(TERMINAL_STATUSES)))
+        )
+        params = list(TERMINAL_STATUSES)
+        if batch_ids is not None:
+            query += " AND batch_id IN ({})".format(",".join("?" * len(batch_ids)))
+            params += list(batch_ids)
+        else:
+            query += " AND next_poll_at <= ?"
+            params.append(now or time.time())
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def update(self, batch_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self.lock, self.conn:
+            self.conn.execute(f"UPDATE batches SET {assignments} WHERE batch_id = ?", [*fields.values(), batch_id])
+
+    def close(self):
+        self.conn.close()
+
+
+class BatchPoller:
+    """Refreshes registered batches against an Azure OpenAI client.
+
+    ``on_downloaded(row)`` runs after a batch's files are saved (Tab 4 uses
+    it to copy them to Blob storage) and may return fields to store.
+    """
+
+    def __init__(self, client, registry, max_workers=8, base_interval=30, max_interval=900,
+                 on_downloaded=None, download_dir="."):
+        self.client = client
+        self.registry = registry
+        self.max_workers = max_workers
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.on_downloaded = on_downloaded
+        self.download_dir = download_dir
+        self._stop = threading.Event()
+        self._thread = None
+        self._poll_lock = threading.Lock()
+
+    def poll_once(self, batch_ids=None):
+        """Poll every due batch (or exactly ``batch_ids``) concurrently."""
+        with self._poll_lock:
+            due = self.registry.due(batch_ids=batch_ids)
+            if due:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(due))) as pool:
+                    list(pool.map(self._poll, due))
+            return len(due)
+
+    def _backoff(self, attempts):
+        return time.time() + min(self.base_interval * 2 ** attempts, self.max_interval)
+
+    def _poll(self, row):
+        now = time.time()
+        try:
+            with metrics.timer("azure.poll"):
+                job = self.client.batches.retrieve(row["batch_id"])
+        except Exception as e:
+            attempts = row["attempts"] + 1
+            self.registry.update(row["batch_id"], error=str(e), attempts=attempts,
+                                 next_poll_at=self._backoff(attempts), last_polled_at=now)
+            return
+        counts = getattr(job, "request_counts", None)
+        fields = {
+            "status": job.status,
+            "total": getattr(counts, "total", 0) or 0,
+            "completed": getattr(counts, "completed", 0) or 0,
+            "failed": getattr(counts, "failed", 0) or 0,
+            "started_at": getattr(job, "in_progress_at", None) or getattr(job, "created_at", None),
+            "output_file_id": getattr(job, "output_file_id", None),
+            "error_file_id": getattr(job, "error_file_id", None),
+            "error": None,
+            "last_polled_at": now,
+        }
+        changed = any(fields[name] != row[name] for name in ("status", "completed", "failed"))
+        fields["attempts"] = 0 if changed else row["attempts"] + 1
+        fields["next_poll_at"] = self._backoff(fields["attempts"])
+        self.registry.update(row["batch_id"], **fields)
+        if awaiting_download({**row, **fields}):
+            self._download({**row, **fields})
+
+    def _download(self, row):
+        if not (row["output_file_id"] or row["error_file_id"]):
+            # Nothing will ever appear to download; empty paths end the polling.
+            self.registry.update(row["batch_id"], output_path="", error_path="",
+                                 error="No output or error file found in batch job.")
+            return
+        fields = {}
+        try:
+            if row["output_file_id"]:
+                path = os.path.join(self.download_dir, row["output_filename"])
+                results.download_file(self.client, row["output_file_id"], path)
+                results.ResultIndex(path).close()
+                fields["output_path"] = path
+            if row["error_file_id"]:
+                path = os.path.join(self.download_dir, error_filename_for(row["output_filename"]))
+                results.download_file(self.client, row["error_file_id"], path)
+                fields["error_path"] = path
+        except Exception as e:
+            self.registry.update(row["batch_id"], error=f"Download failed: {e}")
+            return
+        if row["cache_source"] and "output_path" in fields:
+            from quotetool import prompt_cache  # pandas, via the batch builder
+
+            results_cache = prompt_cache.ResultCache()
+            results_cache.ingest_batch_output(fields["output_path"], row["cache_source"])
+            results_cache.close()
+        if self.on_downloaded:
+            try:
+                fields.update(self.on_downloaded({**row, **fields}) or {})
+            except Exception as e:
+                fields["error"] = f"Post-download step failed: {e}"
+        self.registry.update(row["batch_id"], **fields)
+
+    def start(self, interval=5):
+        """Poll in a daemon thread every ``interval`` seconds until :meth:`stop`."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.poll_once()
+                except Exception:
+                    pass  # keep polling; per-batch errors are already recorded
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="batch-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,136 @@
+"""Batch result files on disk: streamed downloads and a custom_id index.
+
+Output files can run to hundreds of MB, so they are never held in memory.
+:func:`download_file` streams a file from the Azure files API straight to
+disk. :class:`ResultIndex` records the byte offset of every line in a
+SQLite sidecar (``<file>.idx.sqlite``), so a single record can be read by
+``custom_id`` with one seek.
+"""
+import json
+import os
+import re
+import sqlite3
+
+from quotetool import metrics
+
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+# Azure output lines start {"id": ..., "custom_id": ...}; string values escape
+# their quotes, so the first match is the top-level key.
+_CUSTOM_ID_RE = re.compile(rb'"custom_id"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_INSERT_BATCH = 10_000
+
+
+def download_file(client, file_id, path, chunk_size=DOWNLOAD_CHUNK_BYTES):
+    """Stream ``file_id`` to ``path`` in chunks; return the number of bytes written.
+
+    The data goes to ``<path>.part`` first and replaces ``path`` only once
+    complete, so an interrupted download never looks finished.
+    """
+    partial = path + ".part"
+    written = 0
+    with metrics.timer("azure.download"):
+        with client.files.with_streaming_response.content(file_id) as response, open(partial, "wb") as f:
+            for chunk in response.iter_bytes(chunk_size):
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(partial, path)
+    metrics.count("azure.download_bytes", written)
+    return written
+
+
+def line_custom_id(line):
+    match = _CUSTOM_ID_RE.search(line)
+    if match:
+        return json.loads(b'"' + match.group(1) + b'"')
+    try:
+        return json.loads(line).get("custom_id")
+    except (ValueError, AttributeError):
+        return None
+
+
+def count_lines(path):
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+class ResultIndex:
+    """Random access to a JSONL results file by ``custom_id``.
+
+    The index is built on first use and rebuilt whenever the file's size or
+    mtime changes. Lines that do not parse are kept under their line number
+    (see :meth:`unparsed`).
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or path + ".idx.sqlite"
+        self.conn = sqlite3.connect(self.index_path)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);"
+            "CREATE TABLE IF NOT EXISTS lines (custom_id TEXT, line_no INTEGER PRIMARY KEY, "
+            "offset INTEGER NOT NULL, length INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS lines_custom_id ON lines (custom_id);"
+        )
+        if self._stamp() != dict(self.conn.execute("SELECT name, value FROM meta")).get("stamp"):
+            self.build()
+
+    def _stamp(self):
+        stat = os.stat(self.path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def build(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM lines")
+            rows, offset = [], 0
+            with open(self.path, "rb") as f:
+                for line_no, line in enumerate(f, 1):
+                    if line.strip():
+                        rows.append((line_custom_id(line), line_no, offset, len(line)))
+                    offset += len(line)
+                    if len(rows) >= _INSERT_BATCH:
+                        self.conn.executemany("INSERT INTO lines VALUES (?, ?, ?, ?)", rows)
+                        rows = []
+            self.conn.executemany("INSERT INTO lines VALUES (?, ?, ?, ?)", rows)
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('stamp', ?)", (self._stamp(),))
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM lines").fetchone()[0]
+
+    def __contains__(self, custom_id):
+        return self.conn.execute("SELECT 1 FROM lines WHERE custom_id = ?", (custom_id,)).fetchone() is not None
+
+    def _read(self, offset, length):
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def get(self, custom_id, default=None):
+        """The parsed record for ``custom_id`` (the last one if it repeats)."""
+        row = self.conn.execute(
+            "SELECT offset, length FROM lines WHERE custom_id = ? ORDER BY line_no DESC LIMIT 1", (custom_id,)
+        ).fetchone()
+        return self._read(*row) if row else default
+
+    def __getitem__(self, custom_id):
+        record = self.get(custom_id)
+        if record is None:
+            raise KeyError(custom_id)
+        return record
+
+    def custom_ids(self):
+        return [custom_id for (custom_id,) in self.conn.execute(
+            "SELECT custom_id FROM lines WHERE custom_id IS NOT NULL ORDER BY line_no"
+        )]
+
+    def unparsed(self):
+        """Line numbers whose ``custom_id`` could not be read."""
+        return [line_no for (line_no,) in self.conn.execute("SELECT line_no FROM lines WHERE custom_id IS NULL")]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
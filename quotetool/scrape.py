@@ -0,0 +1,276 @@
+"""Concurrent QuoteFancy scraping engine used by Tab 1.
+
+``requests`` is imported when a crawl starts, so the app and the CLI can
+read this module's defaults without loading it.
+"""
+import csv
+import io
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from quotetool import metrics
+from quotetool.parse import DEFAULT_PARSER, parse_quotes_page
+
+BASE_URL = "https://quotefancy.com"
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/90.0.4430.93 Safari/537.36"
+)
+REQUEST_TIMEOUT = 10
+MAX_PAGES = 10
+MAX_WORKERS = 8
+RATE_LIMIT_PER_HOST = 4.0  # requests per second, shared by all workers
+RATE_LIMIT_BURST = 4
+CSV_HEADER = ["Serial No", "Quote", "Link", "Author"]
+
+
+def create_session_with_retries(pool_maxsize=MAX_WORKERS):
+    import requests
+    from requests.adapters import HTTPAdapter, Retry
+
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        'Accept-Language': 'en-US,en;q=0.9'
+    })
+    retries = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=["HEAD", "GET", "OPTIONS"]
+    )
+    # Size the pool for the worker count so threads never wait on (or
+    # discard) connections to the same host.
+    adapter = HTTPAdapter(max_retries=retries, pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``acquire`` blocks until a token is available.
+
+    A non-positive ``rate`` disables limiting.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """One :class:`TokenBucket` per host, created on first use."""
+
+    def __init__(self, rate=RATE_LIMIT_PER_HOST, burst=RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
+
+def extract_slug_from_url(url):
+    parsed = urlparse(url)
+    path = parsed.path.strip("/")
+    return path.split("/")[0] if path else ""
+
+
+def page_url(slug, page_number, base_url=BASE_URL):
+    return f"{base_url}/{slug}/page/{page_number}"
+
+
+def fetch_page(session, url, limiter=None, cache=None):
+    """Return the page body, ``b""`` for a 404, or ``None`` once retries are exhausted.
+
+    With a :class:`~quotetool.cache.PageCache`, fresh pages come from disk,
+    stale ones are revalidated with a conditional GET, and nothing touches
+    the network while the cache is offline. A 404 is cached as an empty
+    body, so an offline re-run still finds the end of an author's pages.
+    """
+    import requests
+
+    entry = cache.lookup(url) if cache is not None else None
+    if entry is not None and (entry.fresh or cache.offline):
+        cache.record("hit")
+        return entry.body
+    if cache is not None and cache.offline:
+        cache.record("offline_miss")
+        return None
+
+    if limiter is not None:
+        with metrics.timer("scrape.rate_limit_wait"):
+            limiter.acquire(url)
+    try:
+        with metrics.timer("scrape.fetch"):
+            response = session.get(url, headers=entry.validators() if entry else None, timeout=REQUEST_TIMEOUT)
+        if entry is not None and response.status_code == 304:
+            cache.refresh(url)
+            cache.record("revalidated")
+            return entry.body
+        if response.status_code != 404:
+            response.raise_for_status()
+    except requests.RequestException:
+        metrics.count("scrape.fetch_failures")
+        return None
+    # A 404 is past the author's last page: an empty body, cached like any page.
+    body = b"" if response.status_code == 404 else response.content
+    metrics.count("scrape.bytes_fetched", len(body))
+    if cache is not None:
+        cache.record("miss")
+        cache.store(url, body, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return body
+
+
+Page = namedtuple("Page", "slug number quotes status")
+Page.__doc__ = """One crawled page, or the end marker of a slug.
+
+``status`` is ``"ok"`` for a page with quotes. The last record of every slug
+has no quotes and tells why paging stopped: ``"end"`` (empty page or 404),
+``"failed"`` (request error), ``"known"`` (``stop_on`` matched) or ``"cap"``
+(``max_pages`` reached).
+"""
+
+
+def iter_pages(slugs, max_pages=MAX_PAGES, max_workers=MAX_WORKERS,
+               rate_limit=RATE_LIMIT_PER_HOST, burst=RATE_LIMIT_BURST,
+               session=None, base_url=BASE_URL, parser=DEFAULT_PARSER, cache=None,
+               start_pages=None, stop_on=None, progress=None):
+    """Crawl several slugs concurrently, yielding :class:`Page` records.
+
+    Every page of every slug is a task on one bounded thread pool sharing a
+    single pooled session and a per-host token bucket. A slug ends at its
+    first failed or empty page, exactly like a sequential crawl: later pages
+    are skipped once the end is known and discarded if they were already in
+    flight. Pages of a slug are yielded strictly in page order, as soon as
+    all earlier pages are in, followed by one end marker.
+
+    ``start_pages`` maps slugs to the first page to fetch (default 1) and
+    ``max_pages`` is the last page number. ``stop_on(slug, quotes)`` is called
+    from the workers; returning true keeps that page but fetches no later
+    ones. ``parser`` names a backend from :mod:`quotetool.parse` and
+    ``cache`` is an optional :class:`~quotetool.cache.PageCache`.
+
+    The generator and ``progress(done, total)`` run in the calling thread,
+    which makes it safe to drive Streamlit widgets from them.
+    """
+    slugs = list(dict.fromkeys(slugs))
+    start_pages = start_pages or {}
+    session = session or create_session_with_retries(max_workers)
+    limiter = HostRateLimiter(rate_limit, burst)
+    stop_at = {slug: max_pages + 1 for slug in slugs}
+    status = {slug: "cap" for slug in slugs}
+    next_page = {slug: min(start_pages.get(slug, 1), max_pages + 1) for slug in slugs}
+    lock = threading.Lock()
+    pages = {}
+
+    def stop(slug, page_number, reason):
+        with lock:
+            if page_number < stop_at[slug]:
+                stop_at[slug], status[slug] = page_number, reason
+
+    def work(slug, page_number):
+        with lock:
+            if page_number >= stop_at[slug]:
+                return None
+        content = fetch_page(session, page_url(slug, page_number, base_url), limiter, cache)
+        if content is None:
+            stop(slug, page_number, "failed")
+            return None
+        with metrics.timer("scrape.parse"):
+            quotes = parse_quotes_page(content, parser)
+        metrics.count("scrape.quotes", len(quotes))
+        if not quotes:
+            stop(slug, page_number, "end")
+        elif stop_on is not None and stop_on(slug, quotes):
+            stop(slug, page_number + 1, "known")
+        return quotes
+
+    def ready(slug):
+        # Yield the contiguous run of finished pages, then the end marker
+        # once every page before the stopping point is in.
+        while True:
+            with lock:
+                limit, reason = stop_at[slug], status[slug]
+            number = next_page[slug]
+            if number < limit and (slug, number) in pages:
+                next_page[slug] += 1
+                yield Page(slug, number, pages.pop((slug, number)), "ok")
+            elif number == limit:
+                next_page[slug] += 1
+                yield Page(slug, number, [], reason)
+                return
+            else:
+                return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Page-major submission: the first page of every slug goes first, so
+        # a slug's end is usually discovered before its trailing pages are
+        # dequeued.
+        futures = {
+            pool.submit(work, slug, page_number): (slug, page_number)
+            for page_number in range(1, max_pages + 1)
+            for slug in slugs
+            if page_number >= next_page[slug]
+        }
+        for slug in slugs:
+            yield from ready(slug)  # slugs resumed past max_pages
+        for done, future in enumerate(as_completed(futures), 1):
+            slug, page_number = futures[future]
+            pages[(slug, page_number)] = future.result()
+            if progress:
+                progress(done, len(futures))
+            yield from ready(slug)
+
+
+def scrape_quotes_for_slugs(slugs, **kwargs):
+    """Scrape several slugs concurrently and return ``{slug: rows}``.
+
+    Takes the same options as :func:`iter_pages`. Rows are numbered per slug
+    in page order, so ``Serial No`` does not depend on completion order.
+    """
+    results = {slug: [] for slug in slugs}
+    for page in iter_pages(slugs, **kwargs):
+        rows = results[page.slug]
+        for quote_text, quote_link, author_text in page.quotes:
+            rows.append([len(rows) + 1, quote_text, quote_link, author_text])
+    return results
+
+
+def scrape_quotes_for_slug(slug, max_pages=MAX_PAGES, **kwargs):
+    return scrape_quotes_for_slugs([slug], max_pages=max_pages, **kwargs)[slug]
+
+
+def convert_to_csv_buffer(rows):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+    writer.writerows(rows)
+    return output.getvalue()
@@ -0,0 +1,61 @@
+"""Tab 2: lay quotes out as one row of up to eight quotes per author."""
+import pandas as pd
+
+from quotetool import metrics
+
+MAX_QUOTE_LENGTH = 180
+QUOTES_PER_AUTHOR = 8
+PARAGRAPH_COLUMNS = [f"s{i}paragraph1" for i in range(2, 2 + QUOTES_PER_AUTHOR)]
+STRUCTURED_COLUMNS = PARAGRAPH_COLUMNS + ["Author"]
+
+
+def short_quote_mask(quotes):
+    """True for string quotes that are at most 180 characters once stripped."""
+    if not (pd.api.types.is_object_dtype(quotes) or pd.api.types.is_string_dtype(quotes)):
+        return pd.Series(False, index=quotes.index)
+    # Non-strings come out of ``.str`` as NaN and compare False.
+    return (quotes.str.strip().str.len() <= MAX_QUOTE_LENGTH).fillna(False).astype(bool)
+
+
+def structure_by_author(df):
+    """Return the ``s2paragraph1..s9paragraph1, Author`` table.
+
+    Keeps the first eight short quotes of each author in file order, pads
+    missing slots with ``'NA'`` and sorts authors like ``groupby`` does,
+    without a Python loop over groups.
+    """
+    return structure_by_author_chunks([df])
+
+
+def structure_by_author_chunks(chunks):
+    """:func:`structure_by_author` over an iterable of DataFrame chunks.
+
+    Only the first eight quotes of each author are kept between chunks, so
+    memory follows the number of authors, not the size of the file.
+    """
+    kept_parts = []
+    taken = pd.Series(dtype="int64")
+    for chunk in chunks:
+        with metrics.timer("structure.groupby"):
+            kept = chunk.loc[short_quote_mask(chunk["Quote"]), ["Author", "Quote"]]
+            kept = kept[kept["Author"].notna()]
+            offset = kept["Author"].map(taken).fillna(0).astype("int64")
+            slot = kept.groupby("Author", sort=False).cumcount() + offset
+            kept = kept.assign(slot=slot)[slot < QUOTES_PER_AUTHOR]
+            taken = taken.add(kept["Author"].value_counts(), fill_value=0).astype("int64")
+            kept_parts.append(kept)
+        metrics.count("structure.rows", len(chunk))
+
+    with metrics.timer("structure.pivot"):
+        kept = pd.concat(kept_parts) if kept_parts else pd.DataFrame(columns=["Author", "Quote", "slot"])
+        if kept.empty:
+            return pd.DataFrame(columns=STRUCTURED_COLUMNS)
+
+        wide = (
+            kept.pivot(index="Author", columns="slot", values="Quote")
+            .reindex(columns=range(QUOTES_PER_AUTHOR))
+            .astype(object)
+            .fillna("NA")
+        )
+        wide.columns = PARAGRAPH_COLUMNS
+        return wide.reset_index()[STRUCTURED_COLUMNS]
@@ -0,0 +1,18 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from quotetool import media
+
+BUCKET = "test-bucket"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """A moto S3 client from :func:`~quotetool.media.create_s3_client` with ``BUCKET`` created."""
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"):
+        monkeypatch.setenv(name, "testing")
+    with mock_aws():
+        boto3.client("s3", region_name=media.REGION_NAME).create_bucket(
+            Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": media.REGION_NAME})
+        yield media.create_s3_client(region_name=media.REGION_NAME)
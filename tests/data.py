@@ -0,0 +1,106 @@
+"""Inputs shared by the tests and the benchmarks; changing one changes both."""
+import io
+import json
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.stub_server import render_page
+from quotetool import batch, cdn
+from quotetool.structure import PARAGRAPH_COLUMNS
+
+FIXTURES = pathlib.Path(__file__).parents[1] / "benchmarks" / "fixtures"
+
+
+def parser_pages():
+    """The saved QuoteFancy pages plus one synthetic stub page, by name."""
+    pages = {path.name: path.read_bytes() for path in sorted(FIXTURES.glob("*.html"))}
+    pages["stub-page-1"] = render_page("a-j-cronin-quotes", 1, quotes_per_page=25)
+    return pages
+
+
+def synthetic_quotes(rows, quotes_per_author=12, seed=0):
+    """Random quotes with long, blank and missing values mixed in."""
+    rng = np.random.default_rng(seed)
+    authors = rng.integers(0, max(1, rows // quotes_per_author), rows)
+    lengths = rng.integers(20, 240, rows)
+    quotes = pd.Series([f"Quote {i} " + "x" * n for i, n in enumerate(lengths)], dtype=object)
+    quotes[rng.random(rows) < 0.02] = np.nan
+    quotes[rng.random(rows) < 0.01] = "   "
+    return pd.DataFrame({
+        "Serial No": np.arange(1, rows + 1),
+        "Quote": quotes,
+        "Link": "",
+        "Author": pd.Series([f"Author {a:07d}" for a in authors], dtype=object),
+    })
+
+
+def synthetic_structured_csv(rows, seed=0):
+    """A Tab 3 upload: eight quotes and an author per row, about 5% with an ``NA`` quote."""
+    rng = np.random.default_rng(seed)
+    data = {column: [f"Quote {i} for {column} " + "x" * 80 for i in range(rows)] for column in PARAGRAPH_COLUMNS}
+    df = pd.DataFrame(data)
+    df.loc[rng.random(rows) < 0.05, "s9paragraph1"] = "NA"
+    df["Author"] = [f"Author {i // 8}" for i in range(rows)]
+    return df.to_csv(index=False).encode()
+
+
+def synthetic_structured(rows):
+    """Cleaned Tab 3 rows; authors recur across chunk boundaries and carry stray whitespace."""
+    data = {column: [f"Quote {i} in {column}" for i in range(rows)] for column in PARAGRAPH_COLUMNS}
+    data["Author"] = [f" Author {i % (rows // 3 + 1)} Name " if i % 7 == 0 else f"Author {i % (rows // 3 + 1)} Name" for i in range(rows)]
+    return pd.DataFrame(data)
+
+
+def synthetic_urls(rows, distinct=0.2, seed=0):
+    """Image URLs on the CDN and media hosts, with stray spaces and a few foreign hosts."""
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, max(1, int(rows * distinct)), rows)
+    hosts = np.array([cdn.CDN_PREFIX, cdn.MEDIA_PREFIX, " " + cdn.CDN_PREFIX, "https://example.com/"])
+    host = hosts[rng.choice(4, rows, p=[0.6, 0.3, 0.09, 0.01])]
+    return pd.DataFrame({"CDN_URL": [f"{h}media/kéyword-{i % 97}/image_{i}.jpg" for h, i in zip(host, ids)]})
+
+
+def synthetic_batch_output(lines, seed=0):
+    """Batch output lines, with the CSV they answer and each line's kind.
+
+    Kinds: 0 fenced answer, 1 bare answer, 2 failed request, 3 broken line,
+    4 prose. Every tenth CSV id is zero-padded and upper-cased, and a few
+    rows have no result.
+    """
+    rng = np.random.default_rng(seed)
+    kinds = rng.choice(5, lines, p=[0.6, 0.3, 0.04, 0.03, 0.03])
+    out = []
+    for i, kind in enumerate(kinds):
+        cid = f"{i // 8 + 1}-Author_{i // 8}-{i % 8 + 1}"
+        meta = {"storytitle": f"Title {i}", "metadescription": f"Description {i}", "metakeywords": f"kw{i}, quotes"}
+        if kind == 0:
+            content = "```json\n" + json.dumps(meta, indent=2) + "\n```"
+        elif kind == 1:
+            content = json.dumps(meta)
+        elif kind == 4:
+            content = "Sorry, I can't help with that."
+        if kind == 2:
+            record = {"custom_id": cid, "response": {"status_code": 429, "body": {"error": {"message": "rate limited"}}}}
+        elif kind == 3:
+            out.append('{"custom_id": "' + cid + '", "response": {')
+            continue
+        else:
+            record = {"custom_id": cid, "response": {"status_code": 200, "body": {"choices": [{"message": {"content": content}}]}}}
+        out.append(json.dumps(record))
+    ids = [f"{i // 8 + 1}-Author_{i // 8}-{i % 8 + 1}" for i in range(lines + lines // 100)]
+    ids = [f"00{cid.upper()} " if i % 10 == 0 else cid for i, cid in enumerate(ids)]
+    csv = pd.DataFrame({"custom_id": ids, "Author": "A"}).to_csv(index=False).encode()
+    return ("\n".join(out) + "\n").encode(), csv, kinds
+
+
+def completed_output(client, requests):
+    """Run ``requests`` Tab 3 requests through the fake client; return the output file id."""
+    lines = [
+        batch.dumps(batch.build_request(f"{i + 1}-Author_{i}-1", batch.build_prompt(f"Author {i}", ["A quote."] * 8)))
+        for i in range(requests)
+    ]
+    batch_file = client.files.create(file=io.BytesIO(b"\n".join(lines) + b"\n"), purpose="batch")
+    job = client.batches.create(input_file_id=batch_file.id, endpoint="/chat/completions", completion_window="24h")
+    return client.batches.retrieve(job.id).output_file_id
@@ -0,0 +1,79 @@
+import io
+import json
+import os
+
+import pytest
+
+from quotetool import batch, pipeline
+from tests.data import synthetic_structured
+from tests.legacy import legacy_jsonl
+
+
+def build_jsonl(clean, path, chunksize, **limits):
+    generator = batch.CustomIdGenerator()
+    with batch.JsonlShardWriter(str(path), **limits) as writer:
+        for start in range(0, len(clean), chunksize):
+            chunk = clean.iloc[start:start + chunksize]
+            chunk = chunk.assign(custom_id=generator.assign(chunk["Author"]))
+            for request in batch.iter_requests(chunk):
+                writer.write(request)
+    return writer.paths
+
+
+def read_records(paths):
+    records = []
+    for path in paths:
+        with open(path, "rb") as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+def expected_records(clean):
+    return [json.loads(line) for line in legacy_jsonl(clean.copy()).split("\n")]
+
+
+@pytest.mark.parametrize("chunksize", [7, 50, 1_000])
+def test_custom_ids_match_the_original_across_chunks(chunksize):
+    clean = synthetic_structured(300)  # 101 authors, each recurring every 101 rows
+    generator = batch.CustomIdGenerator()
+    ids = []
+    for start in range(0, len(clean), chunksize):
+        ids += generator.assign(clean["Author"].iloc[start:start + chunksize]).tolist()
+    assert ids == [record["custom_id"] for record in expected_records(clean)]
+
+
+@pytest.mark.parametrize("chunksize", [7, 1_000])
+def test_jsonl_matches_the_original(tmp_path, chunksize):
+    clean = synthetic_structured(300)
+    paths = build_jsonl(clean, tmp_path / "batch.jsonl", chunksize)
+    assert paths == [str(tmp_path / "batch.jsonl")]
+    assert read_records(paths) == expected_records(clean)
+
+
+def test_shards_concatenate_to_the_original(tmp_path):
+    clean = synthetic_structured(300)
+    paths = build_jsonl(clean, tmp_path / "batch.jsonl", 64, max_requests=101, max_bytes=2**40)
+    assert paths == [str(tmp_path / f"batch_part{n}.jsonl") for n in (1, 2, 3)]
+    assert read_records(paths) == expected_records(clean)
+
+
+def test_shards_stay_under_the_byte_limit(tmp_path):
+    clean = synthetic_structured(60)
+    paths = build_jsonl(clean, tmp_path / "batch.jsonl", 64, max_bytes=20_000)
+    assert len(paths) > 1
+    assert all((tmp_path / path).stat().st_size <= 20_000 for path in paths)
+    assert read_records(paths) == expected_records(clean)
+
+
+def test_an_unused_writer_creates_no_file(tmp_path):
+    with batch.JsonlShardWriter(str(tmp_path / "batch.jsonl")) as writer:
+        pass
+    assert writer.paths == [] and list(tmp_path.iterdir()) == []
+
+
+def test_prepare_batch_leaves_no_empty_jsonl(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the prompt cache lives under .cache/
+    upload = io.BytesIO(synthetic_structured(20).to_csv(index=False).encode())
+    prep = pipeline.prepare_batch(upload, ts="test")
+    assert prep.jsonl_paths == ["quotefancy_azure_batch_test.jsonl"]
+    assert prep.cached_paths == [] and not os.path.exists("cached_results_test.jsonl")
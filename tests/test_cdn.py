@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from quotetool import cdn
+from tests.data import synthetic_urls
+from tests.legacy import legacy_transform
+
+
+@pytest.mark.parametrize("distinct", [0.01, 0.5, 1.0])
+def test_transformer_matches_the_original(distinct):
+    df = synthetic_urls(2_000, distinct)
+    transformer = cdn.CdnTransformer()
+    expected = legacy_transform(df)
+    assert transformer.apply(df)["standardurl"].tolist() == expected
+    assert transformer.errors == expected.count(cdn.ERROR) > 0
+
+
+def test_a_small_memo_gives_the_same_urls():
+    df = synthetic_urls(1_000, 0.5)
+    assert cdn.CdnTransformer(memo_max_keys=8).apply(df)["standardurl"].tolist() == legacy_transform(df)
+
+
+def test_extra_presets_leave_the_standard_url_alone():
+    df = synthetic_urls(500)
+    presets = [cdn.STANDARD, cdn.parse_preset("thumbnailurl=300x300:cover")]
+    both = cdn.CdnTransformer(presets).apply(df)
+    assert both["standardurl"].tolist() == legacy_transform(df)
+    assert both["thumbnailurl"].ne(both["standardurl"]).sum() == both["standardurl"].ne(cdn.ERROR).sum()
+
+
+def test_csv_transform_in_chunks_matches_the_original(tmp_path):
+    df = synthetic_urls(700)
+    df.to_csv(tmp_path / "links.csv", index=False)
+    transformer = cdn.transform_csv(str(tmp_path / "links.csv"), str(tmp_path / "out.csv"), chunksize=64)
+    out = pd.read_csv(tmp_path / "out.csv", dtype=str, keep_default_na=False)
+    assert out["standardurl"].tolist() == legacy_transform(df)
+    assert transformer.rows == 700
@@ -0,0 +1,69 @@
+import hashlib
+
+import pytest
+
+from quotetool import dedup, media
+from tests.conftest import BUCKET
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = dedup.ImageIndex(str(tmp_path / "index.sqlite"))
+    yield index
+    index.close()
+
+
+def job(tmp_path, name, data, keyword="cat"):
+    path = tmp_path / "run" / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(data)
+    return media.upload_job(str(path), keyword)
+
+
+def keys(s3):
+    return sorted(obj["Key"] for obj in s3.list_objects_v2(Bucket=BUCKET).get("Contents", []))
+
+
+def stored(s3, key):
+    return s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+
+def test_same_bytes_are_uploaded_once(s3, index, tmp_path):
+    first = media.upload_one(s3, BUCKET, job(tmp_path, "cat_1.jpg", b"same"), index=index)
+    second = media.upload_one(s3, BUCKET, job(tmp_path, "cat_2.jpg", b"same"), index=index, delete_after=True)
+    assert second.duplicate_of == first.job.key
+    assert second.cdn_url == first.cdn_url
+    assert keys(s3) == [first.job.key]
+
+
+def test_new_bytes_never_overwrite_an_indexed_key(s3, index, tmp_path):
+    original = media.upload_one(s3, BUCKET, job(tmp_path, "cat_1.jpg", b"first run"), index=index)
+    rerun = media.upload_one(s3, BUCKET, job(tmp_path, "cat_1.jpg", b"second run"), index=index)
+    sha256 = dedup.file_sha256(rerun.job.path)
+    assert rerun.error is None and rerun.duplicate_of is None
+    assert rerun.job.key == original.job.key.replace(".jpg", f"-{sha256[:12]}.jpg")
+    assert rerun.job.filename == rerun.job.key.rsplit("/", 1)[-1]
+    assert stored(s3, original.job.key) == b"first run"
+    assert stored(s3, rerun.job.key) == b"second run"
+    assert index.lookup(hashlib.sha256(b"first run").hexdigest()) == original.job.key
+
+
+def test_available_key_keeps_a_key_for_its_own_bytes(index):
+    index.add("a" * 64, "media/cat_1.jpg")
+    assert index.available_key("media/cat_1.jpg", "a" * 64) == "media/cat_1.jpg"
+    assert index.available_key("media/cat_2.jpg", "b" * 64) == "media/cat_2.jpg"
+    assert index.available_key("media/cat_1.jpg", "b" * 64) == "media/cat_1-bbbbbbbbbbbb.jpg"
+
+
+def test_rebuild_restores_the_index_from_the_bucket(s3, index, tmp_path):
+    uploads = [media.upload_one(s3, BUCKET, job(tmp_path, f"cat_{n}.jpg", b"cat %d" % n), index=index)
+               for n in range(3)]
+    s3.put_object(Bucket=BUCKET, Key=f"{media.S3_PREFIX}legacy.jpg", Body=b"no metadata")
+    rebuilt = dedup.ImageIndex(str(tmp_path / "rebuilt.sqlite"))
+    try:
+        assert rebuilt.rebuild(s3, BUCKET, media.S3_PREFIX) == 4
+        for upload in uploads:
+            assert rebuilt.lookup(dedup.file_sha256(upload.job.path)) == upload.job.key
+        assert rebuilt.lookup(hashlib.sha256(b"no metadata").hexdigest()) == f"{media.S3_PREFIX}legacy.jpg"
+    finally:
+        rebuilt.close()
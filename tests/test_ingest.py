@@ -0,0 +1,69 @@
+import io
+import tracemalloc
+
+import pandas as pd
+
+from quotetool import ingest, pipeline
+from tests.data import synthetic_structured_csv
+from tests.legacy import legacy_clean
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        return func(*args), tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def chunked_clean(raw, chunksize):
+    # Tab 3's split of clean and removed rows, as prepare_batch does it.
+    with ingest.CsvOutput() as clean_out, ingest.CsvOutput() as removed_out:
+        for df in ingest.read_csv_chunks(io.BytesIO(raw), chunksize=chunksize):
+            df = df.replace(r'^\s*$', pd.NA, regex=True).replace("NA", pd.NA)
+            clean_out.write(df.dropna())
+            removed_out.write(df[df.isna().any(axis=1)])
+        return clean_out.getvalue(), removed_out.getvalue()
+
+
+def test_chunks_keep_values_as_strings():
+    raw = b"Author,Code\nA,007\nB,\nC,42\n"
+    chunks = list(ingest.read_csv_chunks(io.BytesIO(raw), chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert chunks[0]["Code"].tolist()[0] == "007"
+
+
+def test_header_only_file_keeps_its_columns():
+    chunks = list(ingest.read_csv_chunks(io.BytesIO(b"Author,Quote\n"), usecols=["Author"]))
+    assert len(chunks) == 1
+    assert list(chunks[0].columns) == ["Author"] and chunks[0].empty
+
+
+def test_output_writes_the_header_once():
+    raw = b"Author,Quote\nA,one\nB,two\nC,three\n"
+    with ingest.CsvOutput() as output:
+        for chunk in ingest.read_csv_chunks(io.BytesIO(raw), chunksize=2):
+            output.write(chunk)
+        assert output.getvalue() == raw
+        assert output.rows == 3
+
+
+def test_chunked_cleaning_lowers_peak_memory():
+    raw = synthetic_structured_csv(10_000)
+    expected, whole_peak = peak_memory(legacy_clean, raw)
+    got, chunk_peak = peak_memory(chunked_clean, raw, 1_000)
+    assert got == expected
+    # Both variants end up holding the download bytes; compare what they need on top.
+    output = sum(map(len, expected))
+    assert chunk_peak - output < (whole_peak - output) * 0.75
+
+
+def test_prepare_batch_splits_rows_like_the_original(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the prompt cache lives under .cache/
+    raw = synthetic_structured_csv(300)
+    prep = pipeline.prepare_batch(io.BytesIO(raw), ts="test", reuse_results=False)
+    clean, removed = legacy_clean(raw)
+    with open(prep.cleaned_csv, "rb") as f:
+        assert f.read() == clean
+    with open(prep.removed_csv, "rb") as f:
+        assert f.read() == removed
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from quotetool import dedup, media
+from tests.conftest import BUCKET
+
+
+class FlakyS3:
+    """Wraps an S3 client; the first ``failures`` uploads raise before reaching it."""
+
+    def __init__(self, s3, failures):
+        self.s3 = s3
+        self.failures = failures
+        self.uploads = 0
+
+    def upload_file(self, *args, **kwargs):
+        self.uploads += 1
+        if self.uploads <= self.failures:
+            raise ConnectionError("connection reset")
+        return self.s3.upload_file(*args, **kwargs)
+
+
+class BrokenIndex(dedup.ImageIndex):
+    def add(self, *args, **kwargs):
+        raise OSError("disk full")
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "cat" / "cat_1.jpg"
+    path.parent.mkdir()
+    path.write_bytes(b"\xff\xd8 cat picture")
+    return media.upload_job(str(path), "cat")
+
+
+def stored(s3, key):
+    return s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+
+def test_failed_upload_is_retried(s3, image):
+    flaky = FlakyS3(s3, failures=2)
+    result = media.upload_one(flaky, BUCKET, image, backoff=0)
+    assert (result.error, result.attempts, flaky.uploads) == (None, 3, 3)
+    assert result.cdn_url == media.cdn_url_for(image.key)
+    assert stored(s3, image.key) == b"\xff\xd8 cat picture"
+
+
+def test_upload_gives_up_after_its_attempts(s3, image):
+    flaky = FlakyS3(s3, failures=media.UPLOAD_ATTEMPTS)
+    result = media.upload_one(flaky, BUCKET, image, backoff=0, delete_after=True)
+    assert result.cdn_url is None and "connection reset" in result.error
+    assert result.attempts == flaky.uploads == media.UPLOAD_ATTEMPTS
+    assert os.path.exists(image.path)  # kept for the next run
+
+
+def test_bookkeeping_after_the_upload_is_not_retried(s3, image, tmp_path):
+    flaky = FlakyS3(s3, failures=0)
+    index = BrokenIndex(str(tmp_path / "index.sqlite"))
+    sha256 = dedup.file_sha256(image.path)
+    result = media.upload_one(flaky, BUCKET, image, backoff=0, delete_after=True, index=index)
+    assert (result.error, result.attempts, flaky.uploads) == (None, 1, 1)
+    assert not os.path.exists(image.path)
+    # The failed add released the hash, so a later copy is not left waiting on it.
+    assert index.claim(sha256) is None
+    index.close()
+
+
+def test_uploader_shares_one_client(s3, tmp_path):
+    jobs = []
+    for n in range(5):
+        path = tmp_path / f"dog_{n}.jpg"
+        path.write_bytes(b"dog %d" % n)
+        jobs.append(media.upload_job(str(path), "dog"))
+    with media.S3Uploader(s3, bucket=BUCKET, max_workers=3) as uploader:
+        results = uploader.upload_all(jobs)
+    assert [r.error for r in results] == [None] * 5
+    assert [stored(s3, job.key) for job in jobs] == [b"dog %d" % n for n in range(5)]
+
+
+def test_downloader_exit_is_reported_and_its_files_uploaded(s3, tmp_path):
+    root = tmp_path / "images"
+    stale = root / "cat" / "cat_9.jpg"
+    stale.parent.mkdir(parents=True)
+    stale.write_bytes(b"left by an earlier run")
+
+    def download(keyword, count):
+        (root / keyword).mkdir(parents=True, exist_ok=True)
+        (root / keyword / f"{keyword}_1.jpg").write_bytes(keyword.encode())
+        if keyword == "cat":
+            exit(1)  # what simple_image_download does when a fetch fails
+
+    with media.S3Uploader(s3, bucket=BUCKET, delete_after=True) as uploader:
+        uploads, errors = media.download_and_upload(["cat", "dog"], 2, download, uploader, root=str(root))
+    assert errors == {"cat": "the downloader exited (status 1)"}
+    assert sorted(upload.job.filename for upload in uploads) == ["cat_1.jpg", "dog_1.jpg"]
+    assert [upload.error for upload in uploads] == [None, None]
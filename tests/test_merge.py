@@ -0,0 +1,102 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from quotetool import batch, ingest, merge, pipeline
+from tests.data import synthetic_batch_output
+from tests.legacy import legacy_merge
+
+
+def answer(custom_id, content, status=200):
+    return json.dumps({"custom_id": custom_id, "response": {
+        "status_code": status, "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}}})
+
+
+EINSTEIN = {"storytitle": "Einstein", "metadescription": "On curiosity", "metakeywords": "einstein, curiosity"}
+ANGELOU = {"storytitle": "Angelou", "metadescription": "On courage", "metakeywords": "angelou, courage"}
+LINES = [
+    answer("7-Albert_Einstein-1", "```json\n" + json.dumps(EINSTEIN) + "\n```"),
+    answer("2-Maya_Angelou-1", json.dumps(ANGELOU)),
+    json.dumps({"custom_id": "3-Rate_Limited-1",
+                "response": {"status_code": 429, "body": {"error": {"message": "Too many requests"}}}}),
+    '{"custom_id": "4-Broken',
+    answer("5-Chatty-1", "Sure! Here is the metadata you asked for."),
+]
+CSV = "custom_id,Author\n 007-ALBERT_EINSTEIN-1 ,Albert Einstein\n2-maya_angelou-1,Maya Angelou\n" \
+      "3-Rate_Limited-1,Rate Limited\n9-Nobody-1,Nobody\n"
+
+
+@pytest.mark.parametrize("content", [
+    '{"a": 1}', ' {"a": 1}\n', '```json\n{"a": 1}\n```', '```\n{"a": 1}\n```', '```json {"a": 1}```',
+])
+def test_parse_metadata_accepts_fenced_and_bare_answers(content):
+    assert batch.parse_metadata(content) == {"a": 1}
+
+
+def test_custom_ids_are_normalized_like_the_original():
+    ids = pd.Series([" 007-X-1 ", "0-Zero-1", "10-Ten-2", "A-B-1"])
+    assert merge.normalize_custom_ids(ids).tolist() == ["7-x-1", "0-zero-1", "10-ten-2", "a-b-1"]
+
+
+def test_merge_fills_columns_and_reports_what_did_not_match(tmp_path):
+    jsonl = tmp_path / "metadata.jsonl"
+    jsonl.write_text("\n".join(LINES) + "\n\n", encoding="utf-8")
+    with ingest.CsvOutput() as output:
+        run = pipeline.merge_metadata(io.BytesIO(CSV.encode()), [str(jsonl)], output, fill_cache=False)
+        merged = pd.read_csv(io.BytesIO(output.getvalue()), dtype=str, keep_default_na=False)
+
+    assert (run.metadata_lines, run.rows, run.unmatched) == (2, 4, 2)
+    assert merged["custom_id"].tolist() == [" 007-ALBERT_EINSTEIN-1 ", "2-maya_angelou-1", "3-Rate_Limited-1",
+                                            "9-Nobody-1"]
+    for field in merge.METADATA_FIELDS:
+        assert merged[field].tolist() == [EINSTEIN[field], ANGELOU[field], "", ""]
+    assert [tuple(row) for row in run.report.itertuples(index=False)] == [
+        (str(jsonl), 3, "3-Rate_Limited-1", "request failed (HTTP 429)"),
+        (str(jsonl), 4, "", "invalid JSON"),
+        (str(jsonl), 5, "5-Chatty-1", "answer is not the requested JSON object"),
+        ("csv", "", "3-Rate_Limited-1", "no metadata for this row"),
+        ("csv", "", "9-Nobody-1", "no metadata for this row"),
+    ]
+
+
+def test_later_lines_win(tmp_path):
+    jsonl = tmp_path / "metadata.jsonl"
+    jsonl.write_text("\n".join([answer("2-Maya_Angelou-1", json.dumps(EINSTEIN)),
+                                answer("02-MAYA_ANGELOU-1", json.dumps(ANGELOU))]), encoding="utf-8")
+    metadata, issues = merge.read_metadata([str(jsonl)])
+    assert issues == [] and len(metadata) == 1
+    assert metadata.loc["2-maya_angelou-1", "storytitle"] == "Angelou"
+
+
+def merge_files(tmp_path, jsonl_bytes, csv_bytes):
+    jsonl = tmp_path / "metadata.jsonl"
+    jsonl.write_bytes(jsonl_bytes)
+    with ingest.CsvOutput() as output:
+        run = pipeline.merge_metadata(io.BytesIO(csv_bytes), [str(jsonl)], output, fill_cache=False)
+        return run, pd.read_csv(io.BytesIO(output.getvalue()), dtype=str, keep_default_na=False)
+
+
+def test_merge_matches_the_original_on_the_rows_it_filled(tmp_path):
+    jsonl_bytes = ("\n".join(LINES) + "\n").encode()
+    _, merged = merge_files(tmp_path, jsonl_bytes, CSV.encode())
+    expected = legacy_merge(jsonl_bytes, pd.read_csv(io.BytesIO(CSV.encode()), dtype=str))
+    # The original drops the fenced Einstein answer and fills only Angelou.
+    assert expected["storytitle"].tolist() == ["", "Angelou", "", ""]
+    assert merged.loc[1, list(merge.METADATA_FIELDS)].tolist() == expected.loc[1, list(merge.METADATA_FIELDS)].tolist()
+
+
+@pytest.mark.parametrize("lines", [50, 3_000])
+def test_merge_matches_the_original_on_synthetic_output(tmp_path, lines):
+    jsonl_bytes, csv_bytes, kinds = synthetic_batch_output(lines)
+    run, merged = merge_files(tmp_path, jsonl_bytes, csv_bytes)
+    expected = legacy_merge(jsonl_bytes, pd.read_csv(io.BytesIO(csv_bytes), dtype=str))
+
+    filled_before = expected["storytitle"] != ""
+    assert filled_before.any()
+    for field in merge.METADATA_FIELDS:
+        assert merged[field][filled_before].tolist() == expected[field][filled_before].tolist()
+    good = int(((kinds == 0) | (kinds == 1)).sum())
+    assert (merged["storytitle"] != "").sum() == good
+    assert run.unmatched == len(merged) - good
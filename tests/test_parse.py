@@ -0,0 +1,29 @@
+import pytest
+
+from quotetool import parse
+from tests.data import parser_pages
+from tests.legacy import reference_parse
+
+PAGES = parser_pages()
+
+
+@pytest.mark.parametrize("parser", parse.available_parsers())
+@pytest.mark.parametrize("page", sorted(PAGES))
+def test_backend_matches_original_extraction(parser, page):
+    content = PAGES[page]
+    assert parse.parse_quotes_page(content, parser) == reference_parse(content)
+
+
+@pytest.mark.parametrize("parser", parse.available_parsers())
+def test_link_only_quote_and_missing_author(parser):
+    content = b"""<html><body>
+    <div class="q-wrapper"><a class="quote-a" href="/q/1">Only a link.</a></div>
+    <div class="q-wrapper"><p>No quote here.</p></div>
+    </body></html>"""
+    assert parse.parse_quotes_page(content, parser) == [["Only a link.", "/q/1", "Anonymous"]]
+    assert reference_parse(content) == [["Only a link.", "/q/1", "Anonymous"]]
+
+
+def test_default_parser_is_available():
+    assert parse.DEFAULT_PARSER in parse.available_parsers()
+    assert {"html.parser", "strainer"} <= set(parse.available_parsers())
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from benchmarks.fake_azure import FakeAzureOpenAI
+from quotetool import batch, ingest, pipeline, prompt_cache, registry
+from tests.data import synthetic_structured_csv
+
+TOKENS_PER_ANSWER = 210  # the usage FakeAzureOpenAI reports for every request
+
+
+@pytest.fixture
+def upload(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # prepare_batch and the caches write to the working directory
+    (tmp_path / "upload.csv").write_bytes(synthetic_structured_csv(40))
+    return "upload.csv"
+
+
+def run_batches(prep):
+    """Tab 3's submit and Tab 4's download against the fake client; return the output paths."""
+    client = FakeAzureOpenAI(validation_time=0, requests_per_second=1e9)
+    batch_registry = registry.BatchRegistry()
+    try:
+        batches = pipeline.submit_batches(client, prep, batch_registry)
+        poller = registry.BatchPoller(client, batch_registry, base_interval=0)
+        assert pipeline.fetch_results(poller, [entry["batch_id"] for entry in batches]) == []
+        return [batch_registry.get(entry["batch_id"])["output_path"] for entry in batches]
+    finally:
+        batch_registry.close()
+
+
+def records(paths):
+    out = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            for line in f:
+                custom_id, metadata, _ = batch.parse_output_record(json.loads(line))
+                out[custom_id] = metadata
+    return out
+
+
+def test_downloaded_results_answer_the_next_run(upload):
+    first = pipeline.prepare_batch(upload, ts="first")
+    assert first.submitted > 0 and (first.cached, first.tokens_saved, first.cached_paths) == (0, 0, [])
+    outputs = run_batches(first)
+
+    second = pipeline.prepare_batch(upload, ts="second")
+    assert (second.submitted, second.cached) == (0, first.submitted)
+    assert second.jsonl_paths == []
+    assert second.tokens_saved == first.submitted * TOKENS_PER_ANSWER
+    assert records(second.cached_paths) == records(outputs)
+
+    third = pipeline.prepare_batch(upload, ts="third", reuse_results=False)
+    assert (third.submitted, third.cached) == (first.submitted, 0)
+
+
+def test_merging_results_in_tab7_fills_the_cache(upload, tmp_path):
+    prep = pipeline.prepare_batch(upload, ts="first")
+    outputs = run_batches(prep)
+    # Start over with an empty cache, as if the results came from elsewhere.
+    (tmp_path / prompt_cache.RESULTS_PATH).unlink()
+
+    with ingest.CsvOutput() as output:
+        pipeline.merge_metadata(prep.structured_csv, outputs, output)
+    again = pipeline.prepare_batch(upload, ts="second")
+    assert (again.submitted, again.cached) == (0, prep.submitted)
+    assert records(again.cached_paths) == records(outputs)
+    # Tab 7 has no token usage, so the savings are estimates.
+    assert 0 < again.tokens_saved != prep.submitted * TOKENS_PER_ANSWER
+
+
+def test_tab7_keeps_results_already_cached(upload, tmp_path):
+    prep = pipeline.prepare_batch(upload, ts="first")
+    outputs = run_batches(prep)
+    with open(prep.jsonl_paths[0], "rb") as f:
+        request = json.loads(f.readline())
+    key = prompt_cache.prompt_key(request)
+    cache = prompt_cache.ResultCache()
+    try:
+        cached_before = cache.get_many([key])[key]
+        with ingest.CsvOutput() as output:
+            pipeline.merge_metadata(prep.structured_csv, outputs, output)
+        assert cache.get_many([key])[key] == cached_before
+    finally:
+        cache.close()
+
+
+def test_put_many_without_replace_keeps_existing_results(tmp_path):
+    cache = prompt_cache.ResultCache(str(tmp_path / "results.sqlite"))
+    try:
+        cache.put_many([("k", {"storytitle": "first"}, 210)])
+        cache.put_many([("k", {"storytitle": "second"}, 99), ("new", {"storytitle": "new"}, 5)], replace=False)
+        assert cache.get_many(["k", "new"]) == {"k": ({"storytitle": "first"}, 210),
+                                                "new": ({"storytitle": "new"}, 5)}
+        cache.put_many([("k", {"storytitle": "second"}, 99)])
+        assert cache.get_many(["k"]) == {"k": ({"storytitle": "second"}, 99)}
+    finally:
+        cache.close()
@@ -0,0 +1,87 @@
+import io
+
+import pytest
+
+from benchmarks.fake_azure import FakeAzureOpenAI
+from quotetool import batch, pipeline, registry
+from tests.data import synthetic_structured_csv
+
+
+@pytest.fixture
+def batch_registry(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # prepare_batch and the prompt cache write to the working directory
+    reg = registry.BatchRegistry(str(tmp_path / "registry.sqlite"))
+    yield reg
+    reg.close()
+
+
+def submit(client, reg, lines):
+    batch_file = client.files.create(file=io.BytesIO(b"".join(line + b"\n" for line in lines)), purpose="batch")
+    job = client.batches.create(input_file_id=batch_file.id, endpoint="/chat/completions", completion_window="24h")
+    reg.register(job.id, "1700000000", file_id=batch_file.id)
+    return job.id
+
+
+def request(custom_id):
+    return batch.dumps(batch.build_request(custom_id, batch.build_prompt("Author", ["A quote."])))
+
+
+def test_completed_batch_is_downloaded_once(batch_registry, tmp_path):
+    client = FakeAzureOpenAI(validation_time=0, requests_per_second=1e9, fail_every=3)
+    batch_id = submit(client, batch_registry, [request(f"1-Author_{i}-1") for i in range(6)])
+    downloaded = []
+    poller = registry.BatchPoller(client, batch_registry, base_interval=0, download_dir=str(tmp_path),
+                                  on_downloaded=lambda row: downloaded.append(row["batch_id"]))
+
+    assert pipeline.fetch_results(poller, [batch_id]) == []
+    row = batch_registry.get(batch_id)
+    assert (row["status"], row["completed"], row["failed"]) == ("completed", 4, 2)
+    assert sum(1 for _ in open(row["output_path"])) == 4
+    assert sum(1 for _ in open(row["error_path"])) == 2
+    assert downloaded == [batch_id]
+    assert batch_registry.due(batch_ids=[batch_id]) == []
+    assert pipeline.pending_batch_ids(batch_registry) == []
+
+
+def test_completed_batch_without_files_stops_polling(batch_registry, tmp_path):
+    client = FakeAzureOpenAI(validation_time=0)
+    batch_id = submit(client, batch_registry, [])
+    poller = registry.BatchPoller(client, batch_registry, base_interval=0, download_dir=str(tmp_path))
+
+    assert poller.poll_once() == 1
+    row = batch_registry.get(batch_id)
+    assert row["status"] == "completed" and row["error"]
+    assert not registry.awaiting_download(row)
+    assert batch_registry.due() == []
+    assert pipeline.pending_batch_ids(batch_registry) == []
+    calls = client.calls
+    assert poller.poll_once() == 0
+    assert client.calls == calls
+
+
+def test_failed_retrieve_backs_off(batch_registry, tmp_path):
+    client = FakeAzureOpenAI()
+    batch_registry.register("batch-missing", "1700000000")
+    poller = registry.BatchPoller(client, batch_registry, base_interval=60, download_dir=str(tmp_path))
+
+    poller.poll_once(batch_ids=["batch-missing"])
+    row = batch_registry.get("batch-missing")
+    assert row["attempts"] == 1 and row["error"]
+    assert batch_registry.due() == []  # not due again until the backoff expires
+
+
+def test_resubmitting_the_same_jsonl_reuses_the_batch(batch_registry, tmp_path):
+    (tmp_path / "structured.csv").write_bytes(synthetic_structured_csv(16))
+    client = FakeAzureOpenAI(validation_time=60)
+    prep = pipeline.prepare_batch("structured.csv", ts="1700000000")
+
+    first = pipeline.submit_batches(client, prep, batch_registry)
+    again = pipeline.submit_batches(client, prep, batch_registry)
+    assert [entry["reused"] for entry in first] == [False] * len(prep.jsonl_paths)
+    assert [entry["reused"] for entry in again] == [True] * len(prep.jsonl_paths)
+    assert [entry["batch_id"] for entry in again] == [entry["batch_id"] for entry in first]
+    assert len(client.stored_batches) == len(prep.jsonl_paths)
+
+    batch_registry.update(first[0]["batch_id"], status="failed")
+    retried = pipeline.submit_batches(client, prep, batch_registry)
+    assert not retried[0]["reused"] and retried[0]["batch_id"] != first[0]["batch_id"]
@@ -0,0 +1,44 @@
+import pytest
+
+from benchmarks.fake_azure import FakeAzureOpenAI
+from quotetool import results
+from tests.data import completed_output
+from tests.legacy import legacy_download
+
+
+@pytest.fixture
+def output_file():
+    client = FakeAzureOpenAI(validation_time=0, requests_per_second=1e9)
+    return client, completed_output(client, 300)
+
+
+@pytest.mark.parametrize("chunk_size", [64, 4096, results.DOWNLOAD_CHUNK_BYTES])
+def test_streamed_download_matches_the_original(output_file, tmp_path, chunk_size):
+    client, file_id = output_file
+    legacy_download(client, file_id, str(tmp_path / "legacy.jsonl"))
+    written = results.download_file(client, file_id, str(tmp_path / "streamed.jsonl"), chunk_size=chunk_size)
+    assert (tmp_path / "streamed.jsonl").read_bytes() == (tmp_path / "legacy.jsonl").read_bytes()
+    assert written == (tmp_path / "streamed.jsonl").stat().st_size
+    assert not (tmp_path / "streamed.jsonl.part").exists()
+
+
+def test_index_finds_every_record(output_file, tmp_path):
+    client, file_id = output_file
+    path = str(tmp_path / "results.jsonl")
+    results.download_file(client, file_id, path)
+    with results.ResultIndex(path) as index:
+        assert len(index) == 300 and index.unparsed() == []
+        assert index.custom_ids()[:2] == ["1-Author_0-1", "2-Author_1-1"]
+        assert index["300-Author_299-1"]["custom_id"] == "300-Author_299-1"
+        assert "0-Nobody-1" not in index and index.get("0-Nobody-1") is None
+
+
+def test_index_is_rebuilt_when_the_file_changes(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text('{"custom_id": "a", "n": 1}\n')
+    with results.ResultIndex(str(path)) as index:
+        assert index["a"]["n"] == 1
+    path.write_text('{"custom_id": "a", "n": 1}\n{"custom_id": "a", "n": 2}\nnot json\n\n')
+    with results.ResultIndex(str(path)) as index:
+        assert len(index) == 3 and index.unparsed() == [3]
+        assert index["a"]["n"] == 2  # the last line for an id wins
@@ -0,0 +1,85 @@
+import csv
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.stub_server import StubQuoteServer
+from quotetool import cache, pipeline
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # checkpoints, sinks and the page cache live under .cache/
+    with StubQuoteServer(pages=2, latency=0) as server:
+        yield server
+
+
+def scrape(server, slugs, **kwargs):
+    urls = [f"{server.base_url}/{slug}" for slug in slugs]
+    return pipeline.scrape_job(urls, "test", max_pages=4, rate_limit=0, base_url=server.base_url, **kwargs)
+
+
+def test_raising_the_page_cap_continues_a_capped_slug(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with StubQuoteServer(pages=5, latency=0) as server:
+        urls = [f"{server.base_url}/alpha-quotes"]
+        capped = pipeline.scrape_job(urls, "test", max_pages=2, rate_limit=0, base_url=server.base_url)
+        raised = pipeline.scrape_job(urls, "test", max_pages=5, rate_limit=0, base_url=server.base_url)
+        again = pipeline.scrape_job(urls, "test", max_pages=5, rate_limit=0, base_url=server.base_url)
+    assert capped.new_rows == {"alpha-quotes": 20}
+    assert raised.new_rows == {"alpha-quotes": 30} and raised.total_rows == 50
+    assert again.new_rows == {"alpha-quotes": 0} and again.total_rows == 50
+    with open(raised.output_path, newline="", encoding="utf-8") as f:
+        assert [int(row["Serial No"]) for row in csv.DictReader(f)] == list(range(1, 51))
+
+
+def authors(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row["Author"] for row in csv.DictReader(f)]
+
+
+def test_export_is_slug_by_slug_for_the_requested_slugs(server):
+    run = scrape(server, ["beta-quotes", "alpha-quotes"], resume=False)
+    assert run.new_rows == {"beta-quotes": 20, "alpha-quotes": 20}
+    assert authors(run.output_path) == ["Beta"] * 20 + ["Alpha"] * 20
+
+    again = scrape(server, ["alpha-quotes"])
+    assert again.new_rows == {"alpha-quotes": 0}
+    assert again.total_rows == 20
+    assert authors(again.output_path) == ["Alpha"] * 20
+
+
+def test_offline_rerun_is_served_from_the_cache(server):
+    page_cache = cache.PageCache()
+    try:
+        online = scrape(server, ["alpha-quotes"], resume=False, page_cache=page_cache)
+    finally:
+        page_cache.close()
+
+    offline_cache = cache.PageCache(offline=True)
+    try:
+        offline = scrape(server, ["alpha-quotes"], resume=False, page_cache=offline_cache)
+        stats = offline_cache.stats
+    finally:
+        offline_cache.close()
+    assert offline.total_rows == online.total_rows == 20
+    # The pages past the author's last one were cached as 404s, so nothing is missing.
+    assert stats["offline_miss"] == 0 and stats["hit"] > 2
+
+
+def test_concurrent_runs_of_one_job_write_each_quote_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with StubQuoteServer(pages=3, latency=0.02) as server:
+        urls = [f"{server.base_url}/alpha-quotes"]
+
+        def run(n):
+            return pipeline.scrape_job(urls, "shared", max_pages=4, rate_limit=0, base_url=server.base_url,
+                                       output_path=str(tmp_path / f"run-{n}.csv"))
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            runs = list(pool.map(run, range(2)))
+    assert sorted(sum(r.new_rows.values()) for r in runs) == [0, 30]
+    for r in runs:
+        with open(r.output_path, newline="", encoding="utf-8") as f:
+            links = [row["Link"] for row in csv.DictReader(f)]
+        assert len(links) == len(set(links)) == 30
@@ -0,0 +1,47 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from quotetool import ingest, pipeline, structure
+from tests.data import synthetic_quotes
+from tests.legacy import legacy_structure
+
+
+def as_csv(frame):
+    return frame.to_csv(index=False)
+
+
+@pytest.mark.parametrize("rows", [1, 50, 2_000])
+def test_vectorized_grouping_matches_the_original(rows):
+    df = synthetic_quotes(rows)
+    assert as_csv(structure.structure_by_author(df)) == as_csv(legacy_structure(df))
+
+
+@pytest.mark.parametrize("chunksize", [5, 64, 999])
+def test_grouping_across_chunks_matches_the_original(chunksize):
+    # About 12 quotes per author in random order, so most authors span
+    # several chunks and reach eight kept quotes only after a boundary.
+    df = synthetic_quotes(2_000)
+    chunks = (df.iloc[start:start + chunksize] for start in range(0, len(df), chunksize))
+    assert as_csv(structure.structure_by_author_chunks(chunks)) == as_csv(legacy_structure(df))
+
+
+def test_long_blank_and_missing_quotes_are_dropped():
+    df = pd.DataFrame({
+        "Quote": ["short", "x" * 181, "   ", np.nan, "x" * 180, "other"],
+        "Author": ["A", "A", "A", "A", "A", "B"],
+    })
+    got = structure.structure_by_author(df)
+    assert as_csv(got) == as_csv(legacy_structure(df))
+    assert got.loc[got["Author"] == "A", "s4paragraph1"].tolist() == ["x" * 180]
+
+
+def test_tab2_pipeline_matches_the_original():
+    df = synthetic_quotes(500)
+    raw = df.to_csv(index=False).encode()
+    with ingest.CsvOutput() as output:
+        pipeline.structure_csv(io.BytesIO(raw), output)
+        got = output.getvalue().decode()
+    assert got == as_csv(legacy_structure(pd.read_csv(io.BytesIO(raw), dtype=str)))